@@ -0,0 +1,98 @@
+"""
+Benchmark for the arbitration of competing alarm groups on one switch output.
+
+Creates a SwitchOutputGroup with one schedule per group and lets N groups request
+and release the output in random order. After every request, the active schedule is
+checked against the highest-priority request. Reports the time per request.
+
+    python -m benchmarks.bench_arbitration [N ...]
+"""
+
+import logging
+import sys
+import tempfile
+from pathlib import Path
+from random import Random
+from time import perf_counter
+
+from yaml import dump
+
+from miqro_alarm.alarm import AlarmState, SwitchOutputGroup
+from miqro_alarm.offline import create_offline_service
+
+REQUESTS = 20000
+
+
+class Group:
+    def __init__(self, name, priority):
+        self.name = name
+        self.priority = priority
+        self.state = AlarmState.OFF
+
+    def __str__(self):
+        return self.name
+
+
+def make_service(directory):
+    # a service without groups; the output is created directly
+    config_path = Path(directory) / "miqro.yml"
+    config_path.write_text(
+        dump({"broker": {}, "services": {"alarm": {"groups": []}}})
+    )
+    return create_offline_service(config_path)
+
+
+def make_output(service, groups):
+    schedules = {
+        group.name: {
+            "prealarm": {"mqtt": "switch", "message": f"{group.name}-prealarm"},
+            "alarm": {"mqtt": "switch", "message": f"{group.name}-alarm"},
+            "reset": {"mqtt": "switch", "message": f"{group.name}-reset"},
+        }
+        for group in groups
+    }
+    return SwitchOutputGroup(service, **schedules)
+
+
+def run(service, group_count, random):
+    groups = [Group(f"g{i}", random.randrange(1000)) for i in range(group_count)]
+    output = make_output(service, groups)
+    active = {}
+
+    start = perf_counter()
+    for _ in range(REQUESTS):
+        group = random.choice(groups)
+        group.state = random.choice(list(AlarmState))
+        output.request(group, group.name)
+
+        if group.state == AlarmState.OFF:
+            active.pop(group.name, None)
+        else:
+            active[group.name] = group
+    elapsed = perf_counter() - start
+
+    # verify the final arbitration result
+    if active:
+        winner = min(active.values(), key=lambda g: g.priority)
+        assert output.requests.peek()[1].group.priority == winner.priority
+        assert output.state == winner.state
+    else:
+        assert output.state == AlarmState.OFF
+
+    return elapsed / REQUESTS
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    counts = [int(arg) for arg in sys.argv[1:]] or [10, 100, 300, 1000]
+    random = Random(1)
+    print(f"{'groups':>8} {'us/request':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        service = make_service(directory)
+        for count in counts:
+            service.mqtt_client.published.clear()
+            print(f"{count:>8} {run(service, count, random) * 1e6:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Load benchmark for the AlarmService.
+
+Generates configurations of N groups x M inputs (see benchmarks.load.LoadConfig),
+drives a message stream through the service and reports:
+
+ * startup: time to create the service and connect (subscriptions), until it
+   processes messages
+ * startup msgs: messages published until then (HA discovery is published in
+   batches afterwards)
+ * msg/s: messages handled per second, including the timers due after each message
+ * p50/p99: time from receiving a message until the last resulting publish
+ * rss: peak resident memory of the process running the scenario
+
+Each scenario runs in a fresh process. Timings depend on the machine and its load,
+so results are only compared against runs on the same machine: either another
+revision, run right before in a temporary git worktree, or a local baseline file
+(not committed):
+
+    python -m benchmarks.bench_load --against main       # compare to another revision
+    python -m benchmarks.bench_load --save-baseline      # run and store as local baseline
+    python -m benchmarks.bench_load                      # run and compare to local baseline
+    python -m benchmarks.bench_load --scenario 100x20 --messages 50000
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from statistics import quantiles
+from time import perf_counter
+
+ROOT = Path(__file__).parent.parent
+BASELINE = Path(__file__).parent / "baseline.local.json"
+SCENARIOS = ["10x10", "50x10", "100x20"]
+MESSAGES = 2000
+
+# Metrics where larger values are worse, and the tolerance before a regression is
+# reported.
+LOWER_IS_BETTER = {"startup_s": 0.25, "p50_us": 0.25, "p99_us": 0.5, "rss_mb": 0.1}
+HIGHER_IS_BETTER = {"msg_per_s": 0.2}
+
+
+def run_scenario(scenario, messages):
+    from benchmarks.load import LoadConfig
+    from miqro_alarm.offline import create_offline_service, send
+
+    groups, inputs = map(int, scenario.split("x"))
+    load_config = LoadConfig(groups=groups, inputs=inputs)
+
+    with tempfile.TemporaryDirectory() as directory:
+        config_path = load_config.write(directory)
+        start = perf_counter()
+        service = create_offline_service(config_path)
+        startup = perf_counter() - start
+
+    published = service.mqtt_client.published
+    startup_msgs = len(published)
+    scheduler = service.scheduler
+    latencies = []
+
+    start = perf_counter()
+    for topic, payload in load_config.messages(messages):
+        before = len(published)
+        received = perf_counter()
+        send(service, topic, payload)
+        scheduler.run_due(service)
+        if len(published) > before:
+            latencies.append(published[-1][0] - received)
+        if len(published) > 100000:
+            published.clear()
+    elapsed = perf_counter() - start
+    service.shutdown()
+
+    percentiles = quantiles(latencies, n=100) if len(latencies) > 1 else [0] * 99
+    return {
+        "groups": groups,
+        "inputs": inputs,
+        "messages": messages,
+        "startup_s": round(startup, 3),
+        "startup_msgs": startup_msgs,
+        "msg_per_s": round(messages / elapsed),
+        "p50_us": round(percentiles[49] * 1e6, 1),
+        "p99_us": round(percentiles[98] * 1e6, 1),
+        "rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def run_isolated(scenario, messages):
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(run_scenario, scenario, messages).result()
+
+
+def run_revision(revision, scenarios, messages):
+    """
+    Run the scenarios with the code of another revision, checked out in a temporary
+    git worktree. The scenarios are driven by this script.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        worktree = Path(directory) / "tree"
+        subprocess.run(
+            ["git", "worktree", "add", "--detach", str(worktree), revision],
+            cwd=ROOT,
+            check=True,
+            capture_output=True,
+        )
+        try:
+            output = subprocess.run(
+                [sys.executable, __file__, "--json", "--messages", str(messages)]
+                + [arg for scenario in scenarios for arg in ("--scenario", scenario)],
+                cwd=worktree,
+                env=dict(os.environ, PYTHONPATH=str(worktree)),
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+        finally:
+            subprocess.run(
+                ["git", "worktree", "remove", "--force", str(worktree)],
+                cwd=ROOT,
+                check=True,
+            )
+    return json.loads(output)
+
+
+def compare(result, baseline):
+    regressions = []
+    for metric, tolerance in LOWER_IS_BETTER.items():
+        if result[metric] > baseline[metric] * (1 + tolerance):
+            regressions.append(f"{metric} {baseline[metric]} -> {result[metric]}")
+    for metric, tolerance in HIGHER_IS_BETTER.items():
+        if result[metric] < baseline[metric] * (1 - tolerance):
+            regressions.append(f"{metric} {baseline[metric]} -> {result[metric]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenario", action="append", help="GROUPSxINPUTS")
+    parser.add_argument("--messages", type=int, default=MESSAGES)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--against", metavar="REVISION", help="compare to a revision")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+    scenarios = args.scenario or SCENARIOS
+
+    if args.json:
+        results = {
+            scenario: run_isolated(scenario, args.messages) for scenario in scenarios
+        }
+        print(json.dumps(results))
+        return
+
+    if args.against:
+        print(f"Running {args.against} for comparison")
+        baseline = run_revision(args.against, scenarios, args.messages)
+    else:
+        baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    results = {}
+    failed = False
+
+    columns = ["startup_s", "startup_msgs", "msg_per_s", "p50_us", "p99_us", "rss_mb"]
+    print(f"{'scenario':>10} " + " ".join(f"{c:>10}" for c in columns))
+    for scenario in scenarios:
+        result = results[scenario] = run_isolated(scenario, args.messages)
+        print(f"{scenario:>10} " + " ".join(f"{result[c]:>10}" for c in columns))
+        if not args.save_baseline and scenario in baseline:
+            for regression in compare(result, baseline[scenario]):
+                print(f"{'':>10} REGRESSION: {regression}")
+                failed = True
+
+    if args.save_baseline:
+        baseline.update(results)
+        BASELINE.write_text(json.dumps(baseline, indent=2) + "\n")
+        print(f"Baseline written to {BASELINE}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
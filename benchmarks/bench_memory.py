@@ -0,0 +1,87 @@
+"""
+Memory benchmark for the AlarmService.
+
+Creates services with GROUPS groups of a small and a large number of inputs (see
+benchmarks.load.LoadConfig, without shared topics), sends one message to every
+input topic and reports the memory allocated per additional input, as measured
+by tracemalloc:
+
+ * total: including the parsed configuration
+ * runtime: without the parsed configuration, i.e., the inputs, evaluation
+   nodes, timers and state of the running service
+
+    python -m benchmarks.bench_memory
+    python -m benchmarks.bench_memory --groups 50 --inputs 10 50
+"""
+
+import argparse
+import multiprocessing
+import tempfile
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+from yaml import FullLoader, load
+
+GROUPS = 20
+INPUTS = [10, 50]
+
+
+def measure(groups, inputs):
+    from benchmarks.load import LoadConfig
+    from miqro_alarm.offline import create_offline_service, send
+
+    load_config = LoadConfig(groups=groups, inputs=inputs, shared_topics=0)
+    with tempfile.TemporaryDirectory() as directory:
+        config_path = load_config.write(directory)
+
+        tracemalloc.start()
+        with config_path.open() as f:
+            config = load(f, Loader=FullLoader)
+        config_size = tracemalloc.get_traced_memory()[0]
+        del config
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        service = create_offline_service(config_path)
+        for topic in load_config.input_topics:
+            send(service, topic, "off")
+        service.scheduler.run_due(service)
+        service.mqtt_client.published.clear()
+        total = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+    references = sum(
+        len(node.inputs) for node in service.input_nodes.values()
+    )
+    service.shutdown()
+    return {"total": total, "config": config_size, "references": references}
+
+
+def run_isolated(groups, inputs):
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(measure, groups, inputs).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--groups", type=int, default=GROUPS)
+    parser.add_argument("--inputs", type=int, nargs=2, default=INPUTS)
+    args = parser.parse_args()
+
+    small, large = (run_isolated(args.groups, inputs) for inputs in args.inputs)
+    added = large["references"] - small["references"]
+    total = (large["total"] - small["total"]) / added
+    runtime = (
+        large["total"] - large["config"] - small["total"] + small["config"]
+    ) / added
+    print(
+        f"{args.groups} groups x {args.inputs[0]} -> {args.inputs[1]} inputs "
+        f"({added} MQTT inputs added)"
+    )
+    print(f"  bytes per input, total:   {total:8.0f}")
+    print(f"  bytes per input, runtime: {runtime:8.0f}")
+
+
+if __name__ == "__main__":
+    main()
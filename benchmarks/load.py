@@ -0,0 +1,168 @@
+"""
+A generator for synthetic configurations for load benchmarks of the AlarmService.
+"""
+
+from pathlib import Path
+from random import Random
+
+from yaml import dump
+
+
+class LoadConfig:
+    """
+    A synthetic configuration with `groups` alarm groups of `inputs` inputs each.
+
+    Every group has one inhibitor and one liveness input. Every fifth input is a
+    multi-input (AND of two topics); every `shared_every`-th input listens on one of
+    `shared_topics` topics that are shared by all groups. All groups compete for
+    `switch_outputs` switch outputs.
+    """
+
+    def __init__(
+        self,
+        groups=10,
+        inputs=10,
+        shared_topics=5,
+        shared_every=4,
+        switch_outputs=2,
+    ):
+        self.groups = groups
+        self.inputs = inputs
+        self.shared_topics = shared_topics
+        self.shared_every = shared_every
+        self.switch_outputs = switch_outputs
+        self.input_topics = []
+        self.inhibitor_topics = []
+        self.liveness_topics = []
+        self.config = self._generate()
+
+    def _generate(self):
+        switch_outputs = {
+            f"sw{s}": {
+                f"g{g}": {
+                    state: {
+                        "mqtt": f"switch/sw{s}",
+                        "message": f"g{g}-{state}",
+                    }
+                    for state in ("prealarm", "alarm", "reset")
+                }
+                for g in range(self.groups)
+            }
+            for s in range(self.switch_outputs)
+        }
+
+        topics = set()
+
+        def topic(name):
+            topics.add(name)
+            return name
+
+        groups = []
+        for g in range(self.groups):
+            inputs = []
+            for i in range(self.inputs):
+                if i % 5 == 4:
+                    inputs.append(
+                        {
+                            "label": f"Multi {i}",
+                            "mode": "and",
+                            "inputs": [
+                                {
+                                    "mqtt": topic(f"g{g}/multi{i}/input{j}"),
+                                    "when": "is_on(value)",
+                                    "label": f"Input {j}",
+                                }
+                                for j in range(2)
+                            ],
+                        }
+                    )
+                elif self.shared_topics and i % self.shared_every == 0:
+                    shared = (g + i) % self.shared_topics
+                    inputs.append(
+                        {
+                            "mqtt": topic(f"shared/input{shared}"),
+                            "when": "value_float > 20",
+                            "label": f"Shared {shared}",
+                        }
+                    )
+                else:
+                    inputs.append(
+                        {
+                            "mqtt": topic(f"g{g}/input{i}"),
+                            "when": "is_on(value)",
+                            "label": f"Input {i}",
+                        }
+                    )
+
+            self.inhibitor_topics.append(f"g{g}/inhibitor")
+            self.liveness_topics.append(f"g{g}/liveness")
+            groups.append(
+                {
+                    "name": f"g{g}",
+                    "label": f"Group {g}",
+                    "priority": g % 7,
+                    "default_enabled": True,
+                    "inputs": inputs,
+                    "inhibitors": [
+                        {
+                            "mqtt": f"g{g}/inhibitor",
+                            "when": "is_on(value)",
+                            "label": "Inhibitor",
+                        }
+                    ],
+                    "liveness": [
+                        {
+                            "mqtt": f"g{g}/liveness",
+                            "when": "value == 'ok'",
+                            "label": "Liveness",
+                            "silence_timeout": {"hours": 1},
+                        }
+                    ],
+                    "outputs": {
+                        state: [
+                            {f"sw{g % self.switch_outputs}": f"g{g}"},
+                            "info",
+                        ]
+                        for state in ("prealarm", "alarm")
+                    },
+                }
+            )
+
+        self.input_topics = sorted(topics)
+        return {
+            "log_level": "ERROR",
+            "broker": {},
+            "services": {
+                "alarm": {
+                    "switch_outputs": switch_outputs,
+                    "text_outputs": {"info": {"mqtt": "text/info", "info": True}},
+                    "groups": groups,
+                }
+            },
+        }
+
+    def messages(self, count, seed=1):
+        """
+        A reproducible stream of (topic, payload) messages. Most messages toggle
+        inputs; inhibitors and liveness checks are sent now and then.
+        """
+        random = Random(seed)
+        for _ in range(count):
+            kind = random.random()
+            if kind < 0.05:
+                yield random.choice(self.inhibitor_topics), random.choice(("on", "off"))
+            elif kind < 0.15:
+                payload = "fail" if random.random() < 0.1 else "ok"
+                yield random.choice(self.liveness_topics), payload
+            else:
+                topic = random.choice(self.input_topics)
+                if topic.startswith("shared/"):
+                    yield topic, f"{random.uniform(10, 30):.1f}"
+                else:
+                    yield topic, random.choice(("on", "off", "off"))
+
+    def write(self, directory) -> Path:
+        path = Path(directory) / "miqro.yml"
+        with path.open("w") as f:
+            dump(self.config, f)
+        return path
@@ -1,21 +1,52 @@
+import json
 import miqro
-import requests
+import signal
+import sys
+import threading
 from typing import Optional, Dict, List, Tuple, Union
 from datetime import timedelta, datetime
 from enum import Enum
-from dataclasses import dataclass, field
-from heapq import heappush
+from dataclasses import dataclass
+from heapq import heapify, heappush
 from humanfriendly import format_timespan
-from json import loads
+from pathlib import Path
+from yaml import FullLoader, load
+
+from miqro_alarm.clock import Clock
+from miqro_alarm.conditions import (
+    WINDOW_NAMES,
+    Condition,
+    ConditionCompiler,
+    declarative_source,
+    release_source,
+    is_on,
+    try_float,
+    try_json,
+)
+from miqro_alarm.delivery import HTTPDelivery
+from miqro_alarm.discovery import DiscoveryManager
+from miqro_alarm.events import EventLog, EventType
+from miqro_alarm.history import HistoryJournal, main as history_main
+from miqro_alarm.dispatch import Message, TopicDispatcher
+from miqro_alarm.latency import LatencyTracker
+from miqro_alarm.notifications import WarningAggregator
+from miqro_alarm.persistence import StatePersistence
+from miqro_alarm.priority import IndexedPriorityQueue
+from miqro_alarm.recording import Recorder
+from miqro_alarm.scheduler import Scheduler, SchedulerLoop, Timer
+from miqro_alarm.window import SampleWindow
 
 
 class SwitchOutput:
     service: "AlarmService"
-    loop: Optional[miqro.Loop] = None
+    loop: Optional[Timer] = None
     message: Optional[str]
     mqtt: Optional[str]
     http_post: Optional[str]
 
+    # latency trace of the message that switched on this repeating output
+    latency_trace: Optional[Tuple] = None
+
     def __init__(self, service, mqtt=None, message=None, http_post=None, repeat=None):
         if mqtt and not message:
             raise Exception("mqtt is set but message is not")
@@ -27,21 +58,26 @@ class SwitchOutput:
         self.repeat = repeat
 
         if self.repeat:
-            self.loop = miqro.Loop(self._send, timedelta(**self.repeat), False)
-            self.service.add_loop(self.loop)
+            self.loop = self.service.scheduler.timer(
+                self._send, timedelta(**self.repeat)
+            )
 
     def _send(self, _=None):
         if self.mqtt and self.message:
             self.service.publish(self.mqtt, self.message, global_=True)
+            if self.latency_trace is not None:
+                self.service.latency.mark_trace("publish", self.latency_trace)
+                self.latency_trace = None
+            elif self.service.latency.enabled:
+                self.service.latency.mark("publish")
         if self.http_post:
-            try:
-                requests.post(self.http_post, timeout=10)
-            except Exception as e:
-                self.service.log.error(f"Error posting to {self.http_post}: {e}")
+            self.service.http.post(self.http_post)
 
     def on(self):
         if self.repeat:
             assert self.loop
+            if self.service.latency.enabled:
+                self.latency_trace = self.service.latency.trace()
             self.loop.start()
         else:
             self._send()
@@ -58,27 +94,33 @@ class AlarmState(Enum):
     ALARM = 2
 
 
-# Sortable alarm requests
-@dataclass(order=True)
+@dataclass(slots=True)
 class AlarmRequest:
     group: "AlarmGroup"
-    state: AlarmState = field(compare=False)
-    schedule: Optional[str] = field(compare=False)
+    state: AlarmState
+    schedule: Optional[str]
 
 
 class SwitchOutputGroup:
     service: "AlarmService"
+    # the name in the configuration, set by the service
+    name: str = ""
 
     schedules: Dict[str, Dict[AlarmState, SwitchOutput]]
     resets: Dict[str, SwitchOutput]
 
-    requests: List[AlarmRequest]
+    # active requests by group, the group with the highest priority (i.e., the lowest
+    # priority value) first
+    requests: IndexedPriorityQueue["AlarmGroup"]
+    # one request record per group, updated in place on every request
+    request_records: Dict["AlarmGroup", AlarmRequest]
     state: AlarmState = AlarmState.OFF
     current_schedule: Optional[str] = None
 
     def __init__(self, service, **schedules: Dict[str, Dict]):
         self.service = service
-        self.requests = []
+        self.requests = IndexedPriorityQueue()
+        self.request_records = {}
         self.schedules = {}
         self.resets = {}
 
@@ -110,27 +152,43 @@ class SwitchOutputGroup:
         self.state = target.state
 
     def request(self, group, schedule: Optional[str]):
-        self.service.log.info(
-            f"Output {self} | Request {group.state} for group: {group}"
+        if self.service.latency.enabled:
+            self.service.latency.mark("output", group)
+        self.service.events.record(
+            EventType.OUTPUT_REQUEST, group, self, group.state, schedule
         )
-        for request in self.requests:
-            if request.group == group:
-                del self.requests[self.requests.index(request)]
-
         if group.state != AlarmState.OFF:
-            heappush(self.requests, AlarmRequest(group, group.state, schedule))
+            record = self.request_records.get(group)
+            if record is None:
+                record = self.request_records[group] = AlarmRequest(
+                    group, group.state, schedule
+                )
+            else:
+                record.state = group.state
+                record.schedule = schedule
+            self.requests.set(group, group.priority, record)
+        else:
+            self.requests.remove(group)
+
+        self._apply_requests(group)
+
+    def withdraw(self, group):
+        """
+        Remove the request of a group that no longer uses this output.
+        """
+        self.request_records.pop(group, None)
+        if self.requests.remove(group):
+            self._apply_requests(group)
 
+    def _apply_requests(self, group):
         if len(self.requests) == 0:
             self.service.log.info(f"Output {self} | No requests, setting state to OFF")
             self._switch_off()
             return
 
-        target = self.requests[0]
+        _, target = self.requests.peek()
 
         if self.current_schedule == target.schedule and self.state == target.state:
-            self.service.log.info(
-                f"Output {self} | Request {state.name} for group: {group} ignored, already in state: {self.state}"
-            )
             return
 
         # if we're here, there is either a different schedule or a different state. We need to switch off the current
@@ -138,39 +196,116 @@ class SwitchOutputGroup:
         self._switch_off()
         self._switch_on(target)
 
+    def shutdown(self):
+        # switch off, sending the reset message once, and stop all repeating messages
+        schedule = self.current_schedule if self.state != AlarmState.OFF else None
+        for output in self._all_outputs():
+            output.off()
+        if schedule in self.resets:
+            self.resets[schedule]._send()
+        self.state = AlarmState.OFF
+        self.requests = IndexedPriorityQueue()
+        self.request_records = {}
+
+    def _all_outputs(self):
+        for schedule in self.schedules.values():
+            yield from schedule.values()
+        yield from self.resets.values()
+
+    def __str__(self):
+        return self.name
+
 
 class TextOutput:
     service: "AlarmService"
+    # the name in the configuration, set by the service
+    name: str = ""
     groups: List["AlarmGroup"]
     mqtt: Optional[str]
     info: bool
 
     published_alarm_information: Optional[Dict] = None
 
-    def __init__(self, service, mqtt, info=False):
+    # Updates arriving within the coalescing window are merged into one message
+    coalesce_timer: Optional[Timer] = None
+    send_first_immediately: bool = True
+    pending_update_reason: Optional["UpdateReason"] = None
+
+    def __init__(
+        self, service, mqtt, info=False, coalesce=None, send_first_immediately=True
+    ):
         self.service = service
         self.mqtt = mqtt
         self.info = info
         self.groups = []
 
+        if coalesce:
+            self.coalesce_timer = self.service.scheduler.timer(
+                self._coalesce_timeout, timedelta(**coalesce)
+            )
+            self.send_first_immediately = send_first_immediately
+
     def add_group(self, group: "AlarmGroup"):
         if not group in self.groups:
             heappush(self.groups, group)
 
-    def update(self, update_reason: "UpdateReason"):
+    def remove_group(self, group: "AlarmGroup"):
+        if group in self.groups:
+            self.groups.remove(group)
+            heapify(self.groups)
+
+    def shutdown(self):
+        if self.coalesce_timer:
+            self.coalesce_timer.stop()
+
+    def __str__(self):
+        return self.name
+
+    def update(self, update_reason: "UpdateReason", group=None):
         # TODO:
         # The text output needs no update if no alarm is active any longer in case it is an "alarm" or "prealarm" group output.
         # The text output should send a "reset" message if no alarm is active any longer in case it is a "reset" group output.
-        alarm_information = {
+        if self.service.latency.enabled:
+            self.service.latency.mark("output")
+        self.service.events.record(
+            EventType.OUTPUT_REQUEST, group, self, update_reason, "text"
+        )
+
+        if not self.coalesce_timer:
+            self._publish(self._get_alarm_information(), update_reason)
+            return
+
+        if (
+            self.pending_update_reason is None
+            or update_reason.severity() >= self.pending_update_reason.severity()
+        ):
+            self.pending_update_reason = update_reason
+
+        if self.coalesce_timer.active:
+            # a window is open, this update is sent when it closes; the alarm
+            # information is only collected then
+            return
+
+        if self.send_first_immediately and not self.published_alarm_information:
+            # first alarm after a quiet period: send now, then batch further updates
+            self._publish(self._get_alarm_information(), update_reason)
+            self.pending_update_reason = None
+        self.coalesce_timer.start(delayed=True)
+
+    def _coalesce_timeout(self, _):
+        if self.pending_update_reason is not None:
+            self._publish(self._get_alarm_information(), self.pending_update_reason)
+            self.pending_update_reason = None
+        return False
+
+    def _get_alarm_information(self):
+        return {
             group.label: self._get_group_information(group)
             for group in self.groups
             if group.state in [AlarmState.ALARM, AlarmState.PREALARM]
         }
 
-        self.service.log.info(
-            f"TextOutput {self} | Alarm information: {alarm_information}"
-        )
-
+    def _publish(self, alarm_information, update_reason):
         if alarm_information != self.published_alarm_information:
             self.published_alarm_information = alarm_information
             self.service.publish(
@@ -178,6 +313,8 @@ class TextOutput:
                 self._format_msg(alarm_information, update_reason),
                 global_=True,
             )
+            if self.service.latency.enabled:
+                self.service.latency.mark("publish")
 
     def send_info(self, message):
         self.service.publish(self.mqtt, message, global_=True)
@@ -203,19 +340,6 @@ class TextOutput:
         return "\n".join(output_strings)
 
 
-def is_on(value):
-    return value.lower() in [
-        "1",
-        "yes",
-        "on",
-        "true",
-    ]
-
-
-def is_off(value):
-    return not is_on(value)
-
-
 class InputState(Enum):
     INVALID_RESPONSE = -2
     UNKNOWN = -1
@@ -223,6 +347,12 @@ class InputState(Enum):
     ONLINE = 1
 
 
+class InputRole(Enum):
+    INPUT = 0
+    INHIBITOR = 1
+    LIVENESS = 2
+
+
 class UpdateReason(Enum):
     SWITCH_TO_OFF = 0
     SWITCH_TO_PREALARM = 1
@@ -237,6 +367,15 @@ class UpdateReason(Enum):
             UpdateReason.UPDATE_ALARM: "update",
         }[self]
 
+    def severity(self):
+        # used to pick the reason for updates that are coalesced into one message
+        return {
+            UpdateReason.SWITCH_TO_OFF: 0,
+            UpdateReason.UPDATE_ALARM: 1,
+            UpdateReason.SWITCH_TO_PREALARM: 2,
+            UpdateReason.SWITCH_TO_ALARM: 3,
+        }[self]
+
     def __str__(self):
         return {
             UpdateReason.SWITCH_TO_OFF: "Off",
@@ -246,29 +385,112 @@ class UpdateReason(Enum):
         }[self]
 
 
-class Input:
+class Debounce:
+    """
+    Commits changes of an evaluated value: directly, or with a debounce timeout
+    only if the new value persists for the whole timeout.
+    """
+
+    # inputs and nodes exist once per configured input, so they use slots
+    __slots__ = (
+        "service",
+        "last_eval_value",
+        "debounce_timeout_check_loop",
+        "debounce_observed_value",
+    )
+
     service: "AlarmService"
-    group: "AlarmGroup"
-    label: str
+    last_eval_value: Optional[bool]
+
+    debounce_timeout_check_loop: Optional[Timer]
+    debounce_observed_value: Optional[bool]
+
+    def _create_debounce(self, debounce):
+        self.last_eval_value = None
+        self.debounce_timeout_check_loop = None
+        self.debounce_observed_value = None
+        if debounce:
+            # create debounce timer
+            self.debounce_timeout_check_loop = self.service.scheduler.timer(
+                self._debounce_timeout_check, timedelta(**debounce)
+            )
+
+    def _event_group(self) -> Optional["AlarmGroup"]:
+        # the group for which events of this input are recorded
+        raise NotImplementedError()
+
+    def _commit(self, new_eval_value):
+        raise NotImplementedError()
+
+    def _handle_change(self, new_eval_value):
+        if not self.debounce_timeout_check_loop:
+            if new_eval_value == self.last_eval_value:
+                return False
+            self._commit(new_eval_value)
+        else:
+            if self.debounce_observed_value is None:
+                # no state change observed yet, see if the new value changes state
+                if new_eval_value is not self.last_eval_value:
+                    # if yes, start the observation
+                    self.debounce_observed_value = new_eval_value
+                    self.debounce_timeout_check_loop.start(delayed=True)
+                    self.service.events.record(
+                        EventType.DEBOUNCE_START,
+                        self._event_group(),
+                        self,
+                        new_eval_value,
+                    )
+                # if not, ignore, as there was no value change
+            else:
+                # An observation is running already. There are two cases:
+
+                # 1. The new value is the same as the pre-observation value. We reset the observation.
+                if new_eval_value is not self.debounce_observed_value:
+                    self.service.events.record(
+                        EventType.DEBOUNCE_STOP,
+                        self._event_group(),
+                        self,
+                        self.debounce_observed_value,
+                        "cancelled",
+                    )
+                    self.debounce_observed_value = None
+                    self.debounce_timeout_check_loop.stop()
+
+                # 2. Otherwise, continue observation.
+        return True
+
+    def _debounce_timeout_check(self, _):
+        self.service.events.record(
+            EventType.DEBOUNCE_STOP,
+            self._event_group(),
+            self,
+            self.debounce_observed_value,
+            "committed",
+        )
+        self._commit(self.debounce_observed_value)
+        self.debounce_observed_value = None
+        return False  # stop loop
 
-    last_eval_value: Optional[bool] = None
-    last_update: Optional[datetime] = None
-    state: InputState = InputState.UNKNOWN
 
-    debounce_timeout_check_loop: Optional[miqro.Loop] = None
-    debounce_observed_value = None
+class Input(Debounce):
+    __slots__ = ("group", "alarm_group", "label", "role", "state")
+
+    service: "AlarmService"
+    group: Union["AlarmGroup", "MultiInput"]
+    alarm_group: "AlarmGroup"
+    label: str
+    role: InputRole
+
+    state: InputState
 
     def __init__(self, service, group, label, debounce=None):
         self.service = service
         self.group = group
-        self.label = label
-
-        if debounce:
-            # create debounce loop
-            self.debounce_timeout_check_loop = miqro.Loop(
-                self._debounce_timeout_check, timedelta(**debounce), start=False
-            )
-            self.service.add_loop(self.debounce_timeout_check_loop)
+        self.alarm_group = group.alarm_group if isinstance(group, MultiInput) else group
+        self.label = sys.intern(label)
+        self.role = InputRole.INPUT
+        self.state = InputState.UNKNOWN
+        self._create_debounce(debounce)
 
     def get_last_value(self):
         return self.last_eval_value
@@ -276,6 +498,11 @@ class Input:
     def get_state(self):
         return self.state
 
+    def shutdown(self):
+        # called when the input is removed from the configuration
+        if self.debounce_timeout_check_loop:
+            self.debounce_timeout_check_loop.stop()
+
     def __str__(self):
         return self.label
 
@@ -286,6 +513,17 @@ class Input:
         else:
             return MultiInput(service, group, **kwargs)
 
+    @staticmethod
+    def check(service, config: Dict):
+        """
+        Raise an exception if an input cannot be created from `config`, without
+        creating it.
+        """
+        if "mqtt" in config:
+            MQTTInput.check(service, **config)
+        else:
+            MultiInput.check(service, **config)
+
     @staticmethod
     def create_from_input_list(
         service, group, list
@@ -296,69 +534,36 @@ class Input:
     def create_from_liveness_input_list(service, group, list) -> List["LivenessInput"]:
         return [LivenessInput(service, group, **l) for l in list]
 
-    def _handle_change(self, new_eval_value):
-        if not self.debounce_timeout_check_loop:
-            if new_eval_value == self.last_eval_value:
-                return False
-            self.service.log.debug(
-                f"Group {self.group}, input {self} | No debounce, committing directly"
-            )
-            self._commit(new_eval_value)
-        else:
-            if self.debounce_observed_value is None:
-                # no state change observed yet, see if the new value changes state
-                if new_eval_value is not self.last_eval_value:
-                    # if yes, start the observation
-                    self.debounce_observed_value = new_eval_value
-                    self.debounce_timeout_check_loop.start(delayed=True)
-                    self.service.log.debug(
-                        f"Group {self.group}, input {self} | Value changed to {new_eval_value}, but waiting for debounce timeout"
-                    )
-                else:
-                    # if not, ignore, as there was no value change
-                    self.service.log.debug(
-                        f"Group {self.group}, input {self} | Value changed to {new_eval_value}, but same as before - ignoring"
-                    )
-                    pass
-            else:
-                # An observation is running already. There are two cases:
-
-                # 1. The new value is the same as the pre-observation value. We reset the observation.
-                if new_eval_value is not self.debounce_observed_value:
-                    self.debounce_observed_value = None
-                    self.debounce_timeout_check_loop.stop()
-                    self.service.log.debug(
-                        f"Group {self.group}, input {self} | Value changed back to {new_eval_value}, stopped debounce observation"
-                    )
-
-                # 2. Otherwise, continue observation.
-                else:
-                    self.service.log.debug(
-                        f"Group {self.group}, input {self} | Value changed to {new_eval_value}, same as running observation"
-                    )
-                    pass
-        return True
+    def _event_group(self):
+        return self.alarm_group
 
     def _commit(self, new_eval_value):
-        self.service.log.info(
-            f"Group {self.group}, input {self} | Evaluated value changed to {new_eval_value}"
+        if self.service.latency.enabled:
+            self.service.latency.mark("commit", self.alarm_group)
+        self.service.events.record(
+            EventType.INPUT_CHANGE, self.alarm_group, self, new_eval_value
         )
+        if self.service.history is not None:
+            self.service.history.record(
+                self.alarm_group,
+                "input",
+                {
+                    "input": self.label,
+                    "role": self.role.name.lower(),
+                    "value": new_eval_value,
+                },
+            )
         self.last_eval_value = new_eval_value
+        self.group.member_changed(self)
         if new_eval_value:
             self.group.on(self)
         else:
             self.group.off(self)
 
-    def _debounce_timeout_check(self, _):
-        self.service.log.info(
-            f"Group {self.group}, input {self} | Observation timed out, comitting {self.debounce_observed_value}"
-        )
-        self._commit(self.debounce_observed_value)
-        self.debounce_observed_value = None
-        return False  # stop loop
-
 
 class MultiInput(Input):
+    __slots__ = ("inputs", "mode")
+
     def __init__(self, service, group, label, inputs, mode):
         super().__init__(service, group, label)
         self.inputs = Input.create_from_input_list(service, self, inputs)
@@ -369,6 +574,15 @@ class MultiInput(Input):
 
         self.mode = mode
 
+    @staticmethod
+    def check(service, label, inputs, mode):
+        if not mode in ["and", "or"]:
+            raise Exception(
+                f"For multi input, mode must be either 'and' or 'or', but not '{mode}'"
+            )
+        for config in inputs:
+            Input.check(service, config)
+
     def get_last_value(self):
         if self.mode == "and":
             return all(i.get_last_value() for i in self.inputs)
@@ -385,6 +599,14 @@ class MultiInput(Input):
             return InputState.ONLINE
         return InputState.UNKNOWN
 
+    def member_changed(self, input):
+        self.group.member_changed(self)
+
+    def shutdown(self):
+        super().shutdown()
+        for input in self.inputs:
+            input.shutdown()
+
     def on(self, input):
         new_eval_value = self.get_last_value()
         self._handle_change(new_eval_value)
@@ -396,116 +618,252 @@ class MultiInput(Input):
         return f"{self.label} ({len(self.inputs)} inputs, '{self.mode}')"
 
 
-class MQTTInput(Input):
+class InputNode(Debounce):
+    """
+    The evaluation of an MQTT topic with a condition. Inputs with the same topic,
+    condition, debounce, window and silence timeout share one node, even across
+    groups: the node subscribes to the topic, evaluates each message once, runs
+    the debounce and silence timers and stores the state. The inputs referencing
+    the node are notified of changes.
+    """
+
+    __slots__ = (
+        "key",
+        "mqtt",
+        "condition",
+        "compiled_condition",
+        "release_condition",
+        "compiled_release_condition",
+        "window",
+        "inputs",
+        "silence_timeout_check_loop",
+        "last_raw_value",
+        "last_update",
+        "state",
+    )
+
+    key: Tuple
     mqtt: str
     condition: str
-    format: Optional[str]
+    compiled_condition: Condition
+    # with hysteresis, the condition that deactivates the node when it is active
+    release_condition: Optional[str]
+    compiled_release_condition: Optional[Condition]
+    window: Optional[SampleWindow]
+    inputs: List["MQTTInput"]
 
-    silence_timeout_check_loop: Optional[miqro.Loop] = None
+    silence_timeout_check_loop: Optional[Timer]
 
-    last_raw_value: Optional[str] = None
+    last_raw_value: Optional[str]
+    # time of the last message on the service's monotonic clock
+    last_update: Optional[float]
+    state: InputState
 
     def __init__(
         self,
         service,
-        group,
+        key,
         mqtt,
-        *,
-        when,
-        label,
+        condition,
+        release_condition=None,
         debounce=None,
-        format=None,
-        silence_timeout: Optional[Dict] = {"days": 7},
+        window=None,
+        silence_timeout=None,
     ):
-        super().__init__(service, group, label, debounce)
-        self.mqtt = mqtt
-        self.condition = when
-        self.format = format
+        self.service = service
+        self.key = key
+        self.mqtt = sys.intern(mqtt)
+        self.inputs = []
+        self.condition = sys.intern(condition)
+        self.compiled_condition = self.service.conditions.compile(self.condition)
+        self.release_condition = release_condition
+        self.compiled_release_condition = None
+        if self.release_condition is not None:
+            self.compiled_release_condition = self.service.conditions.compile(
+                self.release_condition
+            )
+        self.window = None
+        self.silence_timeout_check_loop = None
+        self.last_raw_value = None
+        self.last_update = None
+        self.state = InputState.UNKNOWN
+
+        if window is not None:
+            # only the statistics used by the conditions are maintained
+            self.window = SampleWindow(
+                self.service.clock.monotonic,
+                names=self.compiled_condition.names
+                | getattr(self.compiled_release_condition, "names", frozenset()),
+                **window,
+            )
+        else:
+            _check_window_names(
+                mqtt, self.compiled_condition, self.compiled_release_condition
+            )
+        self._create_debounce(debounce)
 
-        self.service.add_global_handler(self.mqtt, self.handle)
+        self.service.dispatcher.subscribe(self.mqtt, self.handle)
 
         if silence_timeout is not None:
-            self.silence_timeout_check_loop = miqro.Loop(
-                self._check_silence_timeout, timedelta(**silence_timeout), False
+            self.silence_timeout_check_loop = self.service.scheduler.timer(
+                self._check_silence_timeout, timedelta(**silence_timeout)
             )
-            self.service.add_loop(self.silence_timeout_check_loop)
             self.silence_timeout_check_loop.start(delayed=True)
 
         self._load_state()
 
-        self.store_state_loop = miqro.Loop(
-            self._store_state, timedelta(seconds=30), False
+    @staticmethod
+    def check(
+        service,
+        mqtt,
+        condition,
+        debounce,
+        window,
+        silence_timeout,
+        release_condition=None,
+    ):
+        """
+        Raise an exception if a node cannot be created from this configuration,
+        without creating it.
+        """
+        compiled_condition = service.conditions.compile(condition)
+        compiled_release_condition = None
+        if release_condition is not None:
+            compiled_release_condition = service.conditions.compile(release_condition)
+        if window is not None:
+            SampleWindow(service.clock.monotonic, **window)
+        else:
+            _check_window_names(mqtt, compiled_condition, compiled_release_condition)
+        for interval in (debounce, silence_timeout):
+            if interval is not None:
+                timedelta(**interval)
+
+    @classmethod
+    def get(
+        cls, service, input, mqtt, condition, debounce, window, silence_timeout, **kwargs
+    ) -> "InputNode":
+        """
+        The node for an input, created if no input with the same configuration
+        exists yet. The input is added to the inputs notified by the node.
+        """
+        key = (
+            cls.__name__,
+            mqtt,
+            condition,
+            kwargs.get("release_condition"),
+            sys.intern(_config_key(debounce)),
+            sys.intern(_config_key(window)),
+            sys.intern(_config_key(silence_timeout)),
         )
-        self.service.add_loop(self.store_state_loop)
-        self.store_state_loop.start(delayed=True)
-
-    def handle(self, _, raw_value):
-        self.last_update = datetime.now()
-        self.last_raw_value = raw_value
+        node = service.input_nodes.get(key)
+        if node is None:
+            node = service.input_nodes[key] = cls(
+                service,
+                key,
+                mqtt,
+                condition,
+                debounce=debounce,
+                window=window,
+                silence_timeout=silence_timeout,
+                **kwargs,
+            )
+        node.inputs.append(input)
+        return node
+
+    def remove(self, input: "MQTTInput"):
+        self.inputs.remove(input)
+        if not self.inputs:
+            self.shutdown()
+
+    def shutdown(self):
+        del self.service.input_nodes[self.key]
+        self.service.dispatcher.unsubscribe(self.mqtt, self.handle)
+        for timer in (
+            self.silence_timeout_check_loop,
+            self.debounce_timeout_check_loop,
+        ):
+            if timer is not None:
+                timer.stop()
+        self.service.notifications.clear((self, "silent"))
+        self.service.persistence.mark_dirty(self)
+
+    def handle(self, message: Message):
+        self.last_update = message.received
+        self.last_raw_value = message.raw
         if self.silence_timeout_check_loop:
             self.silence_timeout_check_loop.restart(delayed=True)
-        self.state = InputState.ONLINE
+        if self.state != InputState.ONLINE:
+            self.state = InputState.ONLINE
+            for input in self.inputs:
+                input._online()
+            self.service.notifications.clear((self, "silent"))
         try:
-            new_eval_value = eval(
-                self.condition,
-                {
-                    "value": raw_value,
-                    "value_float": self.try_float(raw_value),
-                    "value_json": self.try_json(raw_value),
-                    "is_on": is_on,
-                    "is_off": is_off,
-                },
-            )
+            new_eval_value = self._evaluate(self._payload(message))
         except Exception as e:
-            self.service.warning(
-                f"Group {self.group}, input {self} | Evaluation of input '{raw_value}' failed: {e}"
-            )
+            for input in self.inputs:
+                input._evaluation_failed(message, e)
             new_eval_value = self.last_eval_value
+        if self.service.latency.enabled:
+            self.service.latency.mark("evaluate", self.inputs[0].alarm_group)
 
         self._handle_change(new_eval_value)
-        self._store_state()
+        self.service.persistence.mark_dirty(self)
 
-    @staticmethod
-    def try_float(inval):
-        try:
-            return float(inval)
-        except (ValueError, TypeError):
-            return float("NaN")
+    def _evaluate(self, payload):
+        # with hysteresis, an active node stays active until the release condition
+        # is met
+        if self.compiled_release_condition is not None and self.last_eval_value:
+            return not self.compiled_release_condition.evaluate(payload)
+        return self.compiled_condition.evaluate(payload)
 
-    @staticmethod
-    def try_json(inval):
-        try:
-            return loads(inval)
-        except Exception as e:
-            return {}
+    def _payload(self, message: Message):
+        # the condition sees the message, or the window including the message
+        if self.window is None:
+            return message
+        return self.window.update(message)
+
+    def _event_group(self):
+        # shared by the groups of its inputs, see alarm_group_names
+        return None
+
+    def alarm_group_names(self):
+        return {input.alarm_group.name for input in self.inputs}
 
     def __str__(self):
-        if not self.format:
-            return super().__str__()
-        else:
-            return f"{self.label} ({self.format})".format(
-                value=self.last_raw_value,
-                value_float=self.try_float(self.last_raw_value),
-            )
+        return f"Input {self.mqtt} ({len(self.inputs)} reference(s))"
+
+    def _commit(self, new_eval_value):
+        self.last_eval_value = new_eval_value
+        for input in self.inputs:
+            input._commit(new_eval_value)
+        self.service.persistence.mark_dirty(self)
 
     def _check_silence_timeout(self, _):
         self.state = InputState.OFFLINE
+        for input in self.inputs:
+            input._silent()
+        self.service.persistence.mark_dirty(self)
+
+        # one warning for all inputs referencing the node
+        inputs = "; ".join(
+            f"Group {input.group}, input {input}" for input in self.inputs
+        )
         if self.last_update is None:
-            assert self.silence_timeout_check_loop is not None
-            span = datetime.now() - self.service.started
-            self.service.warning(
-                f"Group {self.group}, input {self}: Silent since launch ({format_timespan(span)} ago)"
-            )
+            span = self.service.clock.now() - self.service.started
+            message = f"{inputs}: Silent since launch ({format_timespan(span)} ago)"
         else:
-            span = datetime.now() - self.last_update
-            self.service.warning(
-                f"Group {self.group}, input {self}: Silent for {format_timespan(span)}"
-            )
+            span = self.service.clock.monotonic() - self.last_update
+            message = f"{inputs}: Silent for {format_timespan(span)}"
+        self.service.warning(
+            message,
+            key=(self, "silent"),
+            category="silent",
+            subject=", ".join(input.get_subject() for input in self.inputs),
+        )
 
-    def _store_state(self, _=None):
-        # service saves periodically
-        assert self.service.state
-        self.service.state.set_path(
+    def _store_state(self):
+        # called by the service's persistence when this node is dirty
+        self.service.persistence.set_path(
             "mqtt_input",
             self.mqtt,
             self.condition,
@@ -513,7 +871,7 @@ class MQTTInput(Input):
             value={
                 "last_raw_value": self.last_raw_value,
                 "last_eval_value": self.last_eval_value,
-                "last_update": self.last_update,
+                "last_update": self.service.clock.to_datetime(self.last_update),
                 "state": self.state.value,
             },
         )
@@ -526,83 +884,265 @@ class MQTTInput(Input):
         if stored_state is not None:
             self.last_raw_value = stored_state["last_raw_value"]
             self.last_eval_value = stored_state["last_eval_value"]
-            self.last_update = stored_state["last_update"]
+            self.last_update = self.service.clock.from_datetime(
+                stored_state["last_update"]
+            )
             self.state = InputState(stored_state["state"])
 
 
+class LivenessNode(InputNode):
+    """
+    The evaluation of a liveness check. A failing check is not an offline input,
+    but an input with an invalid response.
+    """
+
+    __slots__ = ()
+
+    def handle(self, message: Message):
+        self.last_update = message.received
+        self.last_raw_value = message.raw
+
+        if self.silence_timeout_check_loop:
+            self.silence_timeout_check_loop.restart(delayed=True)
+        self.service.notifications.clear((self, "silent"))
+
+        new_eval_value = self._evaluate(self._payload(message))
+        if self.service.latency.enabled:
+            self.service.latency.mark("evaluate", self.inputs[0].alarm_group)
+        if new_eval_value != self.last_eval_value:
+            self.state = (
+                InputState.ONLINE if new_eval_value else InputState.INVALID_RESPONSE
+            )
+            self._commit(new_eval_value)
+        self.service.persistence.mark_dirty(self)
+
+
+class MQTTInput(Input):
+    """
+    An input of a group (or multi-input) that is triggered by an MQTT topic. The
+    evaluation is done by the InputNode, which may be shared with identical
+    inputs of other groups.
+    """
+
+    __slots__ = ("node", "format")
+
+    NODE_CLASS = InputNode
+
+    node: InputNode
+    format: Optional[str]
+
+    def __init__(
+        self,
+        service,
+        group,
+        mqtt,
+        *,
+        label,
+        when=None,
+        debounce=None,
+        format=None,
+        silence_timeout: Optional[Dict] = {"days": 7},
+        window: Optional[Dict] = None,
+        until=None,
+        hysteresis=None,
+        **condition,
+    ):
+        super().__init__(service, group, label)
+        self.format = format
+        self.node = self.NODE_CLASS.get(
+            service,
+            self,
+            **self._node_config(
+                mqtt, when, debounce, silence_timeout, window, until, hysteresis, condition
+            ),
+        )
+        # start from the state of the node, which may have been loaded from the
+        # state file or be shared with other inputs
+        self.last_eval_value = self.node.last_eval_value
+        self.state = self.node.state
+
+    @classmethod
+    def check(
+        cls,
+        service,
+        mqtt,
+        *,
+        label,
+        when=None,
+        debounce=None,
+        format=None,
+        silence_timeout: Optional[Dict] = {"days": 7},
+        window: Optional[Dict] = None,
+        until=None,
+        hysteresis=None,
+        **condition,
+    ):
+        cls.NODE_CLASS.check(
+            service,
+            **cls._node_config(
+                mqtt, when, debounce, silence_timeout, window, until, hysteresis, condition
+            ),
+        )
+
+    @staticmethod
+    def _node_config(
+        mqtt, when, debounce, silence_timeout, window, until, hysteresis, condition
+    ) -> Dict:
+        # the condition is either a 'when' expression or one of the declarative forms
+        return {
+            "mqtt": mqtt,
+            "condition": declarative_source(when, **condition),
+            "release_condition": release_source(until, hysteresis, **condition),
+            "debounce": debounce,
+            "window": window,
+            "silence_timeout": silence_timeout,
+        }
+
+    @property
+    def mqtt(self) -> str:
+        return self.node.mqtt
+
+    @property
+    def condition(self) -> str:
+        return self.node.condition
+
+    @property
+    def last_raw_value(self) -> Optional[str]:
+        return self.node.last_raw_value
+
+    @property
+    def last_update(self) -> Optional[datetime]:
+        return self.service.clock.to_datetime(self.node.last_update)
+
+    def _online(self):
+        self.state = InputState.ONLINE
+        self.group.member_changed(self)
+
+    def _evaluation_failed(self, message: Message, e: Exception):
+        self.service.warning(
+            f"Group {self.group}, input {self} | Evaluation of input '{message.raw}' failed: {e}",
+            key=(self, "evaluation"),
+            category="failing evaluation",
+            subject=self.get_subject(),
+        )
+
+    try_float = staticmethod(try_float)
+    try_json = staticmethod(try_json)
+
+    def __str__(self):
+        if not self.format:
+            return super().__str__()
+        else:
+            return f"{self.label} ({self.format})".format(
+                value=self.last_raw_value,
+                value_float=self.try_float(self.last_raw_value),
+            )
+
+    def _silent(self):
+        # the warning is sent by the node
+        if self.state != InputState.OFFLINE:
+            self.state = InputState.OFFLINE
+            self.group.member_changed(self)
+
+    def get_subject(self):
+        return f"{self.label} ({self.group})"
+
+    def shutdown(self):
+        super().shutdown()
+        self.node.remove(self)
+        for problem in ("evaluation", "invalid response"):
+            self.service.notifications.clear((self, problem))
+
+
 class LivenessInput(MQTTInput):
+    __slots__ = ("invalid_response_timeout",)
+
+    NODE_CLASS = LivenessNode
+
     invalid_response_timeout: timedelta
-    invalid_response_timeout_check_loop: miqro.Loop
+    # invalid_response_timeout_check_loop: Timer
 
     def __init__(
         self,
         service,
         group,
         mqtt,
-        when,
         label,
         silence_timeout={"hours": 1},
         invalid_response_timeout={"minutes": 3},
+        **condition,
     ):
         super().__init__(
             service,
             group,
             mqtt,
-            when=when,
             label=label,
             silence_timeout=silence_timeout,
+            **condition,
         )
         self.invalid_response_timeout = timedelta(**invalid_response_timeout)
+
+    @classmethod
+    def check(
+        cls,
+        service,
+        mqtt,
+        label,
+        silence_timeout={"hours": 1},
+        invalid_response_timeout={"minutes": 3},
+        **condition,
+    ):
+        timedelta(**invalid_response_timeout)
+        super().check(
+            service, mqtt, label=label, silence_timeout=silence_timeout, **condition
+        )
         # self.invalid_response_timeout_check_loop = miqro.Loop(
         #    self.check_invalid_response_timeout, self.invalid_response_timeout, False
         # )
         # self.service.add_loop(self.invalid_response_timeout_check_loop)
 
-    def handle(self, _, raw_value):
-        self.last_update = datetime.now()
-        self.last_raw_value = raw_value
-
-        if self.silence_timeout_check_loop:
-            self.silence_timeout_check_loop.restart(delayed=True)
-
-        self._handle_change(
-            eval(
-                self.condition,
-                {
-                    "value": raw_value,
-                    "value_float": self.try_float(raw_value),
-                    "value_json": self.try_json(raw_value),
-                    "is_on": is_on,
-                    "is_off": is_off,
-                },
-            )
-        )
-
     # def check_invalid_response_timeout(self, _):
     #    self.service.warning(
     #        f"Group {self.group}, liveness input {self}: Invalid response since {self.last_update}"
     #    )
 
-    def _handle_change(self, new_eval_value):
-        if new_eval_value == self.last_eval_value:
-            return False
-
-        self.service.log.info(
-            f"Group {self.group}, liveness input {self} | Evaluated value changed to {new_eval_value}"
+    def _commit(self, new_eval_value):
+        self.service.events.record(
+            EventType.INPUT_CHANGE, self.alarm_group, self, new_eval_value
         )
+        if self.service.history is not None:
+            self.service.history.record(
+                self.alarm_group,
+                "input",
+                {
+                    "input": self.label,
+                    "role": self.role.name.lower(),
+                    "value": new_eval_value,
+                },
+            )
         self.last_eval_value = new_eval_value
 
         if new_eval_value:
             self.state = InputState.ONLINE
+            self.service.notifications.clear((self, "invalid response"))
             # self.invalid_response_timeout_check_loop.stop()
         else:
             self.state = InputState.INVALID_RESPONSE
             # self.invalid_response_timeout_check_loop.start(delayed=True)
             self.service.warning(
-                f"Group {self.group}, liveness input {self}: Invalid response ({self.last_raw_value})!"
+                f"Group {self.group}, liveness input {self}: Invalid response ({self.last_raw_value})!",
+                key=(self, "invalid response"),
+                category="with invalid response",
+                subject=self.get_subject(),
             )
+        self.group.member_changed(self)
 
-        return True
+
+MEMBER_FLAGS = {
+    (online, active): (online, active)
+    for online in (False, True)
+    for active in (False, True)
+}
 
 
 class AlarmGroup:
@@ -623,9 +1163,20 @@ class AlarmGroup:
     enabled: bool = False
     inhibited_by_command: bool = False
 
-    prealarm_to_alarm_loop: Optional[miqro.Loop] = None
-    alarm_to_reset_loop: Optional[miqro.Loop] = None
-    inhibit_timeout_loop: miqro.Loop
+    # the configuration this group was created from, to detect changes on reload
+    config: Dict
+
+    prealarm_to_alarm_loop: Optional[Timer] = None
+    alarm_to_reset_loop: Optional[Timer] = None
+    inhibit_timeout_loop: Timer
+
+    # Aggregates over inputs, inhibitors and liveness checks, updated incrementally
+    # by member_changed. member_flags holds (online, active) for each of them.
+    member_flags: Dict[Input, Tuple[bool, bool]]
+    offline_count: int = 0
+    active_input_count: int = 0
+    active_inhibitor_count: int = 0
+    failed_liveness_count: int = 0
 
     def __init__(
         self,
@@ -652,23 +1203,12 @@ class AlarmGroup:
         self.liveness = Input.create_from_liveness_input_list(
             self.service, self, liveness
         )
+        self._assign_roles()
 
         self.service.log.debug(f"Assigning outputs for group {self}")
         self.text_outputs = {}
         self.switch_outputs = {}
-        for alarm_type, outs in outputs.items():
-            self.text_outputs[alarm_type] = []
-            self.switch_outputs[alarm_type] = []
-            for o in outs:
-                if type(o) is dict:
-                    # output description is of the form 'output_name: schedule'
-                    output_name, schedule = o.popitem()
-                    output = self.service.switch_outputs[output_name]
-                    self.switch_outputs[alarm_type].append((output, schedule))
-                else:
-                    output = self.service.text_outputs[o]
-                    output.add_group(self)
-                    self.text_outputs[alarm_type].append(output)
+        self._assign_outputs(outputs)
 
         assert self.service.state
         stored_state = self.service.state.get_path(
@@ -685,38 +1225,251 @@ class AlarmGroup:
                 f"Using stored state for group {self}: {self.enabled}"
             )
 
-        self.inhibit_timeout_loop = miqro.Loop(
-            self.inhibit_timeout, timedelta(minutes=1), False
+        self.inhibit_timeout_loop = self.service.scheduler.timer(
+            self.inhibit_timeout, timedelta(minutes=1)
         )
-        self.service.add_loop(self.inhibit_timeout_loop)
+
+        self._set_prealarm(prealarm)
+        self._set_reset_delay(reset_delay)
+
+        for command, handler in self._command_handlers().items():
+            self.service.add_command_handler(self._mqtt_topic(command), handler)
+
+        self.setup_ha_entities()
+
+    @staticmethod
+    def check(
+        service,
+        priority,
+        name,
+        label,
+        inputs: List[Dict],
+        outputs: Dict[str, List[str]],
+        prealarm=None,
+        reset_delay=None,
+        liveness: List[Dict] = [],
+        inhibitors: List[Dict] = [],
+        default_enabled=False,
+    ):
+        """
+        Raise an exception if a group cannot be created from this configuration,
+        without creating it. The outputs are checked by the service.
+        """
+        try:
+            for interval in (prealarm, reset_delay):
+                if interval:
+                    timedelta(**interval)
+            for config in inputs + inhibitors:
+                Input.check(service, config)
+            for config in liveness:
+                LivenessInput.check(service, **config)
+        except Exception as e:
+            raise Exception(f"Group {name}: {e}") from e
+
+    def _command_handlers(self):
+        return {
+            "enabled/command": self.handle_enabled_msg,
+            "inhibited/command": self.handle_inhibit_msg,
+            "reset/command": self.handle_reset_msg,
+            "auto/command": self.handle_auto_msg,
+        }
+
+    def _assign_roles(self):
+        for input in self.inputs:
+            input.role = InputRole.INPUT
+        for input in self.inhibitors:
+            input.role = InputRole.INHIBITOR
+        for input in self.liveness:
+            input.role = InputRole.LIVENESS
+        self._recompute_aggregates()
+
+    def _assign_outputs(self, outputs: Dict[str, List]):
+        for text_outputs in self.text_outputs.values():
+            for output in text_outputs:
+                output.remove_group(self)
+        previous_switch_outputs = {
+            output for outs in self.switch_outputs.values() for output, _ in outs
+        }
+
+        self.text_outputs = {}
+        self.switch_outputs = {}
+        for alarm_type, outs in outputs.items():
+            self.text_outputs[alarm_type] = []
+            self.switch_outputs[alarm_type] = []
+            for o in outs:
+                if type(o) is dict:
+                    # output description is of the form 'output_name: schedule'
+                    ((output_name, schedule),) = o.items()
+                    output = self.service.switch_outputs[output_name]
+                    self.switch_outputs[alarm_type].append((output, schedule))
+                else:
+                    output = self.service.text_outputs[o]
+                    output.add_group(self)
+                    self.text_outputs[alarm_type].append(output)
+
+        # withdraw requests from switch outputs that this group no longer uses
+        current_switch_outputs = {
+            output for outs in self.switch_outputs.values() for output, _ in outs
+        }
+        live_switch_outputs = list(self.service.switch_outputs.values())
+        for output in previous_switch_outputs - current_switch_outputs:
+            if output in live_switch_outputs:
+                output.withdraw(self)
+
+    def _set_prealarm(self, prealarm):
+        # a running prealarm continues with the new duration, or turns into an alarm
+        # if the prealarm has been removed
+        running = self.prealarm_to_alarm_loop is not None and (
+            self.prealarm_to_alarm_loop.active
+        )
+        if self.prealarm_to_alarm_loop is not None:
+            self.prealarm_to_alarm_loop.stop()
+        self.prealarm = prealarm or None
+        self.prealarm_to_alarm_loop = None
 
         if prealarm:
-            self.prealarm = prealarm
-            self.prealarm_to_alarm_loop = miqro.Loop(
-                self.do_alarm, timedelta(**self.prealarm), False
+            self.prealarm_to_alarm_loop = self.service.scheduler.timer(
+                self.do_alarm, timedelta(**prealarm)
             )
-            self.service.add_loop(self.prealarm_to_alarm_loop)
+        if running:
+            if self.prealarm_to_alarm_loop is not None:
+                self.prealarm_to_alarm_loop.start(delayed=True)
+            else:
+                self.do_alarm("configuration reload")
 
-        if reset_delay:
-            self.reset_delay = reset_delay
+    def _set_reset_delay(self, reset_delay):
+        running = self.alarm_to_reset_loop is not None and (
+            self.alarm_to_reset_loop.active
+        )
+        if self.alarm_to_reset_loop is not None:
+            self.alarm_to_reset_loop.stop()
+        self.reset_delay = reset_delay or None
+        self.alarm_to_reset_loop = None
 
-            self.alarm_to_reset_loop = miqro.Loop(
-                self.do_reset, timedelta(**self.reset_delay), False
+        if reset_delay:
+            self.alarm_to_reset_loop = self.service.scheduler.timer(
+                self.do_reset, timedelta(**reset_delay)
             )
-            self.service.add_loop(self.alarm_to_reset_loop)
+            if running:
+                self.alarm_to_reset_loop.start(delayed=True)
 
-        self.service.add_handler(
-            self._mqtt_topic("enabled/command"), self.handle_enabled_msg
+    def reconfigure(self, config: Dict):
+        """
+        Apply a changed configuration to this group. The state of the group and
+        all inputs, timers and entities whose configuration has not changed are
+        kept; inputs that were removed are shut down.
+        """
+        old_config, self.config = self.config, config
+        self.service.log.info(f"Reconfiguring group {self}")
+
+        relabeled = config["label"] != self.label
+        self.label = config["label"]
+
+        self.inputs = self._reuse_inputs(
+            self.inputs,
+            old_config.get("inputs", []),
+            config.get("inputs", []),
+            Input.create,
         )
-        self.service.add_handler(
-            self._mqtt_topic("inhibited/command"), self.handle_inhibit_msg
+        self.inhibitors = self._reuse_inputs(
+            self.inhibitors,
+            old_config.get("inhibitors", []),
+            config.get("inhibitors", []),
+            Input.create,
         )
-        self.service.add_handler(
-            self._mqtt_topic("reset/command"), self.handle_reset_msg
+        self.liveness = self._reuse_inputs(
+            self.liveness,
+            old_config.get("liveness", []),
+            config.get("liveness", []),
+            LivenessInput,
         )
-        self.service.add_handler(self._mqtt_topic("auto/command"), self.handle_auto_msg)
+        self._assign_roles()
+
+        if config.get("prealarm") != old_config.get("prealarm"):
+            self._set_prealarm(config.get("prealarm"))
+        if config.get("reset_delay") != old_config.get("reset_delay"):
+            self._set_reset_delay(config.get("reset_delay"))
+
+        self.reassign_outputs()
+
+        if relabeled:
+            self.service.remove_ha_device(self.ha_device)
+            self.setup_ha_entities()
+            self.service.publish_ha_device(self.ha_device)
+
+        self.request_publish_info()
+
+    def _reuse_inputs(self, inputs, old_configs, new_configs, create) -> List:
+        # inputs are matched by their configuration, so that unchanged inputs keep
+        # their state, timers and subscriptions
+        reusable: Dict[str, List[Input]] = {}
+        for input, config in zip(inputs, old_configs):
+            reusable.setdefault(_config_key(config), []).append(input)
+
+        result = []
+        for config in new_configs:
+            candidates = reusable.get(_config_key(config))
+            if candidates:
+                result.append(candidates.pop(0))
+            else:
+                result.append(create(self.service, self, **config))
 
-        self.setup_ha_entities()
+        for candidates in reusable.values():
+            for input in candidates:
+                input.shutdown()
+        return result
+
+    def reassign_outputs(self):
+        """
+        Assign the outputs from the configuration again, e.g., after outputs have
+        been replaced. If an alarm is active, it is requested from the new outputs.
+        """
+        self._assign_outputs(self.config["outputs"])
+        if self.state != AlarmState.OFF:
+            self.update_outputs(UpdateReason.UPDATE_ALARM)
+
+    def set_priority(self, priority: int):
+        self.priority = priority
+        for outputs in self.text_outputs.values():
+            for output in outputs:
+                heapify(output.groups)
+        if self.state != AlarmState.OFF:
+            # re-requesting updates the priority of the pending requests
+            self.update_outputs(UpdateReason.UPDATE_ALARM)
+
+    def shutdown(self):
+        """
+        Remove this group from the service: an active alarm is reset, and the
+        inputs, timers, command handlers and entities of the group are removed.
+        """
+        was_active = self.state != AlarmState.OFF
+        self.state = AlarmState.OFF
+
+        for input in self.inputs + self.inhibitors + self.liveness:
+            input.shutdown()
+        for timer in (
+            self.prealarm_to_alarm_loop,
+            self.alarm_to_reset_loop,
+            self.inhibit_timeout_loop,
+        ):
+            if timer is not None:
+                timer.stop()
+
+        live_text_outputs = list(self.service.text_outputs.values())
+        live_switch_outputs = list(self.service.switch_outputs.values())
+        for outputs in self.text_outputs.values():
+            for output in outputs:
+                output.remove_group(self)
+                if was_active and output in live_text_outputs:
+                    output.update(UpdateReason.SWITCH_TO_OFF, self)
+        for switch_outputs in self.switch_outputs.values():
+            for output, _ in switch_outputs:
+                if output in live_switch_outputs:
+                    output.withdraw(self)
+
+        for command in self._command_handlers():
+            self.service.remove_handler(self._mqtt_topic(command))
+        self.service.remove_ha_device(self.ha_device)
 
     def __str__(self):
         return self.label
@@ -801,11 +1554,86 @@ class AlarmGroup:
             ]
         )
 
+    def request_publish_info(self):
+        self.service.request_publish_info(self)
+
+    @staticmethod
+    def _get_member_flags(input) -> Tuple[bool, bool]:
+        # the four possible tuples are shared instead of allocated per input
+        return MEMBER_FLAGS[
+            input.get_state() == InputState.ONLINE, bool(input.get_last_value())
+        ]
+
+    def _compute_aggregates(self):
+        member_flags = {
+            input: self._get_member_flags(input)
+            for input in self.inputs + self.inhibitors + self.liveness
+        }
+        return (
+            member_flags,
+            sum(not online for online, _ in member_flags.values()),
+            sum(
+                online and active
+                for online, active in map(member_flags.get, self.inputs)
+            ),
+            sum(active for _, active in map(member_flags.get, self.inhibitors)),
+            sum(not online for online, _ in map(member_flags.get, self.liveness)),
+        )
+
+    def _recompute_aggregates(self):
+        (
+            self.member_flags,
+            self.offline_count,
+            self.active_input_count,
+            self.active_inhibitor_count,
+            self.failed_liveness_count,
+        ) = self._compute_aggregates()
+
+    def check_aggregates(self):
+        expected = self._compute_aggregates()
+        actual = (
+            self.member_flags,
+            self.offline_count,
+            self.active_input_count,
+            self.active_inhibitor_count,
+            self.failed_liveness_count,
+        )
+        assert actual == expected, f"{self} | Aggregates {actual} != {expected}"
+
+    def member_changed(self, input):
+        """
+        Called when the state or value of an input, inhibitor or liveness check of
+        this group has changed. Updates the aggregates of this group in O(1).
+        """
+        self.request_publish_info()
+
+        flags = self._get_member_flags(input)
+        online, active = flags
+        was_online, was_active = self.member_flags[input]
+        if flags != (was_online, was_active):
+            self.member_flags[input] = flags
+            self.offline_count += was_online - online
+            if input.role is InputRole.INPUT:
+                self.active_input_count += (online and active) - (
+                    was_online and was_active
+                )
+            elif input.role is InputRole.INHIBITOR:
+                self.active_inhibitor_count += active - was_active
+            else:
+                self.failed_liveness_count += was_online - online
+
+        if self.service.debug_check_aggregates:
+            self.check_aggregates()
+
+    def any_inhibitor_active(self):
+        return self.inhibited_by_command or self.active_inhibitor_count > 0
+
     def on(self, input):
+        if self.service.latency.enabled:
+            self.service.latency.mark("group", self)
         self.update_sensor_stream(input)
-        self.service.log.info(f" {self} | {input} is on, from state: {self.state}")
 
-        if input in self.inhibitors:
+        if input.role is InputRole.INHIBITOR:
             if self.state == AlarmState.PREALARM:
                 self.do_reset(input)
             return
@@ -815,15 +1643,21 @@ class AlarmGroup:
             self.alarm_to_reset_loop.stop()
 
         if not self.enabled:
-            self.service.log.info(f"{self} is disabled, ignoring")
+            self.service.events.record(
+                EventType.INPUT_IGNORED, self, input, True, "disabled"
+            )
             return
 
         if self.inhibited_by_command:
-            self.service.log.info(f"{self} is inhibited by command, ignoring")
+            self.service.events.record(
+                EventType.INPUT_IGNORED, self, input, True, "inhibited by command"
+            )
             return
 
-        if any(i.get_last_value() for i in self.inhibitors):
-            self.service.log.info(f"{self} is inhibited by inhibitor, ignoring")
+        if self.active_inhibitor_count:
+            self.service.events.record(
+                EventType.INPUT_IGNORED, self, input, True, "inhibited by inhibitor"
+            )
             return
 
         if self.state == AlarmState.OFF:
@@ -836,20 +1670,14 @@ class AlarmGroup:
         if not self.state in [AlarmState.ALARM, AlarmState.PREALARM]:
             return
 
-        self.service.log.info(f" {self} | {input} is off, from state: {self.state}")
-
         if not self.reset_delay:  # never reset this alarm automatically
             # self.update_outputs(UpdateReason.UPDATE_ALARM)
             return
 
         assert self.alarm_to_reset_loop
 
-        input_states_off_or_invalid = (
-            (i.get_state() != InputState.ONLINE or i.get_last_value() == False)
-            for i in self.inputs
-        )
-
-        if all(input_states_off_or_invalid):
+        # all inputs are off or not online
+        if self.active_input_count == 0:
             self.service.log.info(f"Starting timeout for alarm reset")
             self.alarm_to_reset_loop.start(delayed=True)
 
@@ -858,14 +1686,17 @@ class AlarmGroup:
             self.do_alarm(trigger)
             return
 
+        if self.service.latency.enabled:
+            self.service.latency.mark("prealarm", self)
         self.service.log.info(
             f">> {self} | Prealarm triggered by {type(trigger)} '{trigger}', from state: {self.state}"
         )
+        self._record_transition(trigger, AlarmState.PREALARM)
         assert self.state != AlarmState.PREALARM
 
         self.state = AlarmState.PREALARM
         self.update_outputs(UpdateReason.SWITCH_TO_PREALARM)
-        self.service.request_publish_info()
+        self.request_publish_info()
 
         if self.prealarm:
             assert self.prealarm_to_alarm_loop
@@ -875,11 +1706,12 @@ class AlarmGroup:
         self.service.log.info(
             f">> {self} | Alarm triggered by {type(trigger)} '{trigger}', from state: {self.state}"
         )
+        self._record_transition(trigger, AlarmState.ALARM)
         assert self.state != AlarmState.ALARM
 
         self.state = AlarmState.ALARM
         self.update_outputs(UpdateReason.SWITCH_TO_ALARM)
-        self.service.request_publish_info()
+        self.request_publish_info()
 
         if self.prealarm:
             assert self.prealarm_to_alarm_loop
@@ -890,11 +1722,12 @@ class AlarmGroup:
         self.service.log.info(
             f">> {self} | Reset triggered by {type(trigger)} '{trigger}', from state: {self.state}"
         )
+        self._record_transition(trigger, AlarmState.OFF)
         assert self.state in [AlarmState.ALARM, AlarmState.PREALARM]
 
         self.state = AlarmState.OFF
         self.reset_outputs()
-        self.service.request_publish_info()
+        self.request_publish_info()
 
         if self.prealarm:
             assert self.prealarm_to_alarm_loop
@@ -906,12 +1739,34 @@ class AlarmGroup:
 
         return False  # stop the reset loop if triggered from there
 
+    def _record_transition(self, trigger, state: AlarmState):
+        # called before the state changes; a timer passes the service as trigger
+        if not isinstance(trigger, (Input, str)):
+            trigger = "timeout"
+        self.service.events.record(
+            EventType.TRANSITION, self, trigger, state, self.state
+        )
+        if self.service.history is not None:
+            self.service.history.record(
+                self,
+                "transition",
+                {
+                    "from": self.state.name.lower(),
+                    "to": state.name.lower(),
+                    "trigger": str(trigger),
+                },
+            )
+
+    def _record_command(self, kind, data):
+        if self.service.history is not None:
+            self.service.history.record(self, kind, data)
+
     def update_outputs(self, update_reason: UpdateReason):
         for output, schedule in self.switch_outputs.get(self.state.name.lower(), []):
             output.request(self, schedule)
 
         for output in self.text_outputs.get(self.state.name.lower(), []):
-            output.update(update_reason)
+            output.update(update_reason, self)
 
     def reset_outputs(self):
         for _, outputs in self.switch_outputs.items():
@@ -921,69 +1776,72 @@ class AlarmGroup:
         # Reset text outputs: They react only when a *new* input has triggered; so reset after the alarm is required
         for _, outputs in self.text_outputs.items():
             for output in outputs:
-                output.update(UpdateReason.SWITCH_TO_OFF)
+                output.update(UpdateReason.SWITCH_TO_OFF, self)
 
     def inhibit_timeout(self, _):
         self.inhibited_by_command = False
         self.service.log.info(
             f"{self} | Inhibit by command timeout, state: {self.state}"
         )
-        self.service.request_publish_info()
+        self.request_publish_info()
         return False
 
     def all_ok(self):
-        return all(
-            i.get_state() == InputState.ONLINE
-            for i in self.inputs + self.liveness + self.inhibitors
-        )
-
-    def get_state(self):
-        self.service.log.debug(f"{self} | Assembling state")
+        return self.offline_count == 0
 
-        if not self.enabled:
-            display_state = "disabled"
-        else:
-            if self.inhibited_by_command or any(
-                i.get_last_value() for i in self.inhibitors
-            ):
-                display_state = "inhibited"
-            else:
-                display_state = "enabled"
+    def get_display_state(self):
         if self.state == AlarmState.PREALARM:
             display_state = "prealarm"
         elif self.state == AlarmState.ALARM:
             display_state = "alarm"
+        elif not self.enabled:
+            display_state = "disabled"
+        elif self.any_inhibitor_active():
+            display_state = "inhibited"
+        else:
+            display_state = "enabled"
+        return display_state
+
+    def get_state(self):
+        # Assembles the state in a single pass over all inputs, inhibitors and
+        # liveness checks; the aggregates are maintained by member_changed.
+        active_inputs = []
+        inputs = {}
+        for input in self.inputs:
+            state, value = input.get_state(), input.get_last_value()
+            inputs[input.label] = {"state": state.name.lower(), "value": value}
+            if state == InputState.ONLINE and value:
+                active_inputs.append(str(input))
+
+        inhibitors = {}
+        for input in self.inhibitors:
+            inhibitors[input.label] = {
+                "state": input.get_state().name.lower(),
+                "value": input.get_last_value(),
+            }
+
+        liveness = {}
+        for input in self.liveness:
+            liveness[input.label] = {
+                "state": input.get_state().name.lower(),
+                "value": input.get_last_value(),
+            }
 
-        live = all(input.get_state() == InputState.ONLINE for input in self.liveness)
-        data = {
+        return {
             "all_inputs_online": self.all_ok(),
             "enabled/state": self.enabled,
             "inhibited/state": self.inhibited_by_command,
-            "any_inhibitor_active": self.inhibited_by_command
-            or any(i.get_last_value() for i in self.inhibitors),
+            "any_inhibitor_active": self.any_inhibitor_active(),
             "state": self.state.name.lower(),
-            "display_state": display_state,
-            "live": live,
-            "input": {},
-            "inhibitor": {},
-            "liveness": {},
+            "display_state": self.get_display_state(),
+            "live": self.failed_liveness_count == 0,
+            "input": inputs,
+            "inhibitor": inhibitors,
+            "liveness": liveness,
             "label": self.label,
-            "active_inputs_text": self.get_active_inputs_string() or "none",
+            "active_inputs_text": ", ".join(active_inputs) or "none",
         }
 
-        for category, elements in [
-            ("input", self.inputs),
-            ("inhibitor", self.inhibitors),
-            ("liveness", self.liveness),
-        ]:
-            for input in elements:
-                data[category][input.label] = {
-                    "state": input.get_state().name.lower(),
-                    "value": input.get_last_value(),
-                }
-
-        return data
-
     def handle_enabled_msg(self, _, msg):
         self.set_enabled(is_on(msg))
 
@@ -994,7 +1852,8 @@ class AlarmGroup:
             self.inhibited_by_command = False
 
         self.service.log.info(f"{self} | Enabled: {self.enabled}")
-        self.service.request_publish_info()
+        self._record_command("enabled", {"value": self.enabled})
+        self.request_publish_info()
 
     def handle_inhibit_msg(self, _, msg):
         self.inhibited_by_command = msg.isnumeric() and int(msg) > 0
@@ -1007,9 +1866,18 @@ class AlarmGroup:
             self.inhibit_timeout_loop.start(delayed=True)
 
         self.service.log.info(f"{self} | Inhibited: {self.inhibited_by_command}")
-        self.service.request_publish_info()
+        self._record_command(
+            "inhibit",
+            {
+                "value": self.inhibited_by_command,
+                "seconds": int(msg) if self.inhibited_by_command else None,
+            },
+        )
+        self.request_publish_info()
 
     def handle_reset_msg(self, _, msg):
+        if is_on(msg):
+            self._record_command("reset", {"state": self.state.name.lower()})
         if is_on(msg) and self.state in [AlarmState.ALARM, AlarmState.PREALARM]:
             self.do_reset("MQTT message, reseted=1")
 
@@ -1021,19 +1889,20 @@ class AlarmGroup:
         if not is_on(msg):
             return
         if self.state in [AlarmState.ALARM, AlarmState.PREALARM]:
+            self._record_command("reset", {"state": self.state.name.lower()})
             self.do_reset("MQTT message, auto=1")
             return
 
         self.set_enabled(not self.enabled)
         self.service.log.info(f"{self} | Enabled via auto: {self.enabled}")
-        self.service.request_publish_info()
+        self._record_command("enabled", {"value": self.enabled})
+        self.request_publish_info()
 
     def set_enabled(self, enabled):
         self.enabled = enabled
         # store in service's state
-        assert self.service.state
-        self.service.state.set_path("group_enabled", self.name, value=enabled)
-        self.service.state.save()
+        self.service.persistence.set_path("group_enabled", self.name, value=enabled)
+        self.service.persistence.request_save()
 
     def update_sensor_stream(self, input):
         # input has changed from on to off or vice-versa. now send a nicely formatted
@@ -1051,23 +1920,99 @@ class AlarmGroup:
         return f"{self.name}/{ext}"
 
 
+def _check_window_names(mqtt, condition: Condition, release_condition=None):
+    if (
+        condition.names | getattr(release_condition, "names", frozenset())
+    ) & set(WINDOW_NAMES):
+        raise Exception(
+            f"Input {mqtt}: condition '{condition.source}' uses window statistics, but no window is configured"
+        )
+
+
+def _config_key(config: Dict) -> str:
+    return json.dumps(config, sort_keys=True, default=str)
+
+
 class AlarmService(miqro.Service):
     SERVICE_NAME = "alarm"
     USE_STATE_FILE = True
 
     probe: Optional[SwitchOutput] = None
+    clock: Clock
     text_outputs: Dict[str, TextOutput]
     switch_outputs: Dict[str, SwitchOutputGroup]
     groups: List[AlarmGroup]
+    conditions: ConditionCompiler
+    dispatcher: TopicDispatcher
+    http: HTTPDelivery
+    scheduler: Scheduler
+    latency: LatencyTracker
+    events: EventLog
+    recorder: Optional[Recorder] = None
+    history: Optional[HistoryJournal] = None
+    persistence: StatePersistence
+    discovery: DiscoveryManager
+    # the evaluation nodes of all MQTT inputs, shared by identical inputs
+    input_nodes: Dict[Tuple, InputNode]
     started: datetime
+    # MQTT messages (handled on the MQTT client's thread) and timers and reloads
+    # (run on the service loop) are handled under this lock, one at a time
+    lock: threading.RLock
+
+    config_path: Path
+    reload_requested: bool = False
 
     debug_suppress_info_publish: bool = False
-    publish_info_requested: bool = False
+    debug_check_aggregates: bool = False
+
+    # groups whose information needs to be published, and the last published
+    # information per group
+    info_requested_groups: Dict[AlarmGroup, None]
+    info_full_refresh_requested: bool = False
+    group_info: Dict[str, Dict]
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, clock: Optional[Clock] = None, **kwargs):
+        self.clock = clock or Clock()
+        self.lock = threading.RLock()
         super().__init__(*args, **kwargs)
 
-        self.started = datetime.now()
+        self.started = self.clock.now()
+        self.debug_check_aggregates = self.service_config.get(
+            "debug_check_aggregates", False
+        )
+        self.conditions = ConditionCompiler()
+        self.dispatcher = TopicDispatcher(self)
+        self.http = HTTPDelivery(self, **self.service_config.get("http", {}))
+        self.scheduler = Scheduler(self.clock.monotonic)
+        self.add_loop(SchedulerLoop(self.scheduler, self.lock))
+        self.latency = LatencyTracker(self, **self.service_config.get("latency", {}))
+        self.events = EventLog(self, **self.service_config.get("events", {}))
+        if self.service_config.get("recording", None):
+            self.recorder = Recorder(self, **self.service_config["recording"])
+        if self.service_config.get("history", None):
+            self.history = HistoryJournal(self, **self.service_config["history"])
+        self.persistence = StatePersistence(
+            self, **self.service_config.get("persistence", {})
+        )
+        self.notifications = WarningAggregator(
+            self, **self.service_config.get("warnings", {})
+        )
+        # the devices of this service only (miqro keeps them in a class attribute)
+        self.ha_devices = []
+        self.discovery = DiscoveryManager(
+            self, **self.service_config.get("ha_discovery", {})
+        )
+
+        self.input_nodes = {}
+        self.info_requested_groups = {}
+        self.group_info = {}
+        self.publish_info_timer = self.scheduler.timer(
+            self._publish_info_on_request, timedelta(0)
+        )
+        self.publish_info_interval_timer = self.scheduler.timer(
+            self._publish_info_interval, timedelta(seconds=180)
+        )
+        self.publish_info_interval_timer.start()
 
         if self.service_config.get("probe", None):
             self.log.debug(f"Creating probe output.")
@@ -1077,71 +2022,434 @@ class AlarmService(miqro.Service):
         self.create_outputs()
         self.create_alarm_groups()
 
+        for topic, count in self.dispatcher.subscriber_counts().items():
+            self.log.debug(f"Topic {topic}: {count} subscriber(s)")
+
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGHUP, self.request_reload)
+
     def create_outputs(self):
         self.text_outputs = {}
         for name, config in self.service_config.get("text_outputs", {}).items():
             self.log.debug(f"Creating text output: {name}")
-            self.text_outputs[name] = TextOutput(self, **config)
+            self.text_outputs[name] = self._create_output(TextOutput, name, config)
 
         self.switch_outputs = {}
         for name, config in self.service_config.get("switch_outputs", {}).items():
             self.log.debug(f"Creating switch output: {name}")
-            self.switch_outputs[name] = SwitchOutputGroup(self, **config)
+            self.switch_outputs[name] = self._create_output(
+                SwitchOutputGroup, name, config
+            )
 
-    def warning(self, msg):
+    def _create_output(self, cls, name, config):
+        output = cls(self, **config)
+        output.name = name
+        return output
+
+    def add_command_handler(self, ext, handler):
+        """
+        Add a handler for a command topic below the service's topic. Commands are
+        recorded, if recording is enabled.
+        """
+
+        def handle_command(service, msg):
+            if self.recorder is not None:
+                self.recorder.record(self.data_topic_prefix + ext, msg)
+            handler(service, msg)
+
+        self.add_handler(ext, handle_command)
+
+    def warning(self, msg, key=None, category=None, subject=None):
         self.log.warning(msg)
-        for output in self.text_outputs.values():
-            if output.info:
-                output.send_info(msg)
+        self.notifications.warning(msg, key=key, category=category, subject=subject)
 
     def create_alarm_groups(self):
         self.groups = []
-        priority = 100
-        for config in self.service_config["groups"]:
-            priority += 1
+        for priority, config in self._group_configs(self.service_config):
             self.log.debug(f"Creating group: {config['name']}")
+            self.groups.append(self._create_group(priority, config))
 
-            if "priority" in config:
-                the_priority = config["priority"]
-                del config["priority"]
-            else:
-                the_priority = priority
+    @staticmethod
+    def _group_configs(service_config) -> List[Tuple[int, Dict]]:
+        # the priority of a group defaults to its position in the configuration
+        result = []
+        for position, config in enumerate(service_config["groups"], start=101):
+            config = dict(config)
+            result.append((config.pop("priority", position), config))
+        return result
+
+    def _create_group(self, priority, config) -> AlarmGroup:
+        group = AlarmGroup(self, priority=priority, **config)
+        group.config = config
+        return group
+
+    def remove_handler(self, ext):
+        """
+        Remove the handlers for a topic below the service's topic.
+        """
+        self.mqtt_handlers = [(t, h) for t, h in self.mqtt_handlers if t != ext]
+        if self.is_connected:
+            self.log.info(f"Unsubscribing from {self.data_topic_prefix + ext}")
+            self.mqtt_client.unsubscribe(self.data_topic_prefix + ext)
+
+    def remove_global_handler(self, topic):
+        self.mqtt_global_handlers = [
+            (t, h) for t, h in self.mqtt_global_handlers if t != topic
+        ]
+        if self.is_connected:
+            self.log.info(f"Unsubscribing from {topic}")
+            self.mqtt_client.unsubscribe(topic)
+
+    def _publish_ha_discovery(self):
+        self.discovery.publish_all()
+        for entity in self.ha_entities:
+            entity.publish_discovery(self.discovery.prefix)
+
+    def publish_ha_device(self, device):
+        # devices created after connecting are not covered by the initial discovery
+        self.discovery.publish(device)
+
+    def remove_ha_device(self, device):
+        self.ha_devices.remove(device)
+        self.discovery.remove(device)
+
+    def _read_config(self, add_config_file_path=None):
+        super()._read_config(add_config_file_path)
+        # remember where the configuration was found, to read it again on reload
+        self.config_path = next(
+            path for path in self.CONFIG_FILE_PATHS if path.exists()
+        )
 
-            self.groups.append(AlarmGroup(self, priority=the_priority, **config))
+    def reload(self) -> Dict:
+        """
+        Read the configuration file again and apply the changes to the running
+        service. Only groups and outputs whose configuration has changed are
+        created, removed or updated; everything else keeps its state, timers and
+        subscriptions. Changes to other settings require a restart.
+        """
+        self.log.info(f"Reloading configuration from {self.config_path}")
+        try:
+            with self.config_path.open() as f:
+                config = load(f, Loader=FullLoader)
+            report = self.apply_config(config)
+        except Exception as e:
+            self.log.exception(e)
+            report = {"error": str(e)}
+        self.publish_json("reload", report)
+        return report
+
+    def apply_config(self, config: Dict) -> Dict:
+        service_config = config.get("services", {}).get(self.SERVICE_NAME, {})
+        self._check_config(service_config)
+
+        restart_required = sorted(
+            key
+            for key in set(self.service_config) | set(service_config)
+            if key not in ("groups", "text_outputs", "switch_outputs")
+            and self.service_config.get(key) != service_config.get(key)
+        ) + sorted(
+            key
+            for key in set(self.config) | set(config)
+            if key != "services" and self.config.get(key) != config.get(key)
+        )
+        for key in restart_required:
+            self.log.warning(f"Reload: Changes to '{key}' require a restart")
 
-    @miqro.loop(seconds=180)
-    def _publish_info_interval(self):
+        # all new objects are created before anything is removed or replaced
+        text_outputs = self._build_outputs("text_outputs", TextOutput, service_config)
+        switch_outputs = self._build_outputs(
+            "switch_outputs", SwitchOutputGroup, service_config
+        )
+        report = {
+            "text_outputs": self._replace_outputs(
+                "text_outputs", service_config, *text_outputs
+            ),
+            "switch_outputs": self._replace_outputs(
+                "switch_outputs", service_config, *switch_outputs
+            ),
+        }
+        outputs_replaced = any(
+            changes["added"] or changes["updated"] for changes in report.values()
+        )
+        report["groups"] = self._reload_groups(service_config, outputs_replaced)
+        report["restart_required"] = restart_required
+
+        self.service_config["groups"] = service_config["groups"]
+        for kind in ("text_outputs", "switch_outputs"):
+            self.service_config[kind] = service_config.get(kind, {})
+        self.request_publish_info()
+        self.log.info(f"Reload: {report}")
+        return report
+
+    def _check_config(self, service_config):
+        # catch errors that would otherwise leave a partially applied configuration
+        names = [config["name"] for config in service_config["groups"]]
+        if len(set(names)) != len(names):
+            raise Exception("Group names must be unique")
+        for priority, config in self._group_configs(service_config):
+            AlarmGroup.check(self, priority, **config)
+        for config in service_config["groups"]:
+            for outs in config.get("outputs", {}).values():
+                for o in outs:
+                    if type(o) is dict:
+                        ((name, schedule),) = o.items()
+                        outputs = service_config.get("switch_outputs", {})
+                        if schedule not in outputs.get(name, {}):
+                            raise Exception(
+                                f"Group {config['name']}: unknown switch output '{name}: {schedule}'"
+                            )
+                    elif o not in service_config.get("text_outputs", {}):
+                        raise Exception(
+                            f"Group {config['name']}: unknown text output '{o}'"
+                        )
+
+    def _build_outputs(self, kind, cls, service_config) -> Tuple[Dict, Dict]:
+        """
+        Create the outputs whose configuration was added or changed, without
+        touching the current outputs. Returns the changes and the new outputs.
+        """
+        outputs = getattr(self, kind)
+        old_configs = self.service_config.get(kind, {})
+        new_configs = service_config.get(kind, {})
+        changes: Dict[str, List[str]] = {"added": [], "removed": [], "updated": []}
+        created = {}
+
+        for name in outputs:
+            if name not in new_configs:
+                changes["removed"].append(name)
+        for name, config in new_configs.items():
+            if name in outputs and config == old_configs.get(name):
+                continue
+            created[name] = self._create_output(cls, name, config)
+            changes["updated" if name in outputs else "added"].append(name)
+        return changes, created
+
+    def _replace_outputs(
+        self, kind, service_config, changes, created
+    ) -> Dict[str, List[str]]:
+        outputs = getattr(self, kind)
+        for name in changes["removed"] + changes["updated"]:
+            self.log.info(f"Reload: Removing {kind} {name}")
+            outputs.pop(name).shutdown()
+        if kind == "text_outputs":
+            for name in changes["removed"]:
+                self.notifications.remove_output(name)
+        for name in created:
+            self.log.info(f"Reload: Creating {kind} {name}")
+        outputs.update(created)
+        setattr(
+            self,
+            kind,
+            {name: outputs[name] for name in service_config.get(kind, {})},
+        )
+        return changes
+
+    def _reload_groups(self, service_config, outputs_replaced) -> Dict:
+        existing = {group.name: group for group in self.groups}
+        changes: Dict = {"added": [], "removed": [], "updated": [], "unchanged": 0}
+
+        new_configs = self._group_configs(service_config)
+        groups = []
+        for priority, config in new_configs:
+            group = existing.get(config["name"])
+            if group is None:
+                self.log.info(f"Reload: Creating group {config['name']}")
+                group = self._create_group(priority, config)
+                self.publish_ha_device(group.ha_device)
+                changes["added"].append(group.name)
+            elif config != group.config or priority != group.priority:
+                if config != group.config:
+                    group.reconfigure(config)
+                elif outputs_replaced:
+                    group.reassign_outputs()
+                if priority != group.priority:
+                    group.set_priority(priority)
+                changes["updated"].append(group.name)
+            else:
+                if outputs_replaced:
+                    group.reassign_outputs()
+                changes["unchanged"] += 1
+            groups.append(group)
+
+        # removed last, so that inputs shared with other groups stay subscribed
+        for name, group in existing.items():
+            if group not in groups:
+                self.log.info(f"Reload: Removing group {group}")
+                group.shutdown()
+                self.group_info.pop(name, None)
+                self.info_requested_groups.pop(group, None)
+                changes["removed"].append(name)
+        self.groups = groups
+        return changes
+
+    def request_reload(self, *_):
+        # called from the signal handler; the reload runs in the service loop
+        self.reload_requested = True
+
+    def _on_message(self, client, userdata, msg):
+        with self.lock:
+            super()._on_message(client, userdata, msg)
+
+    def _loop_step(self):
+        if self.reload_requested:
+            self.reload_requested = False
+            with self.lock:
+                self.reload()
+        super()._loop_step()
+
+    def _publish_info_interval(self, _):
         if not self.debug_suppress_info_publish:
             self.request_publish_info()
 
-    @miqro.loop(seconds=0.2)
-    def _publish_info_on_request(self):
-        if self.publish_info_requested:
+    def request_publish_info(self, group: Optional[AlarmGroup] = None):
+        """
+        Request publishing the information of the given group, or of all groups.
+        Requests are collected and published together on the next loop step.
+        """
+        if group is None:
+            self.info_full_refresh_requested = True
+        else:
+            self.info_requested_groups[group] = None
+        self.publish_info_timer.start()
+
+    def _publish_info_on_request(self, _):
+        if self.info_full_refresh_requested:
+            self.info_full_refresh_requested = False
+            self.info_requested_groups = {}
             self.publish_info()
-            self.publish_info_requested = False
+        else:
+            groups, self.info_requested_groups = self.info_requested_groups, {}
+            self.publish_info(list(groups))
+        return False
 
-    def request_publish_info(self):
-        self.publish_info_requested = True
+    def publish_info(self, groups: Optional[List[AlarmGroup]] = None):
+        """
+        Publish the information of the given groups; if no groups are given,
+        publish all groups. When groups are given, only those whose information
+        has changed since it was last published are published again.
+        """
+        if groups is None:
+            groups, changed_only = self.groups, False
+        else:
+            groups, changed_only = groups + [
+                group for group in self.groups if group.name not in self.group_info
+            ], True
 
-    def publish_info(self):
-        data = {group.name: group.get_state() for group in self.groups}
-        self.publish_json("info", data, only_if_changed=timedelta(seconds=60))
-        for group in self.groups:
+        changed = False
+        for group in groups:
             data = group.get_state()
-            self.publish_json(f"{group.name}/info", data, only_if_changed=timedelta(seconds=30))
-        self.publish_json_keys(data, only_if_changed=True)
+            if changed_only and data == self.group_info.get(group.name):
+                continue
+            self.group_info[group.name] = data
+            changed = True
+            self.publish_json(
+                f"{group.name}/info", data, only_if_changed=timedelta(seconds=30)
+            )
+            self.publish_json_keys(data, group.name, only_if_changed=True)
+
+        if changed:
+            self.publish_json(
+                "info",
+                {group.name: self.group_info[group.name] for group in self.groups},
+                only_if_changed=timedelta(seconds=60),
+            )
 
     @miqro.handle("reset/command")
     def handle_reset_command(self, _, msg):
         for group in self.groups:
             group.handle_reset_msg(_, msg)
 
-    @miqro.loop(minutes=5)
-    def save_state(self):
-        self.state.save()
+    def get_diagnostics(self):
+        return {
+            "topic_subscribers": self.dispatcher.subscriber_counts(),
+            "input_nodes": {
+                "nodes": len(self.input_nodes),
+                "inputs": sum(len(node.inputs) for node in self.input_nodes.values()),
+            },
+            "conditions": self.conditions.get_stats(),
+            "http": self.http.get_stats(),
+            "warnings": self.notifications.get_stats(),
+            "ha_discovery": self.discovery.get_stats(),
+            "events": self.events.get_stats(),
+        }
+
+    @miqro.handle("reload/command")
+    def handle_reload_command(self, msg):
+        # called from the MQTT client's thread; the reload runs in the service loop
+        if is_on(msg):
+            self.request_reload()
+
+    @miqro.handle("discovery/command")
+    def handle_discovery_command(self, msg):
+        if is_on(msg):
+            self.discovery.publish_all(force=True)
+
+    @miqro.handle("latency/command")
+    def handle_latency_command(self, msg):
+        self.latency.set_enabled(is_on(msg))
+
+    @miqro.handle("events/command")
+    def handle_events_command(self, msg):
+        # e.g., "200" or {"limit": 200, "group": "g1", "types": ["transition"]}
+        request = try_json(msg) if msg.strip() else {}
+        if isinstance(request, int):
+            request = {"limit": request}
+        if not isinstance(request, dict):
+            request = {}
+        try:
+            events = self.events.query(
+                **{k: request[k] for k in ("limit", "group", "types") if k in request}
+            )
+        except Exception as e:
+            self.publish_json("events", {"request": request, "error": str(e)})
+            return
+        self.publish_json("events", {"request": request, "events": events})
+
+    @miqro.handle("history/command")
+    def handle_history_command(self, msg):
+        # e.g., {"group": "frost", "since": "2024-01-01", "kinds": ["transition"]}
+        request = try_json(msg) if msg.strip() else {}
+        if not isinstance(request, dict):
+            request = {}
+        if self.history is None:
+            self.publish_json("history", {"request": request, "error": "not enabled"})
+            return
+        try:
+            records = self.history.query(
+                **{
+                    k: request[k]
+                    for k in ("group", "since", "until", "kinds", "limit")
+                    if k in request
+                }
+            )
+        except Exception as e:
+            self.publish_json("history", {"request": request, "error": str(e)})
+            return
+        self.publish_json("history", {"request": request, "records": records})
+
+    @miqro.handle("diagnostics/command")
+    def handle_diagnostics_command(self, msg):
+        self.publish_json("diagnostics", self.get_diagnostics())
+
+    def run(self):
+        try:
+            super().run()
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        self.http.shutdown()
+        self.persistence.shutdown()
+        if self.recorder is not None:
+            self.recorder.shutdown()
+        if self.history is not None:
+            self.history.shutdown()
 
 
 def run():
+    if sys.argv[1:2] == ["history"]:
+        history_main(sys.argv[2:])
+        return
     miqro.run(AlarmService)
 
 
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+from time import monotonic
+from typing import Optional
+
+
+class Clock:
+    """
+    The time as seen by the service: `monotonic()` for timers and the times of
+    messages kept at runtime, `now()` for timestamps that are shown or stored.
+    """
+
+    def monotonic(self) -> float:
+        return monotonic()
+
+    def now(self) -> datetime:
+        return datetime.now()
+
+    def to_datetime(self, time: Optional[float]) -> Optional[datetime]:
+        """
+        The wall clock time of a time on the monotonic clock.
+        """
+        if time is None:
+            return None
+        return self.now() - timedelta(seconds=self.monotonic() - time)
+
+    def from_datetime(self, time: Optional[datetime]) -> Optional[float]:
+        """
+        The time on the monotonic clock of a wall clock time, e.g., from the state
+        file. Times before the start of the monotonic clock are negative.
+        """
+        if time is None:
+            return None
+        return self.monotonic() - (self.now() - time).total_seconds()
+
+
+class VirtualClock(Clock):
+    """
+    A clock that only advances when told to. Used to simulate days of traffic in
+    seconds: `run_until` jumps from one timer deadline to the next and runs the
+    timers due at each, so the results are the same as when running in real time.
+    """
+
+    start: datetime
+    elapsed: float = 0.0
+
+    def __init__(self, start: Optional[datetime] = None):
+        self.start = start or datetime.now()
+
+    def monotonic(self) -> float:
+        return self.elapsed
+
+    def now(self) -> datetime:
+        return self.start + timedelta(seconds=self.elapsed)
+
+    def run_until(self, service, elapsed: float):
+        """
+        Advance the clock to `elapsed` seconds after the start, running all timers
+        of the service whose deadlines are passed on the way.
+        """
+        scheduler = service.scheduler
+        while (deadline := scheduler.next_deadline()) is not None and deadline <= elapsed:
+            self.elapsed = max(self.elapsed, deadline)
+            scheduler.run_due(service)
+        self.elapsed = max(self.elapsed, elapsed)
+        scheduler.run_due(service)
+
+    def advance(self, service, seconds: float):
+        self.run_until(service, self.elapsed + seconds)
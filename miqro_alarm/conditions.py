@@ -0,0 +1,494 @@
+import ast
+import operator
+from functools import cached_property
+from types import CodeType
+from typing import Any, Callable, Dict, FrozenSet, Optional, Tuple
+from json import loads
+
+
+def is_on(value):
+    return value.lower() in [
+        "1",
+        "yes",
+        "on",
+        "true",
+    ]
+
+
+def is_off(value):
+    return not is_on(value)
+
+
+def try_float(inval):
+    try:
+        return float(inval)
+    except (ValueError, TypeError):
+        return float("NaN")
+
+
+def try_json(inval):
+    try:
+        return loads(inval)
+    except Exception as e:
+        return {}
+
+
+class Payload:
+    """
+    A received MQTT message. Decoded forms of the value are computed on first access
+    and cached, so each is computed at most once per message.
+    """
+
+    raw: str
+
+    def __init__(self, raw: str):
+        self.raw = raw
+
+    @cached_property
+    def value_float(self):
+        return try_float(self.raw)
+
+    @cached_property
+    def value_json(self):
+        return try_json(self.raw)
+
+
+# Statistics over recent values, provided by the window of an input (see
+# miqro_alarm.window.SampleWindow).
+WINDOW_NAMES = (
+    "window_mean",
+    "window_min",
+    "window_max",
+    "window_median",
+    "window_rate",
+    "window_count",
+)
+
+# Names that are provided by the payload and are only computed when a condition
+# references them.
+LAZY_NAMES = ("value_float", "value_json") + WINDOW_NAMES
+
+CONDITION_FUNCTIONS = {
+    "is_on": is_on,
+    "is_off": is_off,
+    "abs": abs,
+    "min": min,
+    "max": max,
+    "round": round,
+    "sum": sum,
+    "len": len,
+    "any": any,
+    "all": all,
+    "bool": bool,
+    "int": int,
+    "float": float,
+    "str": str,
+}
+
+# Globals for evaluating conditions: the functions above and no builtins.
+CONDITION_GLOBALS = {"__builtins__": {}, **CONDITION_FUNCTIONS}
+
+# Syntax that is allowed in conditions. Notably, attribute access, lambdas,
+# assignments and calls of anything but CONDITION_FUNCTIONS are not.
+ALLOWED_NODES = (
+    ast.Expression,
+    ast.Constant,
+    ast.Name,
+    ast.Load,
+    ast.Store,
+    ast.BoolOp,
+    ast.And,
+    ast.Or,
+    ast.UnaryOp,
+    ast.Not,
+    ast.USub,
+    ast.UAdd,
+    ast.BinOp,
+    ast.Add,
+    ast.Sub,
+    ast.Mult,
+    ast.Div,
+    ast.FloorDiv,
+    ast.Mod,
+    ast.Pow,
+    ast.Compare,
+    ast.Eq,
+    ast.NotEq,
+    ast.Lt,
+    ast.LtE,
+    ast.Gt,
+    ast.GtE,
+    ast.In,
+    ast.NotIn,
+    ast.Is,
+    ast.IsNot,
+    ast.IfExp,
+    ast.Subscript,
+    ast.Slice,
+    ast.Tuple,
+    ast.List,
+    ast.Set,
+    ast.Dict,
+    ast.Call,
+    ast.GeneratorExp,
+    ast.ListComp,
+    ast.SetComp,
+    ast.comprehension,
+)
+
+
+def validate(tree: ast.Expression, source: str):
+    """
+    Raise an exception if the condition uses anything but the allowed syntax,
+    functions and names.
+    """
+    bound = {
+        target.id
+        for node in ast.walk(tree)
+        if isinstance(node, ast.comprehension)
+        for target in ast.walk(node.target)
+        if isinstance(target, ast.Name)
+    }
+    allowed_names = {"value", *LAZY_NAMES, *CONDITION_FUNCTIONS, *bound}
+
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise Exception(
+                f"Invalid condition '{source}': {type(node).__name__} is not allowed"
+            )
+        if isinstance(node, ast.Name) and node.id not in allowed_names:
+            raise Exception(f"Invalid condition '{source}': unknown name '{node.id}'")
+        if isinstance(node, ast.Call) and not (
+            isinstance(node.func, ast.Name) and node.func.id in CONDITION_FUNCTIONS
+        ):
+            raise Exception(
+                f"Invalid condition '{source}': only {', '.join(CONDITION_FUNCTIONS)} can be called"
+            )
+
+
+def referenced_names(code: CodeType) -> FrozenSet[str]:
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            names |= referenced_names(const)
+    return frozenset(names)
+
+
+class Condition:
+    """
+    A `when` expression of an input. It is validated against the allowed syntax and
+    compiled once into a code object, which is evaluated without builtins.
+    """
+
+    source: str
+    code: CodeType
+    names: FrozenSet[str]
+    lazy_names: Tuple[str, ...]
+    namespace: Dict[str, Any]
+
+    def __init__(self, source: str):
+        self.source = source
+        try:
+            tree = ast.parse(source, mode="eval")
+        except SyntaxError as e:
+            raise Exception(f"Invalid condition '{source}': {e.msg}") from e
+        validate(tree, source)
+        self.code = compile(tree, f"<when: {source}>", "eval")
+        self.names = referenced_names(self.code)
+        self.lazy_names = tuple(name for name in LAZY_NAMES if name in self.names)
+        # messages are handled one at a time, so the namespace can be reused
+        self.namespace = dict(CONDITION_GLOBALS)
+
+    def evaluate(self, payload: Payload):
+        namespace = self.namespace
+        namespace["value"] = payload.raw
+        for name in self.lazy_names:
+            namespace[name] = getattr(payload, name)
+        return eval(self.code, namespace)
+
+    def __str__(self):
+        return self.source
+
+
+class FastCondition(Condition):
+    """
+    A condition that follows one of the common patterns recognized by `optimize`.
+    It is evaluated by a specialized predicate instead of `eval`.
+    """
+
+    predicate: Callable[[Payload], Any]
+
+    def __init__(self, source: str, predicate: Callable[[Payload], Any]):
+        super().__init__(source)
+        self.predicate = predicate
+
+    def evaluate(self, payload: Payload):
+        return self.predicate(payload)
+
+
+COMPARISONS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+
+
+def _json_path(node) -> Optional[Tuple]:
+    # value_json['a']['b'] -> ('a', 'b')
+    path = []
+    while isinstance(node, ast.Subscript):
+        if not isinstance(node.slice, ast.Constant):
+            return None
+        path.insert(0, node.slice.value)
+        node = node.value
+    if not path or not (isinstance(node, ast.Name) and node.id == "value_json"):
+        return None
+    return tuple(path)
+
+
+def _subject(node) -> Optional[Callable[[Payload], Any]]:
+    # the part of the payload a pattern looks at
+    if isinstance(node, ast.Name) and node.id == "value":
+        return lambda payload: payload.raw
+    if isinstance(node, ast.Name) and node.id == "value_float":
+        return lambda payload: payload.value_float
+    if isinstance(node, ast.Name) and node.id in WINDOW_NAMES:
+        return operator.attrgetter(node.id)
+    path = _json_path(node)
+    if path is None:
+        return None
+    if len(path) == 1:
+        (key,) = path
+
+        return lambda payload: payload.value_json[key]
+
+    def get_path(payload):
+        value = payload.value_json
+        for key in path:
+            value = value[key]
+        return value
+
+    return get_path
+
+
+def _constant(node):
+    # constants, including negative numbers, which are parsed as unary minus
+    if isinstance(node, ast.Constant):
+        return True, node.value
+    if (
+        isinstance(node, ast.UnaryOp)
+        and isinstance(node.op, ast.USub)
+        and isinstance(node.operand, ast.Constant)
+        and isinstance(node.operand.value, (int, float))
+    ):
+        return True, -node.operand.value
+    return False, None
+
+
+def _pattern(node) -> Optional[Callable[[Payload], Any]]:
+    # <pattern> and <pattern>, <pattern> or <pattern>
+    if isinstance(node, ast.BoolOp):
+        parts = [_pattern(value) for value in node.values]
+        if not all(parts):
+            return None
+        stop_on = isinstance(node.op, ast.Or)
+
+        def bool_op(payload):
+            for part in parts:
+                result = part(payload)
+                if bool(result) is stop_on:
+                    return result
+            return result
+
+        return bool_op
+
+    # is_on(value), is_off(value), bool(<subject>)
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and len(node.args) == 1
+        and not node.keywords
+    ):
+        name = node.func.id
+        if name in ("is_on", "is_off") and isinstance(node.args[0], ast.Name):
+            if node.args[0].id == "value":
+                function = CONDITION_FUNCTIONS[name]
+                return lambda payload: function(payload.raw)
+        if name == "bool" and (subject := _subject(node.args[0])):
+            return lambda payload: bool(subject(payload))
+        return None
+
+    # not <subject>
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        if subject := _subject(node.operand):
+            return lambda payload: not subject(payload)
+        return None
+
+    if not isinstance(node, ast.Compare):
+        return _subject(node)
+
+    # <subject> <op> <constant>
+    if len(node.ops) == 1:
+        is_constant, constant = _constant(node.comparators[0])
+        compare = COMPARISONS.get(type(node.ops[0]))
+        subject = _subject(node.left)
+        if not (is_constant and compare and subject):
+            return None
+        return lambda payload: compare(subject(payload), constant)
+
+    # <constant> <op> <subject> <op> <constant>, e.g., 18 <= value_float <= 25
+    if len(node.ops) == 2:
+        is_low_constant, low = _constant(node.left)
+        is_high_constant, high = _constant(node.comparators[1])
+        compare_low = COMPARISONS.get(type(node.ops[0]))
+        compare_high = COMPARISONS.get(type(node.ops[1]))
+        subject = _subject(node.comparators[0])
+        if not (
+            is_low_constant and is_high_constant and compare_low and compare_high
+        ) or not subject:
+            return None
+
+        def between(payload):
+            value = subject(payload)
+            return compare_low(low, value) and compare_high(value, high)
+
+        return between
+
+    return None
+
+
+def optimize(source: str) -> Optional[Callable[[Payload], Any]]:
+    """
+    Returns a predicate for conditions that follow a common pattern, e.g.,
+    `is_on(value)`, `value == 'online'`, `value_float < 2`, `18 <= value_float <= 25`
+    or `not value_json['contact']`, and combinations of these with `and` and `or`.
+    The predicate returns the same result as
+    evaluating the condition. Returns None for all other conditions.
+    """
+    try:
+        tree = ast.parse(source, mode="eval")
+    except SyntaxError:
+        return None
+    return _pattern(tree.body)
+
+
+def _number(operand):
+    if isinstance(operand, (int, float)) and not isinstance(operand, bool):
+        return operand
+    return float(operand)
+
+
+def _subjects(json_field):
+    # the expressions for the value as is and as a number
+    if json_field is None:
+        return "value", "value_float"
+    keys = json_field if isinstance(json_field, list) else [json_field]
+    subject = "value_json" + "".join(f"[{key!r}]" for key in keys)
+    return subject, subject
+
+
+DECLARATIVE_FORMS = ("equals", "not_equals", "truthy", "below", "above", "between")
+
+
+def declarative_source(when=None, json_field=None, **forms) -> str:
+    """
+    The `when` expression for a condition that is given in one of the declarative
+    forms, e.g., `below: 2` becomes `value_float < 2`. With `json_field`, the form
+    applies to that field of the JSON-decoded value.
+    """
+    given = {form: operand for form, operand in forms.items() if operand is not None}
+    unknown = set(given) - set(DECLARATIVE_FORMS)
+    if unknown:
+        raise Exception(f"Unknown condition: {', '.join(sorted(unknown))}")
+    if when is not None:
+        if given or json_field is not None:
+            raise Exception(
+                f"'when' cannot be combined with {', '.join(sorted(given)) or 'json_field'}"
+            )
+        return str(when)
+    if len(given) != 1:
+        raise Exception(
+            f"Exactly one of 'when', {', '.join(DECLARATIVE_FORMS)} must be given"
+        )
+
+    ((form, operand),) = given.items()
+    subject, number = _subjects(json_field)
+
+    if form in ("equals", "not_equals"):
+        op = "==" if form == "equals" else "!="
+        if json_field is None:
+            operand = str(operand)
+        return f"{subject} {op} {operand!r}"
+
+    if form == "truthy":
+        if json_field is None:
+            return "is_on(value)" if operand else "is_off(value)"
+        return f"bool({subject})" if operand else f"not {subject}"
+
+    if form == "between":
+        if not isinstance(operand, list) or len(operand) != 2:
+            raise Exception(f"'between' must be a list of two numbers, not {operand!r}")
+        low, high = map(_number, operand)
+        return f"{low!r} <= {number} <= {high!r}"
+
+    op = "<" if form == "below" else ">"
+    return f"{number} {op} {_number(operand)!r}"
+
+
+def release_source(
+    until=None, hysteresis=None, json_field=None, below=None, above=None, **forms
+) -> Optional[str]:
+    """
+    The expression that deactivates an active input, for inputs with hysteresis.
+    It is either given in `until`, or derived from a `below` or `above` threshold
+    and the `hysteresis`: with `below: 2` and `hysteresis: 1`, the input becomes
+    active below 2 and inactive again at 3 or above.
+    """
+    if until is not None:
+        if hysteresis is not None:
+            raise Exception("'until' cannot be combined with 'hysteresis'")
+        return str(until)
+    if hysteresis is None:
+        return None
+
+    hysteresis = _number(hysteresis)
+    if hysteresis < 0:
+        raise Exception(f"'hysteresis' must not be negative, not {hysteresis!r}")
+    _, number = _subjects(json_field)
+    if below is not None:
+        return f"{number} >= {round(_number(below) + hysteresis, 10)!r}"
+    if above is not None:
+        return f"{number} <= {round(_number(above) - hysteresis, 10)!r}"
+    raise Exception("'hysteresis' requires a 'below' or 'above' threshold")
+
+
+class ConditionCompiler:
+    """
+    Compiles conditions at configuration load. All inputs using the same expression
+    share one compiled condition. Conditions that follow a common pattern are
+    compiled into specialized predicates that are evaluated without `eval`.
+    """
+
+    cache: Dict[str, Condition]
+
+    def __init__(self):
+        self.cache = {}
+
+    def compile(self, source) -> Condition:
+        source = str(source)
+        condition = self.cache.get(source)
+        if condition is None:
+            predicate = optimize(source)
+            if predicate is not None:
+                condition = FastCondition(source, predicate)
+            else:
+                condition = Condition(source)
+            self.cache[source] = condition
+        return condition
+
+    def get_stats(self):
+        fast = sum(isinstance(c, FastCondition) for c in self.cache.values())
+        return {"fast": fast, "generic": len(self.cache) - fast}
@@ -0,0 +1,135 @@
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from threading import Lock
+from time import monotonic, sleep
+from typing import Dict, Optional
+
+from requests.adapters import HTTPAdapter
+
+
+class EndpointStats:
+    delivered: int = 0
+    failed: int = 0
+    dropped: int = 0
+    retries: int = 0
+    latency_sum: float = 0.0
+    latency_max: float = 0.0
+    last_latency: Optional[float] = None
+
+    def record_latency(self, latency):
+        self.last_latency = latency
+        self.latency_sum += latency
+        self.latency_max = max(self.latency_max, latency)
+
+    def as_dict(self, in_flight):
+        completed = self.delivered + self.failed
+        return {
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "retries": self.retries,
+            "in_flight": in_flight,
+            "latency_avg": (self.latency_sum / completed) if completed else None,
+            "latency_max": self.latency_max,
+            "latency_last": self.last_latency,
+        }
+
+
+class HTTPDelivery:
+    """
+    Sends HTTP requests on a bounded pool of background workers, so that the service
+    loop never waits for the network. Connections are kept alive in a shared session.
+
+    At most `max_in_flight` requests per endpoint are queued or running at any time;
+    further requests to that endpoint are dropped until one of them has completed.
+    Failed requests are retried with exponential backoff.
+    """
+
+    service: "AlarmService"
+    session: requests.Session
+    executor: ThreadPoolExecutor
+
+    in_flight: Dict[str, int]
+    stats: Dict[str, EndpointStats]
+
+    def __init__(
+        self,
+        service,
+        workers=2,
+        max_in_flight=1,
+        retries=2,
+        backoff={"seconds": 1},
+        timeout={"seconds": 10},
+    ):
+        self.service = service
+        self.max_in_flight = max_in_flight
+        self.retries = retries
+        self.backoff = timedelta(**backoff).total_seconds()
+        self.timeout = timedelta(**timeout).total_seconds()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="alarm-http"
+        )
+
+        self.lock = Lock()
+        self.in_flight = {}
+        self.stats = {}
+
+    def post(self, url) -> bool:
+        with self.lock:
+            stats = self.stats.setdefault(url, EndpointStats())
+            if self.in_flight.get(url, 0) >= self.max_in_flight:
+                stats.dropped += 1
+                self.service.log.warning(
+                    f"HTTP | Request to {url} still in flight, dropping new request"
+                )
+                return False
+            self.in_flight[url] = self.in_flight.get(url, 0) + 1
+
+        self.executor.submit(self._deliver, url, monotonic())
+        return True
+
+    def _deliver(self, url, queued):
+        stats = self.stats[url]
+        try:
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    sleep(self.backoff * 2 ** (attempt - 1))
+                    with self.lock:
+                        stats.retries += 1
+                try:
+                    response = self.session.post(url, timeout=self.timeout)
+                    if response.status_code >= 500:
+                        raise Exception(f"Server responded with {response.status_code}")
+                except Exception as e:
+                    error = e
+                    continue
+
+                with self.lock:
+                    stats.delivered += 1
+                    stats.record_latency(monotonic() - queued)
+                return
+
+            with self.lock:
+                stats.failed += 1
+                stats.record_latency(monotonic() - queued)
+            self.service.log.error(f"Error posting to {url}: {error}")
+        finally:
+            with self.lock:
+                self.in_flight[url] -= 1
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                url: stats.as_dict(self.in_flight.get(url, 0))
+                for url, stats in self.stats.items()
+            }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
@@ -0,0 +1,183 @@
+import json
+from datetime import timedelta
+from hashlib import sha1
+from typing import Dict
+
+from miqro.ha_sensors import Device
+
+
+def discovery_payload(device: Device) -> Dict:
+    """
+    The device-based discovery configuration of a device and its entities, as
+    published by miqro's Device.publish_discovery.
+    """
+    device_payload = {
+        k: v
+        for k, v in device.__dict__.items()
+        if v is not None and not k.startswith("_") and k != "service"
+    }
+    if device.via_device is not None:
+        device_payload["via_device"] = device.via_device._unique_id
+
+    return {
+        "device": device_payload,
+        "origin": {"name": f"MIQRO service {device.service.SERVICE_NAME}"},
+        "availability": [
+            {
+                "topic": device.service.willtopic,
+                "payload_available": "1",
+                "payload_not_available": "0",
+            }
+        ],
+        "components": {
+            entity.unique_id: entity.get_discover_payload()
+            for entity in device.entities
+        },
+    }
+
+
+class DiscoveryManager:
+    """
+    Publishes the Home Assistant discovery configuration of the service's devices.
+
+    Discovery is published in batches of `batch_size` devices every
+    `batch_interval`, so that the alarm groups process messages before the broker
+    is busy with the retained configurations. After connecting, the manager first
+    listens to the retained configurations on the broker for `retained_wait`.
+    Devices whose retained configuration is the one that would be published are
+    skipped, unless `force` is set or a full republish is requested; if the
+    broker has lost its retained messages, e.g., after a restart without
+    persistence, all configurations are published again.
+    """
+
+    service: "AlarmService"
+    pending: Dict[str, Device]
+    # digests of the configurations retained by the broker, as far as known, by
+    # the unique id of the device
+    retained: Dict[str, str]
+    force: bool
+    # set when a full republish has been requested, until the queue is empty
+    republish: bool = False
+    # set while listening to the retained configurations after connecting
+    checking: bool = False
+
+    published_count: int = 0
+    skipped_count: int = 0
+
+    def __init__(
+        self,
+        service,
+        batch_size=20,
+        batch_interval={"seconds": 1},
+        retained_wait={"seconds": 2},
+        force=False,
+    ):
+        self.service = service
+        self.batch_size = batch_size
+        self.force = force
+        self.pending = {}
+        self.retained = {}
+        self.batch_timer = self.service.scheduler.timer(
+            self._publish_batch, timedelta(**batch_interval)
+        )
+        self.check_timer = self.service.scheduler.timer(
+            self._end_check, timedelta(**retained_wait)
+        )
+
+    @property
+    def prefix(self) -> str:
+        return self.service.config.get("ha_discovery_prefix", "homeassistant")
+
+    @property
+    def subscription(self) -> str:
+        return f"{self.prefix}/device/#"
+
+    def topic(self, device: Device) -> str:
+        return f"{self.prefix}/device/{device._unique_id}/config"
+
+    def publish_all(self, force=False):
+        """
+        Queue all devices of the service, e.g., after (re-)connecting. Unless
+        forced, the retained configurations are checked first.
+        """
+        for device in self.service.ha_devices:
+            self.pending[device._unique_id] = device
+        if force or self.force:
+            self.republish = True
+            self.batch_timer.start()
+        elif not self.checking:
+            # what the broker retained before this connection is not known
+            self.retained = {}
+            self.checking = True
+            self.service.add_global_handler(self.subscription, self._handle_retained)
+            self.check_timer.start(delayed=True)
+
+    def publish(self, device: Device):
+        # devices added while connected, e.g., on reload
+        if self.service.is_connected:
+            self.pending[device._unique_id] = device
+            if not self.checking:
+                self.batch_timer.start()
+
+    def remove(self, device: Device):
+        self.pending.pop(device._unique_id, None)
+        self.retained.pop(device._unique_id, None)
+        if self.service.is_connected:
+            self.service.publish(
+                self.topic(device), "", retain=True, qos=1, global_=True
+            )
+
+    def _handle_retained(self, _, payload, subtopic):
+        # called from the MQTT client's thread with, e.g., "alarm_Alarm-Door/config"
+        unique_id, _, suffix = subtopic.partition("/")
+        if suffix != "config" or unique_id not in self.pending:
+            return
+        try:
+            config = json.loads(payload)
+        except ValueError:
+            config = None
+        if config is None:
+            self.retained.pop(unique_id, None)
+        else:
+            topic = f"{self.prefix}/device/{subtopic}"
+            self.retained[unique_id] = _digest(topic, config)
+
+    def _end_check(self, _):
+        self.checking = False
+        self.service.remove_global_handler(self.subscription)
+        self.batch_timer.start()
+        return False
+
+    def _publish_batch(self, _):
+        published = 0
+        while self.pending and published < self.batch_size:
+            device = self.pending.pop(next(iter(self.pending)))
+            payload = discovery_payload(device)
+            topic = self.topic(device)
+            digest = _digest(topic, payload)
+            unchanged = self.retained.get(device._unique_id) == digest
+            if unchanged and not (self.force or self.republish):
+                self.skipped_count += 1
+                continue
+            self.service.publish_json(
+                topic, payload, qos=1, retain=True, global_=True
+            )
+            self.retained[device._unique_id] = digest
+            published += 1
+            self.published_count += 1
+
+        if self.pending:
+            return True
+        self.republish = False
+        return False  # stop the timer until devices are queued again
+
+    def get_stats(self):
+        return {
+            "published": self.published_count,
+            "skipped": self.skipped_count,
+            "pending": len(self.pending),
+        }
+
+
+def _digest(topic: str, payload: Dict) -> str:
+    return sha1((topic + json.dumps(payload, sort_keys=True)).encode()).hexdigest()
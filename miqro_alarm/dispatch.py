@@ -0,0 +1,64 @@
+from functools import partial
+from typing import Callable, Dict, List
+
+from miqro_alarm.conditions import Payload
+
+
+class Message(Payload):
+    """
+    An MQTT message as delivered to the inputs. One message object is shared by all
+    subscribers of a topic, so the payload is timestamped and decoded only once.
+    """
+
+    topic: str
+    # time of reception on the service's monotonic clock
+    received: float
+
+    def __init__(self, topic: str, raw: str, received: float):
+        super().__init__(raw)
+        self.topic = topic
+        self.received = received
+
+
+class TopicDispatcher:
+    """
+    Owns a single MQTT subscription per topic and fans out each received message to
+    all subscribers of that topic, in the order in which they subscribed.
+    """
+
+    service: "AlarmService"
+    subscribers: Dict[str, List[Callable[[Message], None]]]
+
+    def __init__(self, service):
+        self.service = service
+        self.subscribers = {}
+
+    def subscribe(self, topic: str, handler: Callable[[Message], None]):
+        handlers = self.subscribers.get(topic)
+        if handlers is None:
+            handlers = self.subscribers[topic] = []
+            self.service.add_global_handler(topic, partial(self.dispatch, topic))
+        handlers.append(handler)
+
+    def unsubscribe(self, topic: str, handler: Callable[[Message], None]):
+        handlers = self.subscribers[topic]
+        handlers.remove(handler)
+        if not handlers:
+            del self.subscribers[topic]
+            self.service.remove_global_handler(topic)
+
+    def dispatch(self, topic, _, raw_value):
+        message = Message(topic, raw_value, self.service.clock.monotonic())
+        if self.service.recorder is not None:
+            self.service.recorder.record(topic, raw_value)
+        latency = self.service.latency
+        if latency.enabled:
+            latency.begin()
+        try:
+            for handler in self.subscribers.get(topic, ()):
+                handler(message)
+        finally:
+            latency.end()
+
+    def subscriber_counts(self) -> Dict[str, int]:
+        return {topic: len(handlers) for topic, handlers in self.subscribers.items()}
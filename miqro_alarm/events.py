@@ -0,0 +1,145 @@
+import logging
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Optional
+
+
+class EventType(Enum):
+    INPUT_CHANGE = "input_change"
+    INPUT_IGNORED = "input_ignored"
+    DEBOUNCE_START = "debounce_start"
+    DEBOUNCE_STOP = "debounce_stop"
+    TRANSITION = "transition"
+    OUTPUT_REQUEST = "output_request"
+
+
+# How events are formatted for the log and for queries. The fields are the group
+# (if any), the subject (an input, evaluation node or output), the value and an
+# optional detail.
+FORMATS = {
+    EventType.INPUT_CHANGE: "{group} | {subject} changed to {value}",
+    EventType.INPUT_IGNORED: "{group} | {subject} is {value}, ignored: {detail}",
+    EventType.DEBOUNCE_START: "{group} | {subject} changed to {value}, waiting for debounce timeout",
+    EventType.DEBOUNCE_STOP: "{group} | {subject} debounce of {value} {detail}",
+    EventType.TRANSITION: "{group} | {detail} -> {value}, triggered by '{subject}'",
+    EventType.OUTPUT_REQUEST: "{group} | Output {subject}: request {value} ({detail})",
+}
+
+
+class EventLog:
+    """
+    Records what happens while processing messages in a fixed-size ring buffer of
+    the last `size` events, instead of formatting log messages for each of them.
+
+    Events only keep references to the objects involved and the time on the
+    service's monotonic clock; they are formatted when queried, or when they are
+    recorded while the service's log is at DEBUG level. The buffer is allocated
+    once, so recording an event does not allocate memory.
+
+    An event belongs to a group if it was recorded for the group, or if its
+    subject is shared by several groups (an evaluation node) and has an
+    `alarm_group_names()` method that includes the group.
+    """
+
+    service: "AlarmService"
+    size: int
+    # index of the next event to be written, and the number of events recorded
+    position: int = 0
+    count: int = 0
+
+    times: List[Optional[float]]
+    types: List[Optional[EventType]]
+    groups: List[Optional["AlarmGroup"]]
+    subjects: List[Any]
+    values: List[Any]
+    details: List[Any]
+
+    def __init__(self, service, size=2000):
+        if size < 1:
+            raise Exception(f"Event log: size must be at least 1, not {size}")
+        self.service = service
+        self.size = size
+        self.times = [None] * size
+        self.types = [None] * size
+        self.groups = [None] * size
+        self.subjects = [None] * size
+        self.values = [None] * size
+        self.details = [None] * size
+
+    def record(self, type: EventType, group, subject, value, detail=None):
+        i = self.position
+        self.times[i] = self.service.clock.monotonic()
+        self.types[i] = type
+        self.groups[i] = group
+        self.subjects[i] = subject
+        self.values[i] = value
+        self.details[i] = detail
+        self.position = i + 1 if i + 1 < self.size else 0
+        self.count += 1
+        if self.service.log.isEnabledFor(logging.DEBUG):
+            self.service.log.debug(self._format(i))
+
+    def _indices(self) -> Iterable[int]:
+        # newest first
+        for n in range(min(self.count, self.size)):
+            yield (self.position - 1 - n) % self.size
+
+    def _belongs_to(self, i: int, group_name: str) -> bool:
+        group = self.groups[i]
+        if group is not None:
+            return group.name == group_name
+        group_names = getattr(self.subjects[i], "alarm_group_names", None)
+        return group_names is not None and group_name in group_names()
+
+    def _format(self, i: int) -> str:
+        group = self.groups[i]
+        return FORMATS[self.types[i]].format(
+            group="-" if group is None else group,
+            subject=self.subjects[i],
+            value=_format_value(self.values[i]),
+            detail=_format_value(self.details[i]),
+        )
+
+    def _as_dict(self, i: int) -> Dict:
+        group = self.groups[i]
+        time = self.service.clock.to_datetime(self.times[i])
+        return {
+            "time": time.isoformat(),
+            "type": self.types[i].value,
+            "group": None if group is None else group.name,
+            "message": self._format(i),
+        }
+
+    def query(
+        self,
+        limit: int = 200,
+        group: Optional[str] = None,
+        types: Optional[Iterable[str]] = None,
+    ) -> List[Dict]:
+        """
+        The last `limit` events, oldest first, optionally only those of a group
+        and of the given types.
+        """
+        type_filter = None if types is None else {EventType(t) for t in types}
+        result = []
+        for i in self._indices():
+            if len(result) >= limit:
+                break
+            if type_filter is not None and self.types[i] not in type_filter:
+                continue
+            if group is not None and not self._belongs_to(i, group):
+                continue
+            result.append(self._as_dict(i))
+        result.reverse()
+        return result
+
+    def get_stats(self):
+        return {
+            "size": self.size,
+            "recorded": self.count,
+        }
+
+
+def _format_value(value) -> str:
+    if isinstance(value, Enum):
+        return value.name
+    return str(value)
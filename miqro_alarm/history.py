@@ -0,0 +1,352 @@
+"""
+Query the history journal of the alarm service.
+
+    miqro_alarm history --group frost --since 2024-01-01 --kind transition
+    miqro_alarm history --config /etc/miqro.yml --limit 20 --json
+    miqro_alarm history --directory /var/lib/miqro/history
+"""
+
+import argparse
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+from threading import RLock
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from yaml import FullLoader, load
+
+SUFFIX = ".jsonl"
+INDEX_SUFFIX = ".idx"
+
+
+class SegmentIndex:
+    """
+    The time range of the records in a segment, and the offsets of the records of
+    each group. Records are not necessarily ordered by time (e.g., after the clock
+    was set back), so the range is that of the earliest and latest record.
+    """
+
+    earliest: Optional[float]
+    latest: Optional[float]
+    groups: Dict[str, List[int]]
+
+    def __init__(self, earliest=None, latest=None, groups=None):
+        self.earliest = earliest
+        self.latest = latest
+        self.groups = groups if groups is not None else {}
+
+    def add(self, timestamp: float, group: str, offset: int):
+        if self.earliest is None or timestamp < self.earliest:
+            self.earliest = timestamp
+        if self.latest is None or timestamp > self.latest:
+            self.latest = timestamp
+        self.groups.setdefault(group, []).append(offset)
+
+    def overlaps(self, since: Optional[float], until: Optional[float]) -> bool:
+        if self.earliest is None or self.latest is None:
+            return False
+        return (since is None or self.latest >= since) and (
+            until is None or self.earliest <= until
+        )
+
+    @classmethod
+    def scan(cls, path: Path) -> "SegmentIndex":
+        # for segments that were not closed properly
+        index = cls()
+        offset = 0
+        with path.open("rb") as f:
+            for line in f:
+                record = _parse(line)
+                if record is not None:
+                    index.add(record["time"], record["group"], offset)
+                offset += len(line)
+        return index
+
+    def as_dict(self):
+        return {"earliest": self.earliest, "latest": self.latest, "groups": self.groups}
+
+
+class History:
+    """
+    Reads the segments of a history journal in `directory`. The index of each
+    segment is read from its index file, or built by reading the segment if it has
+    none, and kept for later queries.
+    """
+
+    directory: Path
+    indexes: Dict[Path, SegmentIndex]
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.indexes = {}
+
+    def segments(self) -> List[Path]:
+        # oldest first
+        return sorted(self.directory.glob(f"history-*{SUFFIX}"))
+
+    def index(self, path: Path) -> SegmentIndex:
+        index = self.indexes.get(path)
+        if index is None:
+            index_path = path.with_suffix(INDEX_SUFFIX)
+            data = json.loads(index_path.read_text()) if index_path.exists() else {}
+            if "earliest" in data:
+                index = SegmentIndex(**data)
+            else:
+                # no index file, or one with the first and last instead of the
+                # earliest and latest time
+                index = SegmentIndex.scan(path)
+            self.indexes[path] = index
+        return index
+
+    def query(
+        self,
+        group: Optional[str] = None,
+        since: Union[None, str, float] = None,
+        until: Union[None, str, float] = None,
+        kinds: Optional[Iterable[str]] = None,
+        limit: int = 100,
+    ) -> List[Dict]:
+        """
+        The last `limit` records, oldest first, optionally only those of a group,
+        of the given kinds and between `since` and `until` (timestamps or ISO 8601
+        dates).
+        """
+        since, until = parse_time(since), parse_time(until)
+        kinds = None if kinds is None else set(kinds)
+        result: List[Dict] = []
+        for path in reversed(self.segments()):
+            index = self.index(path)
+            if not index.overlaps(since, until):
+                continue
+            if group is not None and group not in index.groups:
+                continue
+            for record in self._read_backwards(path, index, group):
+                # records are not strictly ordered by time (e.g., after the clock
+                # was set back); whole segments are skipped by their index instead
+                if since is not None and record["time"] < since:
+                    continue
+                if until is not None and record["time"] > until:
+                    continue
+                if kinds is not None and record["kind"] not in kinds:
+                    continue
+                result.append(record)
+                if len(result) >= limit:
+                    break
+            if len(result) >= limit:
+                break
+        result.reverse()
+        return [
+            dict(record, time=datetime.fromtimestamp(record["time"]).isoformat())
+            for record in result
+        ]
+
+    def _read_backwards(
+        self, path: Path, index: SegmentIndex, group: Optional[str]
+    ) -> Iterator[Dict]:
+        with path.open("rb") as f:
+            if group is None:
+                lines: Iterable[bytes] = reversed(f.readlines())
+            else:
+                lines = (_read_line(f, offset) for offset in reversed(index.groups[group]))
+            for line in lines:
+                record = _parse(line)
+                if record is not None:
+                    yield record
+
+
+class HistoryJournal(History):
+    """
+    Keeps a history of the transitions of the alarm groups, the commits of their
+    inputs and the commands sent to them in an append-only journal in
+    `directory`, to be queried later.
+
+    Records are collected in memory and written in batches every `flush_interval`,
+    one JSON object per line. When the current segment has grown beyond
+    `max_segment_size` bytes, its index is written and a new segment is started;
+    only the newest `keep` segments are kept.
+
+    Queries arrive on the MQTT client's thread and flush the journal first, so
+    recording, flushing and closing share a lock with the flush timer.
+    """
+
+    service: "AlarmService"
+    file: Optional[BinaryIO] = None
+    path: Optional[Path] = None
+    size: int = 0
+    pending: List[Tuple[float, str, str, Dict]]
+
+    def __init__(
+        self,
+        service,
+        directory,
+        max_segment_size=1024 * 1024,
+        keep=100,
+        flush_interval={"seconds": 5},
+    ):
+        super().__init__(directory)
+        self.service = service
+        self.max_segment_size = max_segment_size
+        self.keep = keep
+        self.pending = []
+        self.lock = RLock()
+
+        self.flush_timer = self.service.scheduler.timer(
+            self._flush_timer, timedelta(**flush_interval)
+        )
+        self.flush_timer.start(delayed=True)
+
+    def record(self, group: "AlarmGroup", kind: str, data: Dict):
+        record = (self.service.clock.now().timestamp(), group.name, kind, data)
+        with self.lock:
+            self.pending.append(record)
+
+    def flush(self):
+        with self.lock:
+            if not self.pending:
+                return
+            if self.file is None:
+                self._open()
+                assert self.file and self.path
+
+            pending, self.pending = self.pending, []
+            index = self.indexes[self.path]
+            lines = []
+            for timestamp, group, kind, data in pending:
+                line = (
+                    json.dumps(
+                        {"time": timestamp, "group": group, "kind": kind, **data}
+                    )
+                    + "\n"
+                ).encode()
+                index.add(timestamp, group, self.size)
+                self.size += len(line)
+                lines.append(line)
+            self.file.write(b"".join(lines))
+            self.file.flush()
+
+            if self.size >= self.max_segment_size:
+                self.close()
+
+    def query(self, *args, **kwargs) -> List[Dict]:
+        with self.lock:
+            self.flush()
+            return super().query(*args, **kwargs)
+
+    def _open(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        segments = self.segments()
+        number = int(segments[-1].stem.rsplit("-", 1)[1]) + 1 if segments else 1
+        self.path = self.directory / f"history-{number:06d}{SUFFIX}"
+        self.service.log.info(f"History: Writing to {self.path}")
+
+        for old in segments[: max(0, len(segments) - self.keep + 1)]:
+            old.unlink()
+            old.with_suffix(INDEX_SUFFIX).unlink(missing_ok=True)
+            self.indexes.pop(old, None)
+
+        self.file = self.path.open("ab")
+        self.size = 0
+        self.indexes[self.path] = SegmentIndex()
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                assert self.path
+                self.file.close()
+                self.file = None
+                self.path.with_suffix(INDEX_SUFFIX).write_text(
+                    json.dumps(self.indexes[self.path].as_dict())
+                )
+
+    def _flush_timer(self, _):
+        self.flush()
+
+    def shutdown(self):
+        self.flush()
+        self.close()
+
+
+def parse_time(value: Union[None, str, float]) -> Optional[float]:
+    if value is None or isinstance(value, (int, float)):
+        return value
+    return datetime.fromisoformat(value).timestamp()
+
+
+def _read_line(f: BinaryIO, offset: int) -> bytes:
+    f.seek(offset)
+    return f.readline()
+
+
+def _parse(line: bytes) -> Optional[Dict]:
+    # the last line of a segment may be incomplete after a crash
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+def _history_directory(config_path: Optional[str]) -> Path:
+    from miqro_alarm.alarm import AlarmService
+
+    paths = [Path(config_path)] if config_path else AlarmService.CONFIG_FILE_PATHS
+    for path in paths:
+        if path.exists():
+            with path.open() as f:
+                config = load(f, Loader=FullLoader)
+            break
+    else:
+        raise Exception(
+            "No MIQRO config file found; searched paths: " + ", ".join(map(str, paths))
+        )
+    history_config = config.get("services", {}).get("alarm", {}).get("history")
+    if not history_config:
+        raise Exception(f"No history configured for the alarm service in {path}")
+    return Path(history_config["directory"])
+
+
+def main(args: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog="miqro_alarm history", description=__doc__.strip().split("\n\n")[0]
+    )
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--config", "-c", help="configuration file")
+    source.add_argument("--directory", help="history directory")
+    parser.add_argument("--group", help="only records of this group")
+    parser.add_argument("--since", help="only records since this time (ISO 8601)")
+    parser.add_argument("--until", help="only records until this time (ISO 8601)")
+    parser.add_argument(
+        "--kind",
+        action="append",
+        choices=["transition", "input", "reset", "inhibit", "enabled"],
+        help="only records of this kind (can be given more than once)",
+    )
+    parser.add_argument("--limit", type=int, default=100, help="number of records")
+    parser.add_argument("--json", action="store_true", help="print records as JSON")
+    parsed = parser.parse_args(args)
+
+    directory = (
+        Path(parsed.directory) if parsed.directory else _history_directory(parsed.config)
+    )
+    records = History(directory).query(
+        group=parsed.group,
+        since=parsed.since,
+        until=parsed.until,
+        kinds=parsed.kind,
+        limit=parsed.limit,
+    )
+
+    if parsed.json:
+        print(json.dumps(records, indent=2))
+        return
+
+    for record in records:
+        details = ", ".join(
+            f"{key}={value}"
+            for key, value in record.items()
+            if key not in ("time", "group", "kind")
+        )
+        print(f"{record['time']} {record['group']} {record['kind']}: {details}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+from bisect import bisect_left
+from datetime import timedelta
+from threading import local
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+
+# Upper bounds of the histogram buckets in seconds, from 10us to about 10s.
+BUCKETS = tuple(1e-5 * 2**i for i in range(21))
+
+# Stages of processing an MQTT message, in order.
+STAGES = ("evaluate", "commit", "group", "prealarm", "output", "publish")
+
+
+class Histogram:
+    """
+    Counts latencies in exponentially growing buckets. Quantiles are reported as the
+    upper bound of the bucket they fall into.
+    """
+
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    counts: List[int]
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+
+    def record(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self):
+        # in microseconds, as published floats are rounded
+        def us(seconds):
+            return None if seconds is None else round(seconds * 1e6)
+
+        return {
+            "count": self.count,
+            "avg_us": us(self.total / self.count) if self.count else None,
+            "p50_us": us(self.quantile(0.5)),
+            "p99_us": us(self.quantile(0.99)),
+            "max_us": us(self.max),
+        }
+
+
+class Trace(local):
+    """
+    The message being processed on the current thread: the perf_counter at which it
+    was received, and the group currently processing it. Stages reached on other
+    threads (e.g., from timers on the service loop) do not see it.
+    """
+
+    started: Optional[float] = None
+    group: Optional["AlarmGroup"] = None
+
+
+class LatencyTracker:
+    """
+    Measures the time from receiving an MQTT message for an input until each stage
+    of its processing is reached: evaluation of the condition, commit of the new
+    value, the group reacting to it, prealarm, output requests and publishing.
+    Latencies are collected in histograms per stage and per group, and published
+    every `publish_interval` at `service/alarm/latency`.
+
+    The tracker can be switched on and off at runtime. When it is off, each stage
+    only checks the `enabled` flag. Stages reached from timers (e.g., after a
+    debounce timeout) are not attributed to a message and are not measured, except
+    for the first message sent by a repeating switch output.
+    """
+
+    service: "AlarmService"
+    enabled: bool = False
+
+    current: Trace
+
+    stages: Dict[str, Histogram]
+    groups: Dict[str, Dict[str, Histogram]]
+
+    def __init__(self, service, enabled=False, publish_interval={"minutes": 1}):
+        self.service = service
+        self.current = Trace()
+        self.publish_timer = self.service.scheduler.timer(
+            self._publish_timer, timedelta(**publish_interval)
+        )
+        self.reset()
+        self.set_enabled(enabled)
+
+    def reset(self):
+        self.stages = {}
+        self.groups = {}
+
+    def set_enabled(self, enabled):
+        was_enabled, self.enabled = self.enabled, enabled
+        self.end()
+        if enabled and not was_enabled:
+            self.reset()
+            self.publish_timer.start(delayed=True)
+        elif not enabled and was_enabled:
+            self.publish_timer.stop()
+            self.publish()
+
+    def begin(self):
+        if self.enabled:
+            self.current.started = perf_counter()
+
+    def end(self):
+        self.current.started = None
+        self.current.group = None
+
+    def mark(self, stage, group=None):
+        """
+        Record that the message currently being processed on this thread has
+        reached `stage`, within `group` or the group that last reached a stage.
+        """
+        current = self.current
+        if current.started is None:
+            return
+        if group is not None:
+            current.group = group
+        self._record(stage, current.group, perf_counter() - current.started)
+
+    def trace(self) -> Optional[Tuple[float, Optional["AlarmGroup"]]]:
+        """
+        The message currently being processed, for stages that are reached later
+        from a timer, e.g., the first message of a repeating switch output.
+        """
+        current = self.current
+        if current.started is None:
+            return None
+        return current.started, current.group
+
+    def mark_trace(self, stage, trace: Tuple[float, Optional["AlarmGroup"]]):
+        started, group = trace
+        self._record(stage, group, perf_counter() - started)
+
+    def _record(self, stage, group, elapsed):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = Histogram()
+        histogram.record(elapsed)
+
+        if group is not None:
+            group_stages = self.groups.setdefault(group.name, {})
+            histogram = group_stages.get(stage)
+            if histogram is None:
+                histogram = group_stages[stage] = Histogram()
+            histogram.record(elapsed)
+
+    def get_stats(self):
+        def ordered(histograms):
+            return {
+                stage: histograms[stage].as_dict()
+                for stage in STAGES
+                if stage in histograms
+            }
+
+        return {
+            "enabled": self.enabled,
+            "stages": ordered(self.stages),
+            "groups": {name: ordered(stages) for name, stages in self.groups.items()},
+        }
+
+    def publish(self):
+        self.service.publish_json("latency", self.get_stats())
+
+    def _publish_timer(self, _):
+        self.publish()
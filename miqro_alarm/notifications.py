@@ -0,0 +1,140 @@
+from datetime import timedelta
+from typing import Dict, Hashable, List, Optional
+
+
+class Notification:
+    message: str
+    category: Optional[str]
+    subject: Optional[str]
+
+    def __init__(self, message, category=None, subject=None):
+        self.message = message
+        self.category = category
+        self.subject = subject
+
+
+class OutputBudget:
+    last_sent: Optional[float] = None
+    pending: List[Notification]
+
+    def __init__(self, timer):
+        self.timer = timer
+        self.pending = []
+
+
+def format_digest(notifications: List[Notification]) -> str:
+    """
+    Fold notifications into one message. Notifications with a category are
+    summarized per category, e.g., "14 inputs silent: Door, Window, ...".
+    """
+    lines = []
+    subjects_by_category: Dict[str, List[str]] = {}
+    for notification in notifications:
+        if notification.category is None:
+            lines.append(notification.message)
+            continue
+        subjects = subjects_by_category.setdefault(notification.category, [])
+        subject = notification.subject or notification.message
+        if subject not in subjects:
+            subjects.append(subject)
+
+    for category, subjects in subjects_by_category.items():
+        plural = "s" if len(subjects) != 1 else ""
+        lines.append(f"{len(subjects)} input{plural} {category}: {', '.join(subjects)}")
+    return "\n".join(lines)
+
+
+class WarningAggregator:
+    """
+    Sends warnings to all text outputs with `info` enabled.
+
+    A warning with a key (e.g., the same input being silent) is sent once; repeated
+    warnings with that key are suppressed for `dedup_interval` (30 minutes by
+    default), or until the key is cleared when the problem is resolved.
+
+    Each output receives at most one message per `min_interval` (one minute by
+    default). The first warning is sent immediately; warnings arriving within the
+    interval are collected and sent as one digest when the interval has elapsed, so
+    that, e.g., all inputs going silent after an outage are reported in one message.
+    Budgets are kept per output name, so they survive replacing an output on reload.
+    """
+
+    service: "AlarmService"
+    last_seen: Dict[Hashable, float]
+    budgets: Dict[str, OutputBudget]
+    suppressed_count: int = 0
+
+    def __init__(
+        self, service, dedup_interval={"minutes": 30}, min_interval={"minutes": 1}
+    ):
+        self.service = service
+        self.dedup_interval = timedelta(**dedup_interval).total_seconds()
+        self.min_interval = timedelta(**min_interval).total_seconds()
+        self.last_seen = {}
+        self.budgets = {}
+
+    def warning(self, message, key=None, category=None, subject=None):
+        now = self.service.scheduler.clock()
+        if key is not None and self.dedup_interval:
+            last_seen = self.last_seen.get(key)
+            if last_seen is not None and now - last_seen < self.dedup_interval:
+                self.suppressed_count += 1
+                return
+            self.last_seen[key] = now
+
+        notification = Notification(message, category, subject)
+        for name, output in self.service.text_outputs.items():
+            if output.info:
+                self._send(name, output, notification, now)
+
+    def clear(self, key):
+        self.last_seen.pop(key, None)
+
+    def remove_output(self, name):
+        # called when a text output is removed on reload
+        budget = self.budgets.pop(name, None)
+        if budget is not None:
+            budget.timer.stop()
+
+    def _send(self, name, output, notification: Notification, now):
+        budget = self.budgets.get(name)
+        if budget is None:
+            timer = self.service.scheduler.timer(
+                lambda _: self._send_digest(name), timedelta(0)
+            )
+            budget = self.budgets[name] = OutputBudget(timer)
+
+        if budget.timer.active:
+            budget.pending.append(notification)
+            return
+
+        if budget.last_sent is not None and now - budget.last_sent < self.min_interval:
+            budget.pending.append(notification)
+            self.service.scheduler.arm(
+                budget.timer, budget.last_sent + self.min_interval - now
+            )
+            return
+
+        budget.last_sent = now
+        output.send_info(notification.message)
+
+    def _send_digest(self, name):
+        budget = self.budgets[name]
+        output = self.service.text_outputs[name]
+        pending, budget.pending = budget.pending, []
+        if not output.info:
+            # the output was reconfigured without `info` in the meantime
+            return False
+        if len(pending) == 1:
+            message = pending[0].message
+        else:
+            message = format_digest(pending)
+        budget.last_sent = self.service.scheduler.clock()
+        output.send_info(message)
+        return False
+
+    def get_stats(self):
+        return {
+            "suppressed": self.suppressed_count,
+            "pending": sum(len(budget.pending) for budget in self.budgets.values()),
+        }
@@ -0,0 +1,99 @@
+import logging
+from pathlib import Path
+from time import perf_counter
+from types import SimpleNamespace
+from typing import List, Optional, Tuple
+
+from miqro_alarm.alarm import AlarmService
+from miqro_alarm.clock import Clock
+
+
+class OfflineMQTTClient:
+    """
+    Stands in for paho's mqtt.Client when the service runs without a broker, e.g.,
+    for replays and benchmarks. Published messages are recorded together with the
+    time of publishing (perf_counter).
+    """
+
+    published: List[Tuple[float, str, str]]
+
+    def __init__(self, name):
+        self.published = []
+        self.subscribed = []
+
+    def username_pw_set(self, **kwargs):
+        pass
+
+    def tls_set(self, **kwargs):
+        pass
+
+    def enable_logger(self, logger):
+        pass
+
+    def will_set(self, *args, **kwargs):
+        pass
+
+    def connect_async(self, **kwargs):
+        pass
+
+    def subscribe(self, topic):
+        self.subscribed.append(topic)
+
+    def unsubscribe(self, topic):
+        if topic in self.subscribed:
+            self.subscribed.remove(topic)
+
+    def publish(self, topic, message, retain=False, qos=0):
+        self.published.append((perf_counter(), topic, message))
+
+    def loop_start(self):
+        pass
+
+    def loop_stop(self):
+        pass
+
+
+class MemoryState:
+    """
+    A service state that is never loaded from or saved to a file.
+    """
+
+    def __init__(self, service):
+        self._data = {}
+
+    def set_path(self, *keys, value):
+        data = self._data
+        for key in keys[:-1]:
+            data = data.setdefault(key, {})
+        data[keys[-1]] = value
+
+    def get_path(self, *keys, default=None):
+        data = self._data
+        for key in keys:
+            if key not in data:
+                return default
+            data = data[key]
+        return data
+
+    def save(self):
+        pass
+
+
+def create_offline_service(
+    config_path: Path, log_level=logging.ERROR, clock: Optional[Clock] = None
+):
+    service = AlarmService(
+        config_path,
+        log_level=log_level,
+        mqtt_client_cls=OfflineMQTTClient,
+        state_cls=MemoryState,
+        clock=clock,
+    )
+    service._on_connect(service.mqtt_client, None, None, 0)
+    return service
+
+
+def send(service, topic, payload: str):
+    service._on_message(
+        None, None, SimpleNamespace(topic=topic, payload=payload.encode())
+    )
@@ -0,0 +1,115 @@
+import miqro
+import os
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from datetime import timedelta
+from pathlib import Path
+from threading import Lock
+from typing import Dict
+from yaml import dump
+
+
+class StatePersistence:
+    """
+    Batches writes to the service state. Inputs are marked as dirty when they change
+    and are written into the state together, every `flush_interval` or before the
+    state is saved.
+
+    The state file is written every `save_interval` and when a save is requested, on a
+    background thread. The file is replaced atomically, so a crash while writing never
+    leaves a truncated state file behind.
+
+    Command handlers change the state on the MQTT client's thread, so all changes
+    to the state go through `set_path`, which shares a lock with the snapshot taken
+    for writing.
+    """
+
+    service: "AlarmService"
+    dirty: Dict[object, None]
+
+    def __init__(
+        self,
+        service,
+        flush_interval={"seconds": 30},
+        save_interval={"minutes": 5},
+    ):
+        self.service = service
+        self.dirty = {}
+        self.lock = Lock()
+        self.writer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="alarm-state"
+        )
+
+        self.flush_timer = self.service.scheduler.timer(
+            self._flush_timer, timedelta(**flush_interval)
+        )
+        self.flush_timer.start(delayed=True)
+
+        self.save_timer = self.service.scheduler.timer(
+            self._save_timer, timedelta(**save_interval)
+        )
+        self.save_timer.start(delayed=True)
+
+        # Requested saves are coalesced into one save on the next loop step.
+        self.save_requested_timer = self.service.scheduler.timer(
+            self._save_requested_timer, timedelta(0)
+        )
+
+    def mark_dirty(self, obj):
+        with self.lock:
+            self.dirty[obj] = None
+
+    def set_path(self, *keys, value):
+        assert self.service.state
+        with self.lock:
+            self.service.state.set_path(*keys, value=value)
+
+    def flush(self):
+        with self.lock:
+            dirty, self.dirty = self.dirty, {}
+        for obj in dirty:
+            obj._store_state()
+
+    def request_save(self):
+        self.save_requested_timer.start()
+
+    def save(self, wait=False):
+        self.flush()
+        state = self.service.state
+        assert state
+
+        if not isinstance(state, miqro.State):
+            state.save()
+            return
+
+        with self.lock:
+            snapshot = deepcopy(state._data)
+        future = self.writer.submit(self._write, state._file, snapshot)
+        if wait:
+            future.result()
+
+    def _write(self, path: Path, data):
+        self.service.log.debug(f"State: Saving to {path}")
+        try:
+            temp_path = path.with_name(path.name + ".tmp")
+            with temp_path.open("w") as f:
+                dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except Exception as e:
+            self.service.log.error(f"State: Saving to {path} failed: {e}")
+
+    def _flush_timer(self, _):
+        self.flush()
+
+    def _save_timer(self, _):
+        self.save()
+
+    def _save_requested_timer(self, _):
+        self.save()
+        return False
+
+    def shutdown(self):
+        self.save(wait=True)
+        self.writer.shutdown()
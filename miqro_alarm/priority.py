@@ -0,0 +1,97 @@
+from itertools import count
+from typing import Any, Dict, Generic, Hashable, List, Optional, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+
+
+class IndexedPriorityQueue(Generic[K]):
+    """
+    A binary min-heap with an index from key to heap position. Inserting, updating
+    and removing an entry by key is O(log n); the entry with the lowest priority value
+    is available in O(1). Entries with equal priority are ordered by insertion.
+    """
+
+    # entries are [priority, sequence, key, value]
+    heap: List[list]
+    index: Dict[K, int]
+
+    def __init__(self):
+        self.heap = []
+        self.index = {}
+        self.counter = count()
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, key: K):
+        return key in self.index
+
+    def get(self, key: K, default=None):
+        position = self.index.get(key)
+        return default if position is None else self.heap[position][3]
+
+    def set(self, key: K, priority, value: Any = None):
+        """
+        Insert the key with the given priority and value, or update it if present.
+        """
+        position = self.index.get(key)
+        if position is None:
+            self.heap.append([priority, next(self.counter), key, value])
+            self.index[key] = len(self.heap) - 1
+            self._sift_up(len(self.heap) - 1)
+            return
+
+        entry = self.heap[position]
+        old_priority = entry[0]
+        entry[0], entry[3] = priority, value
+        if priority < old_priority:
+            self._sift_up(position)
+        elif priority > old_priority:
+            self._sift_down(position)
+
+    def remove(self, key: K) -> bool:
+        position = self.index.pop(key, None)
+        if position is None:
+            return False
+        last = self.heap.pop()
+        if position < len(self.heap):
+            self.heap[position] = last
+            self.index[last[2]] = position
+            self._sift_up(position)
+            self._sift_down(self.index[last[2]])
+        return True
+
+    def peek(self) -> Optional[Tuple[K, Any]]:
+        if not self.heap:
+            return None
+        _, _, key, value = self.heap[0]
+        return key, value
+
+    def _less(self, i, j):
+        return self.heap[i][:2] < self.heap[j][:2]
+
+    def _swap(self, i, j):
+        heap = self.heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self.index[heap[i][2]] = i
+        self.index[heap[j][2]] = j
+
+    def _sift_up(self, position):
+        while position > 0:
+            parent = (position - 1) // 2
+            if not self._less(position, parent):
+                break
+            self._swap(position, parent)
+            position = parent
+
+    def _sift_down(self, position):
+        size = len(self.heap)
+        while True:
+            smallest = position
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < size and self._less(child, smallest):
+                    smallest = child
+            if smallest == position:
+                break
+            self._swap(position, smallest)
+            position = smallest
@@ -0,0 +1,137 @@
+from datetime import timedelta
+from pathlib import Path
+from struct import Struct
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# Capture files start with MAGIC, followed by records. Each record is a header
+# (timestamp, topic index, length) followed by `length` bytes. Topics are stored
+# once per file: a record with topic index NEW_TOPIC carries the UTF-8 name of the
+# next topic index instead of a payload.
+MAGIC = b"MQAR1\n"
+HEADER = Struct("<dHI")
+NEW_TOPIC = 0xFFFF
+SUFFIX = ".mqar"
+
+
+class Recorder:
+    """
+    Records the messages received for inputs and the commands sent to the groups
+    into capture files in `directory`, to be replayed later.
+
+    Records are appended to the current file, which is flushed every
+    `flush_interval`. When it has grown beyond `max_file_size` bytes, a new file is
+    started; only the newest `keep` files are kept.
+    """
+
+    service: "AlarmService"
+    directory: Path
+    file: Optional[BinaryIO] = None
+    size: int = 0
+    topics: Dict[str, int]
+
+    def __init__(
+        self,
+        service,
+        directory,
+        max_file_size=10 * 1024 * 1024,
+        keep=10,
+        flush_interval={"seconds": 10},
+    ):
+        self.service = service
+        self.directory = Path(directory)
+        self.max_file_size = max_file_size
+        self.keep = keep
+        self.topics = {}
+
+        self.flush_timer = self.service.scheduler.timer(
+            self._flush_timer, timedelta(**flush_interval)
+        )
+        self.flush_timer.start(delayed=True)
+
+    def record(self, topic: str, payload: str):
+        if self.file is None:
+            self._open()
+            assert self.file
+
+        topic_index = self.topics.get(topic)
+        if topic_index is None:
+            topic_index = self.topics[topic] = len(self.topics)
+            encoded_topic = topic.encode()
+            self._write(HEADER.pack(0.0, NEW_TOPIC, len(encoded_topic)), encoded_topic)
+
+        encoded_payload = payload.encode()
+        timestamp = self.service.clock.now().timestamp()
+        self._write(
+            HEADER.pack(timestamp, topic_index, len(encoded_payload)), encoded_payload
+        )
+
+        if self.size >= self.max_file_size:
+            self.close()
+
+    def _write(self, header, data):
+        assert self.file
+        self.file.write(header)
+        self.file.write(data)
+        self.size += len(header) + len(data)
+
+    def _open(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        files = capture_files(self.directory)
+        number = int(files[-1].stem.rsplit("-", 1)[1]) + 1 if files else 1
+        path = self.directory / f"capture-{number:06d}{SUFFIX}"
+        self.service.log.info(f"Recording: Writing to {path}")
+
+        for old in files[: max(0, len(files) - self.keep + 1)]:
+            old.unlink()
+
+        self.file = path.open("wb")
+        self.file.write(MAGIC)
+        self.size = len(MAGIC)
+        self.topics = {}
+
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _flush_timer(self, _):
+        self.flush()
+
+    def shutdown(self):
+        self.close()
+
+
+def capture_files(path: Union[str, Path]) -> List[Path]:
+    """
+    The capture files in a directory, oldest first, or the given file.
+    """
+    path = Path(path)
+    if path.is_dir():
+        return sorted(path.glob(f"capture-*{SUFFIX}"))
+    return [path]
+
+
+def read_capture(paths: Iterable[Union[str, Path]]) -> Iterator[Tuple[float, str, str]]:
+    """
+    Read (timestamp, topic, payload) records from capture files or directories.
+    """
+    for path in (file for p in paths for file in capture_files(p)):
+        with Path(path).open("rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise Exception(f"{path} is not a capture file")
+            topics: List[str] = []
+            while header := f.read(HEADER.size):
+                if len(header) < HEADER.size:
+                    break  # truncated by a crash while writing
+                timestamp, topic_index, length = HEADER.unpack(header)
+                data = f.read(length)
+                if len(data) < length:
+                    break
+                if topic_index == NEW_TOPIC:
+                    topics.append(data.decode())
+                else:
+                    yield timestamp, topics[topic_index], data.decode()
@@ -0,0 +1,168 @@
+"""
+Replay captured MQTT messages into an AlarmService that runs without a broker.
+
+    python -m miqro_alarm.replay /etc/miqro.yml /var/lib/miqro/capture             # as fast as possible
+    python -m miqro_alarm.replay /etc/miqro.yml /var/lib/miqro/capture --simulate  # with timers, on a virtual clock
+    python -m miqro_alarm.replay /etc/miqro.yml capture-000001.mqar --speed 1    # in real time
+    python -m miqro_alarm.replay /etc/miqro.yml capture-000001.mqar --speed 60   # one hour per minute
+"""
+
+import argparse
+import json
+from datetime import datetime
+from itertools import chain
+from time import monotonic, sleep
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from miqro_alarm.clock import VirtualClock
+from miqro_alarm.offline import create_offline_service, send
+from miqro_alarm.recording import read_capture
+
+
+class Replayer:
+    """
+    Feeds captured messages into the service and collects the state transitions of
+    the alarm groups.
+
+    With a `speed`, the time between messages is kept (divided by `speed`) and
+    timers run in between. With a virtual `clock` (which the service must use), the
+    clock jumps from one timer deadline to the next, so timers behave as in real
+    time but no time is spent waiting. Otherwise, messages are sent back to back
+    and timers only run when they are due in real time.
+    """
+
+    service: "AlarmService"
+    speed: Optional[float]
+    clock: Optional[VirtualClock]
+    states: Dict[str, "AlarmState"]
+    transitions: List[Dict]
+
+    def __init__(
+        self, service, speed: Optional[float] = None, clock: Optional[VirtualClock] = None
+    ):
+        self.service = service
+        self.speed = speed
+        self.clock = clock
+        self.states = {group.name: group.state for group in service.groups}
+        self.transitions = []
+
+        # do not record the replayed messages again
+        if self.service.recorder is not None:
+            self.service.recorder.shutdown()
+            self.service.recorder = None
+        # nor add the replayed transitions to the history
+        if self.service.history is not None:
+            self.service.history.shutdown()
+            self.service.history = None
+
+    def replay(self, records: Iterable[Tuple[float, str, str]]):
+        scheduler = self.service.scheduler
+        count = 0
+        first_timestamp = last_timestamp = None
+        started = monotonic()
+
+        for timestamp, topic, payload in records:
+            if first_timestamp is None:
+                first_timestamp = timestamp
+            last_timestamp = timestamp
+            if self.clock:
+                self._simulate(timestamp - self.clock.start.timestamp())
+            elif self.speed:
+                self._wait(started, first_timestamp, timestamp)
+            send(self.service, topic, payload)
+            scheduler.run_due(self.service)
+            self._collect_transitions(timestamp)
+            count += 1
+
+        duration = monotonic() - started
+        return {
+            "messages": count,
+            "duration_s": round(duration, 3),
+            "captured_s": round(last_timestamp - first_timestamp, 3) if count else 0,
+            "msg_per_s": round(count / duration) if duration else None,
+            "transitions": self.transitions,
+        }
+
+    def _simulate(self, elapsed):
+        assert self.clock
+        scheduler = self.service.scheduler
+        while (deadline := scheduler.next_deadline()) is not None and deadline <= elapsed:
+            self.clock.run_until(self.service, deadline)
+            self._collect_transitions(self.clock.now().timestamp())
+        self.clock.run_until(self.service, elapsed)
+
+    def _wait(self, started, first_timestamp, timestamp):
+        assert self.speed
+        until = started + (timestamp - first_timestamp) / self.speed
+        while (now := monotonic()) < until:
+            next_deadline = self.service.scheduler.run_due(self.service)
+            self._collect_transitions(
+                first_timestamp + (monotonic() - started) * self.speed
+            )
+            if next_deadline is None or next_deadline > until:
+                next_deadline = until
+            sleep(max(0.0, next_deadline - now))
+
+    def _collect_transitions(self, timestamp: float):
+        for group in self.service.groups:
+            if group.state is not self.states[group.name]:
+                self.transitions.append(
+                    {
+                        "timestamp": timestamp,
+                        "group": group.name,
+                        "from": self.states[group.name].name.lower(),
+                        "to": group.state.name.lower(),
+                    }
+                )
+                self.states[group.name] = group.state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("config", help="configuration file")
+    parser.add_argument("capture", nargs="+", help="capture files or directories")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--speed", type=float, help="replay speed, e.g., 1 for real time (default: max)"
+    )
+    mode.add_argument(
+        "--simulate",
+        action="store_true",
+        help="run timers on a virtual clock that follows the capture",
+    )
+    parser.add_argument("--json", action="store_true", help="print report as JSON")
+    args = parser.parse_args()
+
+    records = read_capture(args.capture)
+    clock = None
+    if args.simulate:
+        first = next(records, None)
+        if first is not None:
+            clock = VirtualClock(datetime.fromtimestamp(first[0]))
+            records = chain([first], records)
+        else:
+            clock = VirtualClock()
+
+    service = create_offline_service(args.config, clock=clock)
+    replayer = Replayer(service, speed=args.speed, clock=clock)
+    try:
+        report = replayer.replay(records)
+    finally:
+        service.shutdown()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(
+        f"{report['messages']} messages covering {report['captured_s']}s replayed in {report['duration_s']}s ({report['msg_per_s']} msg/s)"
+    )
+    for transition in report["transitions"]:
+        timestamp = datetime.fromtimestamp(transition["timestamp"])
+        print(
+            f"{timestamp:%Y-%m-%d %H:%M:%S.%f} {transition['group']}: {transition['from']} -> {transition['to']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import miqro
+from datetime import datetime, timedelta
+from heapq import heappop, heappush
+from contextlib import nullcontext
+from itertools import count
+from threading import RLock
+from time import monotonic
+from typing import Callable, List, Optional, Tuple
+
+
+class Timer:
+    """
+    A timer managed by the Scheduler, used like a miqro.Loop: the callback is called
+    with the service as argument and repeated every `interval` until it returns False
+    or the timer is stopped.
+    """
+
+    __slots__ = ("scheduler", "fn", "interval", "deadline", "entry", "generation")
+
+    scheduler: "Scheduler"
+    fn: Callable
+    interval: timedelta
+
+    # Deadline at which the timer fires next, None if the timer is stopped.
+    deadline: Optional[float]
+    # Heap entry representing this timer. Fires no later than `deadline`.
+    entry: Optional[Tuple[float, int, "Timer"]]
+    # Incremented on every start/stop, to detect changes made by the callback.
+    generation: int
+
+    def __init__(self, scheduler, fn, interval: timedelta):
+        if not isinstance(interval, timedelta):
+            raise Exception("interval must be provided as timedelta!")
+        self.scheduler = scheduler
+        self.fn = fn
+        self.interval = interval
+        self.deadline = None
+        self.entry = None
+        self.generation = 0
+
+    def start(self, delayed=False):
+        self.scheduler.arm(self, self.interval.total_seconds() if delayed else 0)
+
+    def stop(self):
+        self.scheduler.cancel(self)
+
+    def restart(self, delayed=False):
+        self.start(delayed=delayed)
+
+    @property
+    def active(self):
+        return self.deadline is not None
+
+    def get_remaining(self) -> Optional[timedelta]:
+        if self.deadline is None:
+            return None
+        return timedelta(seconds=self.deadline - self.scheduler.clock())
+
+    def __str__(self):
+        return f"Timer({getattr(self.fn, '__name__', self.fn)})"
+
+
+class Scheduler:
+    """
+    Runs all timers of the service from a single heap ordered by deadline.
+
+    Starting or stopping a timer is O(log n) at most. Stopped timers are removed
+    lazily when their heap entry comes up. Restarting a timer with a later deadline,
+    e.g., the silence timeout of an input on every message, only updates the deadline
+    of the timer; its heap entry is re-queued once it comes up.
+    """
+
+    heap: List[Tuple[float, int, Timer]]
+
+    def __init__(self, clock: Callable[[], float] = monotonic):
+        self.clock = clock
+        self.heap = []
+        self.counter = count()
+        self.lock = RLock()
+
+    def timer(self, fn, interval: timedelta) -> Timer:
+        return Timer(self, fn, interval)
+
+    def arm(self, timer: Timer, delay: float):
+        deadline = self.clock() + delay
+        with self.lock:
+            timer.deadline = deadline
+            timer.generation += 1
+            if timer.entry is not None and timer.entry[0] <= deadline:
+                return
+            self._push(timer, deadline)
+
+    def cancel(self, timer: Timer):
+        with self.lock:
+            timer.deadline = None
+            timer.generation += 1
+
+    def _push(self, timer: Timer, deadline: float):
+        timer.entry = (deadline, next(self.counter), timer)
+        heappush(self.heap, timer.entry)
+
+    def _pop_due(self, now) -> Optional[Timer]:
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                entry = heappop(self.heap)
+                timer = entry[2]
+                if timer.entry is not entry:
+                    continue  # superseded by an earlier entry
+                timer.entry = None
+                if timer.deadline is None:
+                    continue  # stopped
+                if timer.deadline > now:
+                    self._push(timer, timer.deadline)  # restarted with later deadline
+                    continue
+                timer.deadline = None
+                return timer
+            return None
+
+    def run_due(self, service) -> Optional[float]:
+        """
+        Run the callbacks of all timers that are due. Returns the next deadline.
+        """
+        now = self.clock()
+        while (timer := self._pop_due(now)) is not None:
+            generation = timer.generation
+            if timer.fn(service) is not False and timer.generation == generation:
+                self.arm(timer, timer.interval.total_seconds())
+        return self.next_deadline()
+
+    def next_deadline(self) -> Optional[float]:
+        with self.lock:
+            return self.heap[0][0] if self.heap else None
+
+    def active_count(self) -> int:
+        with self.lock:
+            return sum(1 for _, _, timer in self.heap if timer.deadline is not None)
+
+
+class SchedulerLoop(miqro.Loop):
+    """
+    Drives the scheduler from the service loop. The service loop sleeps until the
+    next deadline of the scheduler (or its maximum loop interval). If a `lock` is
+    given, the due timers are run while holding it.
+    """
+
+    scheduler: Scheduler
+
+    def __init__(self, scheduler: Scheduler, lock=None):
+        super().__init__(scheduler.run_due, timedelta(seconds=0))
+        self.scheduler = scheduler
+        self.lock = lock or nullcontext()
+
+    def run_if_needed(self, instance) -> Optional[datetime]:
+        started = datetime.now()
+        with self.lock:
+            next_deadline = self.scheduler.run_due(instance)
+        self.stat_call_count += 1
+        self.stat_cumulative_duration += (datetime.now() - started).total_seconds()
+        if next_deadline is None:
+            return None
+        return datetime.now() + timedelta(
+            seconds=max(0.0, next_deadline - self.scheduler.clock())
+        )
+
+    def __str__(self):
+        return f"SchedulerLoop({self.scheduler.active_count()} timers)"
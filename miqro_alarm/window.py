@@ -0,0 +1,232 @@
+from array import array
+from bisect import bisect_left, insort
+from collections import deque
+from datetime import timedelta
+from math import isnan, nan
+from typing import Callable, Collection, Deque, List, Optional, Tuple
+
+from miqro_alarm.conditions import Payload
+
+
+class RingBuffer:
+    """
+    A first-in, first-out buffer of (time, value) samples with a fixed capacity,
+    stored in two preallocated arrays of doubles. Appending and removing the oldest
+    sample are O(1).
+    """
+
+    capacity: int
+    start: int = 0
+    count: int = 0
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise Exception("The capacity of a window must be at least 1")
+        self.capacity = capacity
+        self.times = array("d", bytes(8 * capacity))
+        self.values = array("d", bytes(8 * capacity))
+
+    def __len__(self):
+        return self.count
+
+    def append(self, time: float, value: float) -> Optional[float]:
+        """
+        Add a sample. If the buffer is full, the oldest sample is dropped and its
+        value returned.
+        """
+        dropped = None
+        if self.count == self.capacity:
+            dropped = self.popleft()
+        index = (self.start + self.count) % self.capacity
+        self.times[index] = time
+        self.values[index] = value
+        self.count += 1
+        return dropped
+
+    def popleft(self) -> float:
+        value = self.values[self.start]
+        self.start = (self.start + 1) % self.capacity
+        self.count -= 1
+        return value
+
+    def oldest_time(self) -> float:
+        return self.times[self.start]
+
+    def oldest(self):
+        return self.times[self.start], self.values[self.start]
+
+    def newest(self):
+        index = (self.start + self.count - 1) % self.capacity
+        return self.times[index], self.values[index]
+
+    def values_list(self):
+        end = self.start + self.count
+        if end <= self.capacity:
+            return self.values[self.start : end].tolist()
+        return (
+            self.values[self.start :].tolist()
+            + self.values[: end - self.capacity].tolist()
+        )
+
+
+class SampleWindow:
+    """
+    The numeric values (value_float) an input has received recently: the last
+    `samples` values, the values received within `duration`, or both. Values that
+    are not numbers are skipped. Memory is bounded by `samples`, or by
+    `max_samples` if only a duration is given.
+
+    Conditions of the input can use the statistics of the window: window_mean,
+    window_min, window_max, window_median, window_rate (change per second between
+    the oldest and the newest value) and window_count. They are NaN while the
+    window is empty (or has fewer than two values, for the rate). The window is
+    passed to the condition in place of the message, so value, value_float and
+    value_json refer to the current message.
+
+    All statistics are maintained incrementally: minimum and maximum in monotonic
+    queues (amortized O(1) per value), the median in a sorted list (O(log n) search
+    and an O(n) move of references). If `names` is given, only the statistics
+    among them are maintained; others are computed from the buffer when accessed.
+    """
+
+    clock: Callable[[], float]
+    duration: Optional[float] = None
+    buffer: RingBuffer
+    payload: Payload
+
+    # running sum of the values in the buffer, recomputed whenever the buffer has
+    # been overwritten once to avoid accumulating rounding errors
+    sum: float = 0.0
+    appended: int = 0
+
+    # sequence numbers of the next value and of the oldest value in the buffer
+    next_sequence: int = 0
+    first_sequence: int = 0
+    # (sequence, value) of the candidates for the minimum and maximum, with the
+    # current minimum or maximum first
+    min_queue: Optional[Deque[Tuple[int, float]]] = None
+    max_queue: Optional[Deque[Tuple[int, float]]] = None
+    sorted_values: Optional[List[float]] = None
+
+    def __init__(
+        self,
+        clock,
+        samples=None,
+        duration=None,
+        max_samples=1000,
+        names: Optional[Collection[str]] = None,
+    ):
+        if samples is None and duration is None:
+            raise Exception("A window needs 'samples', 'duration', or both")
+        self.clock = clock
+        if duration is not None:
+            self.duration = timedelta(**duration).total_seconds()
+        self.buffer = RingBuffer(samples if samples is not None else max_samples)
+        if names is None or "window_min" in names:
+            self.min_queue = deque()
+        if names is None or "window_max" in names:
+            self.max_queue = deque()
+        if names is None or "window_median" in names:
+            self.sorted_values = []
+
+    def update(self, payload: Payload) -> "SampleWindow":
+        self.payload = payload
+        now = self.clock()
+        buffer = self.buffer
+
+        if self.duration is not None:
+            while buffer.count and buffer.oldest_time() < now - self.duration:
+                self._removed(buffer.popleft())
+
+        value = payload.value_float
+        if not isnan(value):
+            dropped = buffer.append(now, value)
+            if dropped is not None:
+                self._removed(dropped)
+            self._added(value)
+            self.appended += 1
+            if self.appended >= buffer.capacity:
+                self.appended = 0
+                self.sum = sum(buffer.values_list())
+        return self
+
+    def _added(self, value: float):
+        self.sum += value
+        sequence = self.next_sequence
+        self.next_sequence += 1
+        if self.min_queue is not None:
+            while self.min_queue and self.min_queue[-1][1] >= value:
+                self.min_queue.pop()
+            self.min_queue.append((sequence, value))
+        if self.max_queue is not None:
+            while self.max_queue and self.max_queue[-1][1] <= value:
+                self.max_queue.pop()
+            self.max_queue.append((sequence, value))
+        if self.sorted_values is not None:
+            insort(self.sorted_values, value)
+
+    def _removed(self, value: float):
+        # the oldest value has left the buffer
+        self.sum -= value
+        sequence = self.first_sequence
+        self.first_sequence += 1
+        for queue in (self.min_queue, self.max_queue):
+            if queue and queue[0][0] == sequence:
+                queue.popleft()
+        if self.sorted_values is not None:
+            del self.sorted_values[bisect_left(self.sorted_values, value)]
+
+    @property
+    def raw(self):
+        return self.payload.raw
+
+    @property
+    def value_float(self):
+        return self.payload.value_float
+
+    @property
+    def value_json(self):
+        return self.payload.value_json
+
+    @property
+    def window_count(self):
+        return self.buffer.count
+
+    @property
+    def window_mean(self):
+        if not self.buffer.count:
+            return nan
+        return self.sum / self.buffer.count
+
+    @property
+    def window_min(self):
+        if self.min_queue is None:
+            return min(self.buffer.values_list(), default=nan)
+        return self.min_queue[0][1] if self.min_queue else nan
+
+    @property
+    def window_max(self):
+        if self.max_queue is None:
+            return max(self.buffer.values_list(), default=nan)
+        return self.max_queue[0][1] if self.max_queue else nan
+
+    @property
+    def window_median(self):
+        values = self.sorted_values
+        if values is None:
+            values = sorted(self.buffer.values_list())
+        if not values:
+            return nan
+        middle = len(values) // 2
+        if len(values) % 2:
+            return values[middle]
+        return (values[middle - 1] + values[middle]) / 2
+
+    @property
+    def window_rate(self):
+        if self.buffer.count < 2:
+            return nan
+        (first_time, first), (last_time, last) = self.buffer.oldest(), self.buffer.newest()
+        if last_time == first_time:
+            return nan
+        return (last - first) / (last_time - first_time)
@@ -0,0 +1,24 @@
+import pytest
+from yaml import dump
+
+from miqro_alarm.clock import VirtualClock
+from miqro_alarm.offline import create_offline_service
+
+
+@pytest.fixture(scope="function")
+def make_service(tmp_path):
+    """
+    Creates offline services on a virtual clock (starting at `start`), from a
+    configuration dict (written to miqro.yml in the test's temporary directory)
+    or the path of a configuration file. Returns the service and its clock.
+    """
+
+    def make_service(config, start=None):
+        if isinstance(config, dict):
+            config_path = tmp_path / "miqro.yml"
+            config_path.write_text(dump(config))
+            config = config_path
+        clock = VirtualClock(start)
+        return create_offline_service(config, clock=clock), clock
+
+    return make_service
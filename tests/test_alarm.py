@@ -748,3 +748,118 @@ def test_debounce(service):
         },
         1.9,
     )
+
+
+def test_topic_subscriber_counts(service):
+    counts = service.dispatcher.subscriber_counts()
+    # the identical inputs of both groups share one evaluation node
+    assert counts["shared/input0"] == 1
+    assert counts["group1/input1"] == 1
+    assert counts["group2/liveness1"] == 1
+
+    send(service, "service/alarm/diagnostics/command", "1")
+    expect_next(
+        service,
+        {
+            "service/alarm/diagnostics": "'shared/input0' in m",
+        },
+    )
+
+
+def test_info_published_only_for_changed_groups(service):
+    expect_next(
+        service,
+        {
+            "service/alarm/g1/info": "'\"enabled/state\": false' in m",
+            "service/alarm/g2/info": "'\"enabled/state\": true' in m",
+        },
+    )
+    send(service, "service/alarm/g1/enabled/command", "1")
+    expect_next(
+        service,
+        {
+            "service/alarm/g1/info": "'\"enabled/state\": true' in m",
+            "service/alarm/g1/enabled/state": 'm == "1"',
+            "service/alarm/g2/info": None,
+        },
+    )
+
+
+def test_group_aggregates(service_no_info_interval):
+    service = service_no_info_interval
+    service.debug_check_aggregates = True
+    g1 = service.groups[0]
+    assert g1.active_input_count == 0
+    assert g1.offline_count == 5
+
+    send(service, "group1/input1", "1")
+    send(service, "group1/inhibitor1", "1")
+    assert g1.active_input_count == 1
+    assert g1.active_inhibitor_count == 1
+    assert g1.offline_count == 3
+    assert g1.get_display_state() == "disabled"
+
+    send(service, "group1/input1", "0")
+    send(service, "group1/inhibitor1", "0")
+    assert g1.active_input_count == 0
+    assert g1.active_inhibitor_count == 0
+    g1.check_aggregates()
+
+
+def test_text_output_coalesces_updates(service_no_info_interval):
+    service = service_no_info_interval
+    send(service, "group2/input1", "1")
+    expect_next(
+        service,
+        {
+            "text/coalesced": "'Input 1' in m and not 'Input 2' in m",
+        },
+    )
+    send(service, "group2/input2", "1")
+    send(service, "group2/multi2/input1", "1")
+    expect_next(
+        service,
+        {
+            "text/coalesced": None,
+        },
+        0.5,
+    )
+    expect_next(
+        service,
+        {
+            "text/coalesced": "'Input 2' in m and 'Multi group OR' in m",
+        },
+        1,
+    )
+
+
+def test_latency_published_when_enabled(service_no_info_interval):
+    service = service_no_info_interval
+    assert not service.latency.enabled
+    send(service, "service/alarm/latency/command", "1")
+    send(service, "group2/input1", "1")
+    assert service.latency.stages["evaluate"].count == 1
+    assert service.latency.groups["g2"]["commit"].count == 1
+
+    send(service, "service/alarm/latency/command", "0")
+    expect_next(
+        service,
+        {
+            "service/alarm/latency": "'\"output\"' in m and '\"g2\"' in m",
+        },
+    )
+
+
+def test_inputs_and_commands_are_recorded(service_no_info_interval, tmp_path):
+    from miqro_alarm.recording import Recorder, read_capture
+
+    service = service_no_info_interval
+    service.recorder = Recorder(service, tmp_path)
+    send(service, "group1/input1", "1")
+    send(service, "service/alarm/g1/enabled/command", "1")
+    service.recorder.shutdown()
+
+    assert [(topic, payload) for _, topic, payload in read_capture([tmp_path])] == [
+        ("group1/input1", "1"),
+        ("service/alarm/g1/enabled/command", "1"),
+    ]
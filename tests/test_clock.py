@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+from miqro_alarm.alarm import AlarmState, InputState
+from miqro_alarm.offline import send
+from miqro_alarm.replay import Replayer
+
+START = datetime(2024, 1, 1)
+
+
+WEEK_CONFIG = {
+    "broker": {},
+    "services": {
+        "alarm": {
+            "switch_outputs": {
+                "siren": {
+                    "default": {
+                        "alarm": {
+                            "mqtt": "siren",
+                            "message": "on",
+                            "repeat": {"seconds": 5},
+                        },
+                        "reset": {"mqtt": "siren", "message": "off"},
+                    }
+                }
+            },
+            "text_outputs": {"info": {"mqtt": "text/info", "info": True}},
+            "groups": [
+                {
+                    "name": "frost",
+                    "label": "Frost",
+                    "default_enabled": True,
+                    "prealarm": {"minutes": 1},
+                    "reset_delay": {"minutes": 5},
+                    "liveness": [
+                        {
+                            "mqtt": "sensor/online",
+                            "when": "is_on(value)",
+                            "label": "Sensor online",
+                            "silence_timeout": {"hours": 2},
+                        }
+                    ],
+                    "inputs": [
+                        {
+                            "mqtt": "sensor/temperature",
+                            "when": "value_float < 2",
+                            "label": "Temperature",
+                        }
+                    ],
+                    "outputs": {"alarm": [{"siren": "default"}, "info"]},
+                }
+            ],
+        }
+    },
+}
+
+
+def test_prealarm_and_reset_delay_on_virtual_clock(make_service):
+    service, clock = make_service("tests/miqro.yml", START)
+    g2 = service.groups[1]
+
+    send(service, "group2/input1", "1")
+    assert g2.state == AlarmState.PREALARM
+    clock.advance(service, 2.9)
+    assert g2.state == AlarmState.PREALARM
+    clock.advance(service, 0.2)
+    assert g2.state == AlarmState.ALARM
+
+    send(service, "group2/input1", "0")
+    clock.advance(service, 1.1)
+    assert g2.state == AlarmState.OFF
+
+
+def test_timestamps_follow_virtual_clock(make_service):
+    service, clock = make_service("tests/miqro.yml", START)
+    g1 = service.groups[0]
+    input2 = g1.inputs[1]
+
+    clock.advance(service, 3600)
+    send(service, "group1/input2", "1")
+    assert input2.last_update == datetime(2024, 1, 1, 1)
+    assert input2.state == InputState.ONLINE
+
+    # silence timeout of one second
+    clock.advance(service, 1)
+    assert input2.state == InputState.OFFLINE
+
+
+def test_simulated_week_replays_identically(make_service):
+    records = []
+    for minute in range(0, 7 * 24 * 60, 10):
+        timestamp = (START + timedelta(minutes=minute)).timestamp()
+        records.append((timestamp, "sensor/online", "1"))
+        # frost every night from 3:00 to 5:00
+        temperature = "1.5" if 180 <= minute % (24 * 60) < 300 else "4.0"
+        records.append((timestamp + 1, "sensor/temperature", temperature))
+
+    reports = []
+    for _ in range(2):
+        service, clock = make_service(WEEK_CONFIG, START)
+        reports.append(Replayer(service, clock=clock).replay(records))
+
+    assert reports[0]["transitions"] == reports[1]["transitions"]
+    assert reports[0]["captured_s"] > 6 * 24 * 3600
+    transitions = [(t["timestamp"], t["to"]) for t in reports[0]["transitions"]]
+    assert len(transitions) == 3 * 7
+    # prealarm at 3:00, alarm one minute later, reset five minutes after 5:00
+    night = START.timestamp() + 3 * 3600 + 1
+    assert transitions[:3] == [
+        (night, "prealarm"),
+        (night + 60, "alarm"),
+        (night + 2 * 3600 + 300, "off"),
+    ]
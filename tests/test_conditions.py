@@ -0,0 +1,195 @@
+import pytest
+from miqro_alarm.conditions import (
+    Condition,
+    ConditionCompiler,
+    FastCondition,
+    Payload,
+    declarative_source,
+    release_source,
+)
+
+
+def test_condition_is_compiled_once():
+    compiler = ConditionCompiler()
+    a = compiler.compile("is_on(value)")
+    b = compiler.compile("is_on(value)")
+    c = compiler.compile("value_float < 2")
+    assert a is b
+    assert a is not c
+    assert len(compiler.cache) == 2
+
+
+def test_condition_evaluation():
+    compiler = ConditionCompiler()
+    assert compiler.compile("is_on(value)").evaluate(Payload("ON")) is True
+    assert compiler.compile("is_off(value)").evaluate(Payload("1")) is False
+    assert compiler.compile("value_float < 2").evaluate(Payload("1.5")) is True
+    assert compiler.compile("value_float < 2").evaluate(Payload("nan")) is False
+    assert compiler.compile("not value_json['contact']").evaluate(
+        Payload('{"contact": false}')
+    )
+
+
+def test_condition_syntax_error_at_compile_time():
+    compiler = ConditionCompiler()
+    with pytest.raises(Exception, match="Invalid condition"):
+        compiler.compile("value ==")
+
+
+def test_payload_is_decoded_only_when_referenced():
+    compiler = ConditionCompiler()
+    assert compiler.compile("is_on(value)").lazy_names == ()
+    assert compiler.compile("value_float < 2").lazy_names == ("value_float",)
+    assert compiler.compile(
+        "any(v > 2 for v in value_json['temperatures'])"
+    ).lazy_names == ("value_json",)
+
+    payload = Payload('{"contact": true}')
+    compiler.compile("is_on(value)").evaluate(payload)
+    assert "value_json" not in vars(payload)
+    compiler.compile("value_json['contact']").evaluate(payload)
+    decoded = vars(payload)["value_json"]
+    compiler.compile("not value_json['contact']").evaluate(payload)
+    assert vars(payload)["value_json"] is decoded
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "is_on(value)",
+        "is_off(value)",
+        "value == 'online'",
+        "value != 'online'",
+        "value_float < 2",
+        "value_float >= -3",
+        "18 <= value_float <= 25",
+        "value_float < 0 or value_float > 11",
+        "not value_json['contact']",
+        "value_json['contact']",
+        "value_json['state']['temperature'] > 20",
+    ],
+)
+def test_common_patterns_are_evaluated_without_eval(source):
+    condition = ConditionCompiler().compile(source)
+    assert isinstance(condition, FastCondition)
+
+    generic = Condition(source)
+    for raw in [
+        "1",
+        "off",
+        "online",
+        "-5",
+        "1.5",
+        "20",
+        "nan",
+        "{}",
+        "[1]",
+        '{"contact": false}',
+        '{"state": {"temperature": 21}}',
+    ]:
+        try:
+            expected = generic.evaluate(Payload(raw))
+        except Exception as e:
+            with pytest.raises(type(e)):
+                condition.evaluate(Payload(raw))
+        else:
+            assert condition.evaluate(Payload(raw)) == expected
+
+
+def test_other_conditions_fall_back_to_eval():
+    compiler = ConditionCompiler()
+    condition = compiler.compile("any(v > 2 for v in value_json['temperatures'])")
+    assert not isinstance(condition, FastCondition)
+    assert condition.evaluate(Payload('{"temperatures": [1, 3]}'))
+    assert compiler.get_stats() == {"fast": 0, "generic": 1}
+
+
+def test_declarative_conditions():
+    assert declarative_source(when="value_float < 2") == "value_float < 2"
+    assert declarative_source(equals="online") == "value == 'online'"
+    assert declarative_source(not_equals=1) == "value != '1'"
+    assert declarative_source(truthy=True) == "is_on(value)"
+    assert declarative_source(truthy=False) == "is_off(value)"
+    assert declarative_source(below=2) == "value_float < 2"
+    assert declarative_source(above="20.5") == "value_float > 20.5"
+    assert declarative_source(between=[18, 25]) == "18 <= value_float <= 25"
+    assert (
+        declarative_source(json_field="contact", truthy=False)
+        == "not value_json['contact']"
+    )
+    assert (
+        declarative_source(json_field=["state", "battery"], below=10)
+        == "value_json['state']['battery'] < 10"
+    )
+
+    for source in [
+        declarative_source(json_field="contact", truthy=True),
+        declarative_source(json_field="mode", equals="away"),
+    ]:
+        assert isinstance(ConditionCompiler().compile(source), FastCondition)
+
+
+def test_invalid_declarative_conditions():
+    with pytest.raises(Exception, match="Exactly one"):
+        declarative_source()
+    with pytest.raises(Exception, match="Exactly one"):
+        declarative_source(below=2, above=1)
+    with pytest.raises(Exception, match="cannot be combined"):
+        declarative_source(when="is_on(value)", equals="1")
+    with pytest.raises(Exception, match="Unknown condition"):
+        declarative_source(smaller=2)
+    with pytest.raises(Exception, match="between"):
+        declarative_source(between=2)
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "__import__('os').system('true')",
+        "open('/etc/passwd')",
+        "value.__class__",
+        "value.lower() == 'on'",
+        "(lambda: 1)()",
+        "[y := 1]",
+        "exec('1')",
+        "globals()",
+        "unknown_name > 2",
+    ],
+)
+def test_unsafe_conditions_are_rejected_at_compile_time(source):
+    with pytest.raises(Exception, match="Invalid condition"):
+        ConditionCompiler().compile(source)
+
+
+def test_restricted_conditions_are_evaluated_without_builtins():
+    compiler = ConditionCompiler()
+    condition = compiler.compile("abs(value_float - 20) > 2 and len(value) < 10")
+    assert not isinstance(condition, FastCondition)
+    assert condition.evaluate(Payload("17.5")) is True
+    assert condition.evaluate(Payload("21")) is False
+    assert condition.namespace["__builtins__"] == {}
+
+    condition = compiler.compile("value in ['open', 'tilted']")
+    assert condition.evaluate(Payload("tilted")) is True
+    assert condition.evaluate(Payload("closed")) is False
+
+    condition = compiler.compile("round(max(value_json['temperatures']) ** 2) >= 100")
+    assert condition.evaluate(Payload('{"temperatures": [3, 10.1]}')) is True
+
+
+def test_release_conditions():
+    assert release_source() is None
+    assert release_source(below=2) is None
+    assert release_source(until="value_float > 3") == "value_float > 3"
+    assert release_source(hysteresis=1, below=2) == "value_float >= 3"
+    assert release_source(hysteresis=0.1, above=0.3) == "value_float <= 0.2"
+    assert (
+        release_source(hysteresis=5, json_field="battery", below=10)
+        == "value_json['battery'] >= 15"
+    )
+    with pytest.raises(Exception, match="cannot be combined"):
+        release_source(until="value_float > 3", hysteresis=1, below=2)
+    with pytest.raises(Exception, match="requires a 'below' or 'above'"):
+        release_source(hysteresis=1, equals="on")
+    with pytest.raises(Exception, match="must not be negative"):
+        release_source(hysteresis=-1, below=2)
@@ -0,0 +1,71 @@
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging import getLogger
+from threading import Event, Thread
+from time import monotonic, sleep
+from types import SimpleNamespace
+from miqro_alarm.delivery import HTTPDelivery
+
+
+@pytest.fixture(scope="function")
+def endpoint():
+    release = Event()
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append(self.path)
+            if self.path == "/slow":
+                release.wait(5)
+            self.send_response(500 if self.path == "/broken" else 200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}", release, received
+    release.set()
+    server.shutdown()
+
+
+def make_delivery(**kwargs):
+    return HTTPDelivery(SimpleNamespace(log=getLogger("test_delivery")), **kwargs)
+
+
+def wait_for(condition, timeout=5):
+    end = monotonic() + timeout
+    while not condition() and monotonic() < end:
+        sleep(0.01)
+    assert condition()
+
+
+def test_post_does_not_block_and_limits_in_flight(endpoint):
+    base, release, received = endpoint
+    delivery = make_delivery(max_in_flight=1)
+
+    start = monotonic()
+    assert delivery.post(f"{base}/slow")
+    assert not delivery.post(f"{base}/slow")
+    assert monotonic() - start < 0.5
+
+    release.set()
+    wait_for(lambda: delivery.get_stats()[f"{base}/slow"]["delivered"] == 1)
+    stats = delivery.get_stats()[f"{base}/slow"]
+    assert stats["dropped"] == 1
+    assert stats["in_flight"] == 0
+    assert stats["latency_avg"] > 0
+    delivery.shutdown()
+
+
+def test_failed_requests_are_retried(endpoint):
+    base, _, received = endpoint
+    delivery = make_delivery(retries=2, backoff={"seconds": 0.01})
+
+    delivery.post(f"{base}/broken")
+    wait_for(lambda: delivery.get_stats()[f"{base}/broken"]["failed"] == 1)
+    assert delivery.get_stats()[f"{base}/broken"]["retries"] == 2
+    assert received.count("/broken") == 3
+    delivery.shutdown()
@@ -0,0 +1,106 @@
+import json
+from miqro_alarm.discovery import discovery_payload
+from miqro_alarm.offline import send
+
+
+def config(groups=3, batch_size=2):
+    return {
+        "broker": {},
+        "services": {
+            "alarm": {
+                "ha_discovery": {"batch_size": batch_size},
+                "groups": [
+                    {
+                        "name": f"g{i}",
+                        "label": f"Group {i}",
+                        "inputs": [
+                            {"mqtt": f"sensor/{i}", "truthy": True, "label": "S"}
+                        ],
+                        "outputs": {},
+                    }
+                    for i in range(groups)
+                ],
+            }
+        },
+    }
+
+
+def discovery_messages(service):
+    return [
+        (topic, message)
+        for _, topic, message in service.mqtt_client.published
+        if topic.startswith("homeassistant/")
+    ]
+
+
+def test_payload_matches_miqro(make_service):
+    service, _ = make_service(config(groups=1))
+    device = service.ha_devices[0]
+    device.publish_discovery("homeassistant")
+    ((topic, message),) = discovery_messages(service)
+    assert topic == "homeassistant/device/alarm_Alarm-Group-0/config"
+    assert json.loads(message) == discovery_payload(device)
+
+
+def test_discovery_is_published_in_batches_after_startup(make_service):
+    service, clock = make_service(config(groups=5, batch_size=2))
+    assert discovery_messages(service) == []
+    assert "homeassistant/device/#" in service.mqtt_client.subscribed
+
+    # after waiting for the retained configurations
+    clock.advance(service, 2)
+    assert len(discovery_messages(service)) == 2
+    assert "homeassistant/device/#" not in service.mqtt_client.subscribed
+    clock.advance(service, 1)
+    assert len(discovery_messages(service)) == 4
+    clock.advance(service, 1)
+    assert len(discovery_messages(service)) == 5
+    assert service.discovery.get_stats() == {
+        "published": 5,
+        "skipped": 0,
+        "pending": 0,
+    }
+
+
+def reconnect(service, retained):
+    # the broker sends the retained configurations after subscribing
+    service._on_connect(service.mqtt_client, None, None, 0)
+    for topic, message in retained:
+        send(service, topic, message)
+
+
+def test_retained_discovery_is_skipped(make_service):
+    service, clock = make_service(config())
+    clock.advance(service, 10)
+    retained = discovery_messages(service)
+    assert len(retained) == 3
+
+    reconnect(service, retained)
+    clock.advance(service, 10)
+    assert len(discovery_messages(service)) == 3
+    assert service.discovery.skipped_count == 3
+
+    # a changed device is published again
+    service.ha_devices[1].entities[0].display_name = "on"
+    reconnect(service, retained)
+    clock.advance(service, 10)
+    assert len(discovery_messages(service)) == 4
+
+
+def test_discovery_is_published_again_if_broker_lost_it(make_service):
+    service, clock = make_service(config())
+    clock.advance(service, 10)
+
+    # e.g., the broker restarted without persistence
+    reconnect(service, [])
+    clock.advance(service, 10)
+    assert len(discovery_messages(service)) == 6
+    assert service.discovery.skipped_count == 0
+
+
+def test_republish_on_command(make_service):
+    service, clock = make_service(config())
+    clock.advance(service, 10)
+    send(service, "service/alarm/discovery/command", "1")
+    clock.advance(service, 10)
+    assert len(discovery_messages(service)) == 6
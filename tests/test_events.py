@@ -0,0 +1,90 @@
+import json
+from miqro_alarm.offline import send
+
+CONFIG = {
+    "broker": {},
+    "services": {
+        "alarm": {
+            "events": {"size": 8},
+            "switch_outputs": {
+                "siren": {
+                    "default": {
+                        "alarm": {"mqtt": "siren", "message": "on"},
+                        "reset": {"mqtt": "siren", "message": "off"},
+                    }
+                }
+            },
+            "groups": [
+                {
+                    "name": name,
+                    "label": name.title(),
+                    "default_enabled": True,
+                    "inputs": [
+                        {
+                            "mqtt": "sensor/water",
+                            "truthy": True,
+                            "label": f"Water ({name})",
+                            "debounce": {"seconds": 5},
+                        },
+                        {"mqtt": f"sensor/{name}", "truthy": True, "label": name},
+                    ],
+                    "outputs": {"alarm": [{"siren": "default"}]},
+                }
+                for name in ("cellar", "kitchen")
+            ],
+        }
+    },
+}
+
+
+def query(service, request=""):
+    send(service, "service/alarm/events/command", request)
+    (response,) = [
+        json.loads(m)
+        for _, t, m in service.mqtt_client.published
+        if t == "service/alarm/events"
+    ][-1:]
+    return response
+
+
+def types(events):
+    return [event["type"] for event in events]
+
+
+def test_events_of_a_transition(make_service):
+    service, clock = make_service(CONFIG)
+    send(service, "sensor/water", "1")
+    clock.advance(service, 5)
+
+    events = query(service, '{"group": "cellar"}')["events"]
+    assert types(events) == [
+        "debounce_start",
+        "debounce_stop",
+        "input_change",
+        "transition",
+        "output_request",
+    ]
+    assert events[3]["message"] == "Cellar | OFF -> ALARM, triggered by 'Water (cellar)'"
+
+    # the shared evaluation node belongs to both groups
+    events = query(service, '{"group": "kitchen", "types": ["debounce_start"]}')
+    assert len(events["events"]) == 1
+
+
+def test_buffer_keeps_the_last_events(make_service):
+    service, _ = make_service(CONFIG)
+    for i in range(10):
+        send(service, "sensor/kitchen", str(i % 2))
+    # a change for each message, the transition and an output request per alarm
+    assert service.events.get_stats() == {"size": 8, "recorded": 10 + 1 + 5}
+
+    events = query(service, "3")["events"]
+    assert types(events) == ["input_change", "input_change", "output_request"]
+    assert events[1]["message"] == "Kitchen | kitchen changed to True"
+    assert len(query(service)["events"]) == 8
+
+
+def test_invalid_query(make_service):
+    service, _ = make_service(CONFIG)
+    response = query(service, '{"types": ["unknown"]}')
+    assert "unknown" in response["error"]
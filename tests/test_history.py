@@ -0,0 +1,168 @@
+import json
+from threading import Thread
+from miqro_alarm.history import History, SegmentIndex, main
+from miqro_alarm.offline import send
+
+
+def config(tmp_path, **history):
+    return {
+        "broker": {},
+        "services": {
+            "alarm": {
+                "history": {"directory": str(tmp_path / "history"), **history},
+                "groups": [
+                    {
+                        "name": name,
+                        "label": name.title(),
+                        "default_enabled": True,
+                        "prealarm": {"seconds": 10},
+                        "inputs": [
+                            {"mqtt": f"sensor/{name}", "truthy": True, "label": name}
+                        ],
+                        "outputs": {},
+                    }
+                    for name in ("frost", "door")
+                ],
+            }
+        },
+    }
+
+
+def kinds(records):
+    return [record["kind"] for record in records]
+
+
+def test_history_is_written_in_batches(make_service, tmp_path):
+    service, clock = make_service(config(tmp_path))
+    send(service, "sensor/frost", "1")
+    assert service.history.pending
+    assert not (tmp_path / "history").exists()
+
+    clock.advance(service, 10)
+    assert not service.history.pending
+    records = History(tmp_path / "history").query(group="frost")
+    assert kinds(records) == ["input", "transition", "transition"]
+    assert records[1] == {
+        "time": records[1]["time"],
+        "group": "frost",
+        "kind": "transition",
+        "from": "off",
+        "to": "prealarm",
+        "trigger": "frost",
+    }
+    assert records[2]["trigger"] == "timeout"
+
+
+def test_commands_are_recorded(make_service, tmp_path):
+    service, _ = make_service(config(tmp_path))
+    send(service, "sensor/door", "1")
+    send(service, "service/alarm/door/reset/command", "1")
+    send(service, "service/alarm/door/inhibited/command", "60")
+
+    records = service.history.query(group="door", kinds=["reset", "inhibit"])
+    assert [(r["kind"], r.get("state"), r.get("seconds")) for r in records] == [
+        ("reset", "prealarm", None),
+        ("inhibit", None, 60),
+    ]
+
+
+def test_query_over_mqtt(make_service, tmp_path):
+    service, _ = make_service(config(tmp_path))
+    send(service, "sensor/frost", "1")
+    send(service, "sensor/door", "1")
+    send(
+        service,
+        "service/alarm/history/command",
+        '{"group": "door", "kinds": ["transition"]}',
+    )
+    (response,) = [
+        json.loads(m)
+        for _, t, m in service.mqtt_client.published
+        if t == "service/alarm/history"
+    ]
+    assert [r["group"] for r in response["records"]] == ["door"]
+
+
+def test_query_waits_for_a_running_flush(make_service, tmp_path):
+    service, _ = make_service(config(tmp_path))
+    send(service, "sensor/frost", "1")
+    results = []
+    # e.g., the flush timer writing on the service loop
+    with service.history.lock:
+        thread = Thread(target=lambda: results.append(service.history.query()))
+        thread.start()
+        thread.join(0.1)
+        assert thread.is_alive()
+    thread.join()
+    assert kinds(results[0]) == ["input", "transition"]
+
+
+def test_segments_are_rotated_and_indexed(make_service, tmp_path):
+    service, clock = make_service(config(tmp_path, max_segment_size=200, keep=3))
+    for i in range(20):
+        send(service, "sensor/door" if i % 4 < 2 else "sensor/frost", str(i % 2))
+        clock.advance(service, 5)
+    service.shutdown()
+
+    history = History(tmp_path / "history")
+    segments = history.segments()
+    assert len(segments) == 3
+    assert all(path.with_suffix(".idx").exists() for path in segments)
+
+    records = history.query(group="door", limit=1000)
+    assert records and {record["group"] for record in records} == {"door"}
+    assert len(history.query(limit=5)) == 5
+
+
+def test_since_does_not_stop_at_an_older_record(tmp_path):
+    directory = tmp_path / "history"
+    directory.mkdir()
+    # the clock was set back between the second and the third record
+    times = [100.0, 200.0, 150.0, 300.0]
+    (directory / "history-000001.jsonl").write_text(
+        "".join(
+            json.dumps({"time": t, "group": "g", "kind": "input"}) + "\n"
+            for t in times
+        )
+    )
+    records = History(directory).query(since=160)
+    assert len(records) == 2
+
+
+def test_index_covers_out_of_order_records(tmp_path):
+    path = tmp_path / "history-000001.jsonl"
+    path.write_text(
+        "".join(
+            json.dumps({"time": t, "group": "g", "kind": "input"}) + "\n"
+            for t in [100.0, 300.0, 150.0]
+        )
+    )
+    index = SegmentIndex.scan(path)
+    assert (index.earliest, index.latest) == (100.0, 300.0)
+    path.with_suffix(".idx").write_text(json.dumps(index.as_dict()))
+
+    assert len(History(tmp_path).query(since=200)) == 1
+    assert len(History(tmp_path).query(until=120)) == 1
+
+
+def test_unclosed_segment_is_scanned(make_service, tmp_path):
+    service, clock = make_service(config(tmp_path))
+    send(service, "sensor/frost", "1")
+    clock.advance(service, 5)
+    # no index file, and an incomplete last line
+    (segment,) = History(tmp_path / "history").segments()
+    with segment.open("ab") as f:
+        f.write(b'{"time": 1')
+
+    records = History(tmp_path / "history").query(since=0, kinds=["input"])
+    assert [record["input"] for record in records] == ["frost"]
+
+
+def test_cli(make_service, tmp_path, capsys):
+    service, _ = make_service(config(tmp_path))
+    send(service, "sensor/frost", "1")
+    service.shutdown()
+
+    main(["--config", str(tmp_path / "miqro.yml"), "--kind", "transition"])
+    (line,) = capsys.readouterr().out.splitlines()
+    assert line.endswith("frost transition: from=off, to=prealarm, trigger=frost")
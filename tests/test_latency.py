@@ -0,0 +1,90 @@
+from datetime import timedelta
+from logging import getLogger
+from threading import Thread
+from types import SimpleNamespace
+from miqro_alarm.latency import Histogram, LatencyTracker
+from miqro_alarm.scheduler import Scheduler
+
+
+def make_tracker(**kwargs):
+    published = []
+    service = SimpleNamespace(
+        log=getLogger("test_latency"),
+        scheduler=Scheduler(),
+        publish_json=lambda topic, data: published.append((topic, data)),
+    )
+    return LatencyTracker(service, **kwargs), published
+
+
+def test_histogram_quantiles():
+    histogram = Histogram()
+    for _ in range(98):
+        histogram.record(0.0001)
+    histogram.record(0.01)
+    histogram.record(0.5)
+
+    stats = histogram.as_dict()
+    assert stats["count"] == 100
+    assert 100 <= stats["p50_us"] < 200
+    assert 10000 <= stats["p99_us"] < 20000
+    assert stats["max_us"] == 500000
+
+
+def test_disabled_tracker_records_nothing():
+    tracker, _ = make_tracker()
+    group = SimpleNamespace(name="g1")
+    tracker.begin()
+    tracker.mark("evaluate", group)
+    assert tracker.get_stats()["stages"] == {}
+
+
+def test_stages_are_recorded_per_group():
+    tracker, published = make_tracker(enabled=True)
+    g1, g2 = SimpleNamespace(name="g1"), SimpleNamespace(name="g2")
+
+    tracker.begin()
+    tracker.mark("evaluate", g1)
+    tracker.mark("commit", g1)
+    tracker.mark("evaluate", g2)
+    tracker.mark("publish")
+    tracker.end()
+    tracker.mark("commit", g1)  # not attributed to a message
+
+    stats = tracker.get_stats()
+    assert list(stats["stages"]) == ["evaluate", "commit", "publish"]
+    assert stats["stages"]["evaluate"]["count"] == 2
+    assert stats["stages"]["commit"]["count"] == 1
+    assert list(stats["groups"]["g1"]) == ["evaluate", "commit"]
+    assert list(stats["groups"]["g2"]) == ["evaluate", "publish"]
+
+    tracker.set_enabled(False)
+    assert published == [("latency", tracker.get_stats())]
+
+
+def test_trace_is_kept_for_later_stages():
+    tracker, _ = make_tracker(enabled=True)
+    tracker.begin()
+    tracker.mark("output", SimpleNamespace(name="g1"))
+    trace = tracker.trace()
+    tracker.end()
+
+    tracker.mark_trace("publish", trace)
+    assert tracker.get_stats()["groups"]["g1"]["publish"]["count"] == 1
+
+
+def test_stages_on_other_threads_are_not_attributed_to_the_message():
+    tracker, _ = make_tracker(enabled=True)
+    group = SimpleNamespace(name="g1")
+    tracker.begin()
+    tracker.mark("evaluate", group)
+
+    # e.g., a debounce timer firing on the service loop meanwhile
+    thread = Thread(target=tracker.mark, args=("commit", SimpleNamespace(name="g2")))
+    thread.start()
+    thread.join()
+    tracker.mark("commit")
+    tracker.end()
+
+    stats = tracker.get_stats()
+    assert stats["stages"]["commit"]["count"] == 1
+    assert list(stats["groups"]) == ["g1"]
@@ -0,0 +1,146 @@
+from copy import deepcopy
+from threading import Thread
+from yaml import dump
+from miqro_alarm.alarm import AlarmState, InputNode, InputState
+from miqro_alarm.offline import send
+
+
+def group(name, inputs, liveness=[]):
+    return {
+        "name": name,
+        "label": name,
+        "default_enabled": True,
+        "inputs": inputs,
+        "liveness": liveness,
+        "outputs": {},
+    }
+
+
+DOOR = {"mqtt": "sensor/door", "truthy": True, "label": "Door"}
+BRIDGE = {
+    "mqtt": "zigbee/bridge/state",
+    "equals": "online",
+    "label": "Zigbee bridge",
+    "silence_timeout": {"minutes": 10},
+}
+CONFIG = {
+    "broker": {},
+    "services": {
+        "alarm": {
+            "groups": [
+                group(f"zone{i}", [dict(DOOR, label=f"Door (zone {i})")], [BRIDGE])
+                for i in range(3)
+            ]
+        }
+    },
+}
+
+
+def test_identical_inputs_share_one_node(make_service):
+    service, _ = make_service(CONFIG)
+    assert len(service.input_nodes) == 2
+    nodes = {input.node for g in service.groups for input in g.inputs}
+    assert len(nodes) == 1
+    (node,) = nodes
+    assert len(node.inputs) == 3
+    assert service.dispatcher.subscriber_counts() == {
+        "sensor/door": 1,
+        "zigbee/bridge/state": 1,
+    }
+    assert service.get_diagnostics()["input_nodes"] == {"nodes": 2, "inputs": 6}
+
+
+def test_node_evaluates_once_and_notifies_all_groups(make_service, monkeypatch):
+    service, _ = make_service(CONFIG)
+    (node,) = {input.node for g in service.groups for input in g.inputs}
+    evaluations = []
+    evaluate = InputNode._evaluate
+    monkeypatch.setattr(
+        InputNode,
+        "_evaluate",
+        lambda self, payload: evaluations.append(payload) or evaluate(self, payload),
+    )
+
+    send(service, "sensor/door", "1")
+    assert len(evaluations) == 1
+    assert all(g.state == AlarmState.ALARM for g in service.groups)
+    assert [str(g.inputs[0]) for g in service.groups] == [
+        "Door (zone 0)",
+        "Door (zone 1)",
+        "Door (zone 2)",
+    ]
+    for g in service.groups:
+        g.check_aggregates()
+
+
+def test_shared_liveness_times_out_once(make_service, monkeypatch):
+    service, clock = make_service(CONFIG)
+    warnings = []
+    monkeypatch.setattr(
+        service, "warning", lambda message, **kwargs: warnings.append(kwargs)
+    )
+    send(service, "zigbee/bridge/state", "online")
+    # one silence timer for the bridge and one for the door, for all groups
+    timers = [node.silence_timeout_check_loop for node in service.input_nodes.values()]
+    assert len(timers) == 2 and all(timer.active for timer in timers)
+
+    send(service, "zigbee/bridge/state", "offline")
+    for g in service.groups:
+        assert g.liveness[0].state == InputState.INVALID_RESPONSE
+    assert all(g.failed_liveness_count == 1 for g in service.groups)
+
+    clock.advance(service, 601)
+    assert all(g.liveness[0].state == InputState.OFFLINE for g in service.groups)
+    # one warning for the silent bridge, not one per group
+    (silent,) = [w for w in warnings if w["category"] == "silent"]
+    assert silent["subject"] == ", ".join(
+        f"Zigbee bridge (zone{i})" for i in range(3)
+    )
+
+
+def test_different_settings_use_separate_nodes(make_service):
+    config = deepcopy(CONFIG)
+    zone1 = config["services"]["alarm"]["groups"][1]
+    zone1["inputs"][0]["debounce"] = {"seconds": 5}
+    service, clock = make_service(config)
+    zone0, zone1, _ = service.groups
+    assert zone0.inputs[0].node is not zone1.inputs[0].node
+
+    send(service, "sensor/door", "1")
+    assert zone0.state == AlarmState.ALARM
+    assert zone1.state == AlarmState.OFF
+    clock.advance(service, 5)
+    assert zone1.state == AlarmState.ALARM
+
+
+def test_node_is_removed_with_its_last_input(make_service):
+    service, _ = make_service(CONFIG)
+    config = deepcopy(CONFIG)
+    groups = config["services"]["alarm"]["groups"]
+    del groups[2]
+    service.config_path.write_text(dump(config))
+    service.reload()
+    assert len(service.input_nodes) == 2
+    assert len(service.groups[0].inputs[0].node.inputs) == 2
+
+    for g in groups:
+        g["inputs"] = []
+    service.config_path.write_text(dump(config))
+    service.reload()
+    assert len(service.input_nodes) == 1
+    assert "sensor/door" not in service.dispatcher.subscribers
+
+
+def test_messages_wait_for_the_service_lock(make_service):
+    service, _ = make_service(CONFIG)
+    # e.g., a silence timer running on the service loop
+    with service.lock:
+        thread = Thread(target=send, args=(service, "sensor/door", "1"))
+        thread.start()
+        thread.join(0.1)
+        assert thread.is_alive()
+        assert all(g.state == AlarmState.OFF for g in service.groups)
+    thread.join()
+    assert all(g.state == AlarmState.ALARM for g in service.groups)
+    for g in service.groups:
+        g.check_aggregates()
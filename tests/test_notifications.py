@@ -0,0 +1,110 @@
+from miqro_alarm.notifications import Notification, WarningAggregator, format_digest
+from miqro_alarm.scheduler import Scheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeOutput:
+    def __init__(self, info=True):
+        self.info = info
+        self.sent = []
+
+    def send_info(self, msg):
+        self.sent.append(msg)
+
+
+class FakeService:
+    def __init__(self):
+        self.scheduler = Scheduler(FakeClock())
+        self.text_outputs = {"sms": FakeOutput(), "log": FakeOutput(info=False)}
+
+    def advance(self, seconds):
+        self.scheduler.clock.now += seconds
+        self.scheduler.run_due(self)
+
+
+def test_warnings_are_folded_by_default():
+    service = FakeService()
+    aggregator = WarningAggregator(service)
+    aggregator.warning("a", key="x")
+    aggregator.warning("b", key="y")
+    aggregator.warning("c")
+    assert service.text_outputs["sms"].sent == ["a"]
+    service.advance(60)
+    assert service.text_outputs["sms"].sent == ["a", "b\nc"]
+    assert service.text_outputs["log"].sent == []
+
+
+def test_digest_is_dropped_if_output_no_longer_gets_warnings():
+    service = FakeService()
+    aggregator = WarningAggregator(service)
+    aggregator.warning("a")
+    aggregator.warning("b")
+    service.text_outputs["sms"].info = False
+    service.advance(60)
+    assert service.text_outputs["sms"].sent == ["a"]
+
+
+def test_repeated_warnings_are_deduplicated_by_default():
+    service = FakeService()
+    aggregator = WarningAggregator(service)
+    aggregator.warning("a", key="x")
+    service.advance(29 * 60)
+    aggregator.warning("b", key="x")
+    service.advance(60)
+    aggregator.warning("c", key="x")
+    assert service.text_outputs["sms"].sent == ["a", "c"]
+
+
+def test_repeated_warnings_are_deduplicated_until_cleared():
+    service = FakeService()
+    aggregator = WarningAggregator(service, dedup_interval={"minutes": 30})
+    aggregator.warning("silent", key="x")
+    service.advance(60)
+    aggregator.warning("silent", key="x")
+    assert service.text_outputs["sms"].sent == ["silent"]
+
+    aggregator.clear("x")
+    aggregator.warning("silent again", key="x")
+    service.advance(1800)
+    aggregator.warning("still silent", key="x")
+    assert service.text_outputs["sms"].sent == ["silent", "silent again", "still silent"]
+    assert aggregator.get_stats()["suppressed"] == 1
+
+
+def test_bursts_are_folded_into_digest():
+    service = FakeService()
+    aggregator = WarningAggregator(service, min_interval={"minutes": 1})
+    sent = service.text_outputs["sms"].sent
+    for name in ["Door", "Window", "Garage"]:
+        aggregator.warning(f"{name} silent", key=name, category="silent", subject=name)
+    aggregator.warning("Something else")
+    assert sent == ["Door silent"]
+
+    service.advance(59)
+    assert sent == ["Door silent"]
+    service.advance(1)
+    assert sent == ["Door silent", "Something else\n2 inputs silent: Window, Garage"]
+
+    # the next warning waits for the interval following the digest
+    aggregator.warning("Cellar silent", key="Cellar", category="silent", subject="Cellar")
+    assert len(sent) == 2
+    service.advance(60)
+    assert sent[2] == "Cellar silent"
+
+
+def test_format_digest():
+    notifications = [
+        Notification("A silent", "silent", "A"),
+        Notification("A silent", "silent", "A"),
+        Notification("B invalid", "with invalid response", "B"),
+    ]
+    assert format_digest(notifications) == (
+        "1 input silent: A\n1 input with invalid response: B"
+    )
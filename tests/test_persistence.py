@@ -0,0 +1,80 @@
+import miqro
+from logging import getLogger
+from threading import Thread
+from types import SimpleNamespace
+from yaml import safe_load
+from miqro_alarm.persistence import StatePersistence
+from miqro_alarm.scheduler import Scheduler
+
+
+class DirtyInput:
+    def __init__(self, service, name):
+        self.service = service
+        self.name = name
+        self.value = None
+        self.stores = 0
+
+    def _store_state(self):
+        self.stores += 1
+        self.service.state.set_path("inputs", self.name, value=self.value)
+
+
+def make_service(tmp_path, monkeypatch):
+    monkeypatch.setattr(miqro.State, "DATA_ROOT", tmp_path)
+    service = SimpleNamespace(
+        SERVICE_NAME="alarm", log=getLogger("test_persistence"), scheduler=Scheduler()
+    )
+    service.state = miqro.State(service)
+    return service
+
+
+def test_dirty_inputs_are_flushed_once(tmp_path, monkeypatch):
+    service = make_service(tmp_path, monkeypatch)
+    persistence = StatePersistence(service)
+    a = DirtyInput(service, "a")
+
+    for value in range(10):
+        a.value = value
+        persistence.mark_dirty(a)
+    assert a.stores == 0
+
+    persistence.flush()
+    persistence.flush()
+    assert a.stores == 1
+    assert service.state.get_path("inputs", "a", default=None) == 9
+
+
+def test_save_is_atomic_and_off_the_calling_thread(tmp_path, monkeypatch):
+    service = make_service(tmp_path, monkeypatch)
+    persistence = StatePersistence(service)
+    a = DirtyInput(service, "a")
+    a.value = "on"
+    persistence.mark_dirty(a)
+
+    persistence.request_save()
+    service.scheduler.run_due(service)
+    persistence.writer.shutdown(wait=True)
+
+    assert safe_load((tmp_path / "alarm.yaml").read_text()) == {"inputs": {"a": "on"}}
+    assert not (tmp_path / "alarm.yaml.tmp").exists()
+
+
+def test_state_changes_wait_for_the_snapshot(tmp_path, monkeypatch):
+    service = make_service(tmp_path, monkeypatch)
+    persistence = StatePersistence(service)
+
+    # a command handler on the MQTT client's thread changes the state while the
+    # snapshot for writing is taken
+    with persistence.lock:
+        thread = Thread(
+            target=persistence.set_path,
+            args=("group_enabled", "g"),
+            kwargs={"value": True},
+        )
+        thread.start()
+        thread.join(0.1)
+        assert thread.is_alive()
+        assert service.state.get_path("group_enabled", default=None) is None
+    thread.join()
+    assert service.state.get_path("group_enabled", "g", default=None) is True
+    persistence.shutdown()
@@ -0,0 +1,41 @@
+from random import Random
+from miqro_alarm.priority import IndexedPriorityQueue
+
+
+def test_queue_matches_brute_force():
+    random = Random(42)
+    queue = IndexedPriorityQueue()
+    expected = {}  # key -> (priority, sequence)
+    sequence = 0
+    for _ in range(5000):
+        key = random.randrange(50)
+        if random.random() < 0.4:
+            assert queue.remove(key) == (key in expected)
+            expected.pop(key, None)
+        else:
+            priority = random.randrange(10)
+            queue.set(key, priority, f"value-{key}")
+            if key in expected:
+                expected[key] = (priority, expected[key][1])
+            else:
+                expected[key] = (priority, sequence)
+                sequence += 1
+
+        assert len(queue) == len(expected)
+        if expected:
+            winner = min(expected, key=expected.get)
+            assert queue.peek() == (winner, f"value-{winner}")
+        else:
+            assert queue.peek() is None
+
+
+def test_update_keeps_insertion_order_for_equal_priorities():
+    queue = IndexedPriorityQueue()
+    queue.set("a", 5)
+    queue.set("b", 5)
+    queue.set("a", 5, "updated")
+    assert queue.peek() == ("a", "updated")
+    queue.set("a", 6)
+    assert queue.peek() == ("b", None)
+    assert "a" in queue
+    assert queue.get("a") is None
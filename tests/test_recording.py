@@ -0,0 +1,53 @@
+from logging import getLogger
+from types import SimpleNamespace
+from miqro_alarm.clock import Clock
+from miqro_alarm.recording import Recorder, capture_files, read_capture
+from miqro_alarm.scheduler import Scheduler
+
+
+def make_recorder(tmp_path, **kwargs):
+    service = SimpleNamespace(
+        log=getLogger("test_recording"), scheduler=Scheduler(), clock=Clock()
+    )
+    return Recorder(service, tmp_path / "capture", **kwargs)
+
+
+def test_records_are_read_back(tmp_path):
+    recorder = make_recorder(tmp_path)
+    recorder.record("door/contact", "open")
+    recorder.record("service/alarm/g1/enabled/command", "1")
+    recorder.record("door/contact", "clösed")
+    recorder.shutdown()
+
+    records = list(read_capture([tmp_path / "capture"]))
+    assert [(topic, payload) for _, topic, payload in records] == [
+        ("door/contact", "open"),
+        ("service/alarm/g1/enabled/command", "1"),
+        ("door/contact", "clösed"),
+    ]
+    assert records[0][0] <= records[1][0] <= records[2][0]
+
+
+def test_files_are_rotated(tmp_path):
+    recorder = make_recorder(tmp_path, max_file_size=100, keep=2)
+    for i in range(20):
+        recorder.record("sensor", str(i))
+    recorder.shutdown()
+
+    files = capture_files(tmp_path / "capture")
+    assert len(files) == 2
+    assert all(f.stat().st_size < 150 for f in files)
+    # each file can be read on its own
+    payloads = [payload for _, _, payload in read_capture([files[-1]])]
+    assert payloads[-1] == "19"
+
+
+def test_truncated_record_is_skipped(tmp_path):
+    recorder = make_recorder(tmp_path)
+    recorder.record("sensor", "1")
+    recorder.record("sensor", "2")
+    recorder.shutdown()
+
+    path = capture_files(tmp_path / "capture")[0]
+    path.write_bytes(path.read_bytes()[:-3])
+    assert [payload for _, _, payload in read_capture([path])] == ["1"]
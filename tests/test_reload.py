@@ -0,0 +1,216 @@
+from copy import deepcopy
+from yaml import dump
+from miqro_alarm.alarm import AlarmState
+from miqro_alarm.offline import send
+
+CONFIG = {
+    "broker": {},
+    "services": {
+        "alarm": {
+            "switch_outputs": {
+                "siren": {
+                    "default": {
+                        "alarm": {"mqtt": "siren", "message": "on"},
+                        "reset": {"mqtt": "siren", "message": "off"},
+                    }
+                }
+            },
+            "text_outputs": {"info": {"mqtt": "text/info", "info": True}},
+            "groups": [
+                {
+                    "name": "frost",
+                    "label": "Frost",
+                    "default_enabled": True,
+                    "prealarm": {"minutes": 1},
+                    "inputs": [
+                        {
+                            "mqtt": "sensor/temperature",
+                            "when": "value_float < 2",
+                            "label": "Temperature",
+                        }
+                    ],
+                    "outputs": {"alarm": [{"siren": "default"}, "info"]},
+                },
+                {
+                    "name": "door",
+                    "label": "Door",
+                    "default_enabled": True,
+                    "inputs": [
+                        {"mqtt": "sensor/door", "truthy": True, "label": "Door"}
+                    ],
+                    "outputs": {"alarm": [{"siren": "default"}]},
+                },
+            ],
+        }
+    },
+}
+
+
+def reload(service, config):
+    service.config_path.write_text(dump(config))
+    return service.reload()
+
+
+def published(service, topic):
+    return [m for _, t, m in service.mqtt_client.published if t == topic]
+
+
+def test_unchanged_config_keeps_everything(make_service):
+    service, _ = make_service(CONFIG)
+    groups = list(service.groups)
+    report = reload(service, CONFIG)
+    assert report["groups"] == {
+        "added": [],
+        "removed": [],
+        "updated": [],
+        "unchanged": 2,
+    }
+    assert service.groups == groups
+
+
+def test_changed_label_keeps_state_and_timers(make_service):
+    service, clock = make_service(CONFIG)
+    frost, door = service.groups
+    input = frost.inputs[0]
+
+    send(service, "sensor/temperature", "1")
+    assert frost.state == AlarmState.PREALARM
+    clock.advance(service, 30)
+
+    config = deepcopy(CONFIG)
+    config["services"]["alarm"]["groups"][0]["label"] = "Frost outside"
+    report = reload(service, config)
+    assert report["groups"]["updated"] == ["frost"]
+    assert service.groups == [frost, door]
+    assert frost.label == "Frost outside"
+    assert frost.inputs == [input]
+    assert frost.state == AlarmState.PREALARM
+
+    # the running prealarm is not lost
+    clock.advance(service, 31)
+    assert frost.state == AlarmState.ALARM
+
+
+def test_added_input_is_subscribed(make_service):
+    service, _ = make_service(CONFIG)
+    door = service.groups[1]
+    input = door.inputs[0]
+
+    config = deepcopy(CONFIG)
+    config["services"]["alarm"]["groups"][1]["inputs"].append(
+        {"mqtt": "sensor/window", "truthy": True, "label": "Window"}
+    )
+    reload(service, config)
+    assert door.inputs[0] is input
+    assert "sensor/window" in service.mqtt_client.subscribed
+
+    send(service, "sensor/window", "1")
+    assert door.state == AlarmState.ALARM
+    assert door.active_input_count == 1
+    door.check_aggregates()
+
+
+def test_removed_group_is_shut_down(make_service):
+    service, _ = make_service(CONFIG)
+    send(service, "sensor/door", "1")
+    assert published(service, "siren") == ["on"]
+
+    config = deepcopy(CONFIG)
+    del config["services"]["alarm"]["groups"][1]
+    report = reload(service, config)
+    assert report["groups"]["removed"] == ["door"]
+    assert [group.name for group in service.groups] == ["frost"]
+    assert published(service, "siren") == ["on", "off"]
+    assert "sensor/door" not in service.dispatcher.subscribers
+    assert "sensor/door" not in service.mqtt_client.subscribed
+    assert "service/alarm/door/reset/command" not in service.mqtt_client.subscribed
+
+
+def test_replaced_output_is_requested_again(make_service):
+    service, _ = make_service(CONFIG)
+    send(service, "sensor/door", "1")
+
+    config = deepcopy(CONFIG)
+    siren = config["services"]["alarm"]["switch_outputs"]["siren"]
+    siren["default"]["alarm"]["message"] = "loud"
+    report = reload(service, config)
+    assert report["switch_outputs"]["updated"] == ["siren"]
+    assert report["groups"]["unchanged"] == 2
+    assert published(service, "siren") == ["on", "off", "loud"]
+
+
+def test_warning_budgets_follow_text_outputs(make_service):
+    config = deepcopy(CONFIG)
+    config["services"]["alarm"]["warnings"] = {"min_interval": {"minutes": 1}}
+    service, clock = make_service(config)
+    service.warning("a")
+    service.warning("b")
+
+    # the pending digest is sent to the replaced output
+    info = config["services"]["alarm"]["text_outputs"]["info"]
+    info["mqtt"] = "text/other"
+    reload(service, config)
+    clock.advance(service, 60)
+    assert published(service, "text/info") == ["a"]
+    assert published(service, "text/other") == ["b"]
+
+    del config["services"]["alarm"]["text_outputs"]["info"]
+    config["services"]["alarm"]["groups"][0]["outputs"]["alarm"].remove("info")
+    reload(service, config)
+    assert service.notifications.budgets == {}
+
+
+def test_invalid_config_is_rejected(make_service):
+    service, _ = make_service(CONFIG)
+    groups = list(service.groups)
+
+    config = deepcopy(CONFIG)
+    config["services"]["alarm"]["groups"][1]["outputs"] = {"alarm": ["pager"]}
+    report = reload(service, config)
+    assert "unknown text output 'pager'" in report["error"]
+    assert service.groups == groups
+
+
+def test_failed_reload_changes_nothing(make_service):
+    service, _ = make_service(CONFIG)
+    groups = list(service.groups)
+    service_config = deepcopy(service.service_config)
+
+    config = deepcopy(CONFIG)
+    del config["services"]["alarm"]["groups"][0]
+    config["services"]["alarm"]["groups"].append(
+        {
+            "name": "water",
+            "label": "Water",
+            "inputs": [{"mqtt": "sensor/water", "when": "value_float <", "label": "W"}],
+            "outputs": {},
+        }
+    )
+    report = reload(service, config)
+    assert "Group water" in report["error"]
+    assert service.groups == groups
+    assert service.service_config == service_config
+    assert "sensor/temperature" in service.dispatcher.subscribers
+    assert "sensor/water" not in service.dispatcher.subscribers
+
+
+def test_reload_command_runs_in_service_loop(make_service):
+    service, clock = make_service(CONFIG)
+    config = deepcopy(CONFIG)
+    config["services"]["alarm"]["groups"][1]["label"] = "Front door"
+    service.config_path.write_text(dump(config))
+
+    send(service, "service/alarm/reload/command", "1")
+    assert service.reload_requested
+    assert service.groups[1].label == "Door"
+
+    service._loop_step()
+    assert service.groups[1].label == "Front door"
+
+
+def test_other_settings_require_restart(make_service):
+    service, _ = make_service(CONFIG)
+    config = deepcopy(CONFIG)
+    config["services"]["alarm"]["http"] = {"workers": 4}
+    report = reload(service, config)
+    assert report["restart_required"] == ["http"]
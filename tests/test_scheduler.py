@@ -0,0 +1,95 @@
+from datetime import timedelta
+from threading import Lock
+from miqro_alarm.scheduler import Scheduler, SchedulerLoop
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_timers_fire_in_deadline_order():
+    clock = FakeClock()
+    scheduler = Scheduler(clock)
+    fired = []
+    for name, seconds in [("c", 3), ("a", 1), ("b", 2)]:
+        timer = scheduler.timer(
+            lambda _, name=name: fired.append(name) or False, timedelta(seconds=seconds)
+        )
+        timer.start(delayed=True)
+
+    clock.now = 1.5
+    assert scheduler.run_due(None) == 2
+    assert fired == ["a"]
+    clock.now = 10
+    assert scheduler.run_due(None) is None
+    assert fired == ["a", "b", "c"]
+
+
+def test_timer_repeats_until_stopped():
+    clock = FakeClock()
+    scheduler = Scheduler(clock)
+    calls = []
+    timer = scheduler.timer(lambda _: calls.append(clock.now), timedelta(seconds=1))
+    timer.start()
+    for now in [0, 0.5, 1, 2, 2.5]:
+        clock.now = now
+        scheduler.run_due(None)
+    assert calls == [0, 1, 2]
+
+    timer.stop()
+    clock.now = 10
+    scheduler.run_due(None)
+    assert calls == [0, 1, 2]
+    assert not timer.active
+
+
+def test_restart_postpones_without_growing_heap():
+    clock = FakeClock()
+    scheduler = Scheduler(clock)
+    fired = []
+    timer = scheduler.timer(lambda _: fired.append(clock.now) or False, timedelta(seconds=5))
+    timer.start(delayed=True)
+    for now in range(1, 20):
+        clock.now = now
+        timer.restart(delayed=True)
+        scheduler.run_due(None)
+        assert len(scheduler.heap) == 1
+    assert fired == []
+
+    clock.now = 24
+    scheduler.run_due(None)
+    assert fired == [24]
+
+
+def test_stop_and_restart_within_callback():
+    clock = FakeClock()
+    scheduler = Scheduler(clock)
+
+    def callback(_):
+        timer.interval = timedelta(seconds=10)
+        timer.start(delayed=True)
+
+    timer = scheduler.timer(callback, timedelta(seconds=1))
+    timer.start(delayed=True)
+    clock.now = 1
+    scheduler.run_due(None)
+    assert timer.get_remaining() == timedelta(seconds=10)
+
+
+def test_loop_runs_timers_under_lock():
+    clock = FakeClock()
+    scheduler = Scheduler(clock)
+    lock = Lock()
+    held = []
+    timer = scheduler.timer(
+        lambda _: held.append(lock.locked()) or False, timedelta(0)
+    )
+    timer.start()
+
+    SchedulerLoop(scheduler, lock).run_if_needed(None)
+    assert held == [True]
+    assert not lock.locked()
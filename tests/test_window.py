@@ -0,0 +1,196 @@
+import pytest
+from math import isnan
+from miqro_alarm.alarm import AlarmState
+from miqro_alarm.conditions import ConditionCompiler, FastCondition, Payload
+from miqro_alarm.offline import send
+from miqro_alarm.window import RingBuffer, SampleWindow
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ring_buffer_wraps_around():
+    buffer = RingBuffer(3)
+    assert buffer.append(0, 1.0) is None
+    buffer.append(1, 2.0)
+    buffer.append(2, 3.0)
+    assert buffer.append(3, 4.0) == 1.0
+    assert buffer.append(4, 5.0) == 2.0
+    assert buffer.values_list() == [3.0, 4.0, 5.0]
+    assert buffer.oldest() == (2, 3.0)
+    assert buffer.newest() == (4, 5.0)
+    assert len(buffer) == 3
+
+
+def test_window_statistics_over_samples():
+    clock = FakeClock()
+    window = SampleWindow(clock, samples=4)
+    assert isnan(window.window_mean) and isnan(window.window_rate)
+
+    for value in ["1", "5", "not a number", "3", "2", "10"]:
+        clock.now += 1
+        window.update(Payload(value))
+
+    # the last four numbers: 5, 3, 2, 10
+    assert window.window_count == 4
+    assert window.window_mean == 5
+    assert window.window_min == 2
+    assert window.window_max == 10
+    assert window.window_median == 4
+    assert window.window_rate == pytest.approx((10 - 5) / 4)
+    assert window.value_float == 10
+
+
+def test_window_over_duration_is_bounded():
+    clock = FakeClock()
+    window = SampleWindow(clock, duration={"seconds": 10}, max_samples=5)
+    for i in range(20):
+        clock.now = i
+        window.update(Payload(str(i)))
+    assert window.window_count == 5
+    assert window.window_min == 15
+
+    clock.now = 24
+    window.update(Payload("100"))
+    # samples older than 10 seconds are dropped
+    assert window.buffer.values_list() == [16, 17, 18, 19, 100]
+    clock.now = 100
+    window.update(Payload("1"))
+    assert window.window_count == 1
+    assert window.window_mean == 1
+
+
+def test_running_sum_stays_exact():
+    window = SampleWindow(FakeClock(), samples=3)
+    for value in [1e16, 1, 1, 1, 0.1, 0.2, 0.3] * 100:
+        window.update(Payload(str(value)))
+    assert window.window_mean == pytest.approx(0.2)
+
+
+def test_window_conditions_are_fast():
+    condition = ConditionCompiler().compile("window_mean < 2 and window_count >= 3")
+    assert isinstance(condition, FastCondition)
+    window = SampleWindow(FakeClock(), samples=3)
+    results = [condition.evaluate(window.update(Payload(v))) for v in "11119"]
+    assert results == [False, False, True, True, False]
+
+
+def test_frost_alarm_ignores_single_noisy_reading(make_service):
+    config = {
+        "broker": {},
+        "services": {
+            "alarm": {
+                "groups": [
+                    {
+                        "name": "frost",
+                        "label": "Frost",
+                        "default_enabled": True,
+                        "inputs": [
+                            {
+                                "mqtt": "womotempesp/temperature",
+                                "when": "window_median < 2",
+                                "window": {"samples": 5},
+                                "label": "Frost",
+                            }
+                        ],
+                        "outputs": {},
+                    }
+                ]
+            }
+        },
+    }
+    service, _ = make_service(config)
+    group = service.groups[0]
+
+    for value in ["5", "4.5", "-10", "5", "4"]:
+        send(service, "womotempesp/temperature", value)
+    assert group.state == AlarmState.OFF
+    for value in ["1.5", "1", "0.5"]:
+        send(service, "womotempesp/temperature", value)
+    assert group.state == AlarmState.ALARM
+
+
+def test_window_names_require_a_window(make_service):
+    config = {
+        "broker": {},
+        "services": {
+            "alarm": {
+                "groups": [
+                    {
+                        "name": "g",
+                        "label": "G",
+                        "inputs": [
+                            {"mqtt": "t", "when": "window_mean < 2", "label": "T"}
+                        ],
+                        "outputs": {},
+                    }
+                ]
+            }
+        },
+    }
+    with pytest.raises(Exception, match="no window is configured"):
+        make_service(config)
+
+
+def test_hysteresis_prevents_flapping(make_service):
+    inputs = [
+        {"mqtt": "sensor/a", "below": 2, "hysteresis": 1, "label": "A"},
+        {
+            "mqtt": "sensor/b",
+            "when": "value_float < 2",
+            "until": "value_float >= 3",
+            "label": "B",
+        },
+    ]
+    config = {
+        "broker": {},
+        "services": {
+            "alarm": {
+                "groups": [
+                    {"name": "g", "label": "G", "inputs": inputs, "outputs": {}}
+                ]
+            }
+        },
+    }
+    service, _ = make_service(config)
+    for input in service.groups[0].inputs:
+        states = []
+        for value in ["1.9", "2.5", "1.9", "2.5", "3", "2.5", "1.9"]:
+            send(service, input.mqtt, value)
+            states.append(input.last_eval_value)
+        assert states == [True, True, True, True, False, False, True]
+
+
+def test_incremental_statistics_match_the_buffer():
+    clock = FakeClock()
+    window = SampleWindow(clock, duration={"seconds": 20}, max_samples=50)
+    values = [(i * 37) % 101 - 50 + (i % 7) * 0.5 for i in range(500)]
+    for i, value in enumerate(values):
+        clock.now = i if i < 300 else 300 + (i - 300) * 0.25
+        window.update(Payload(str(value)))
+        current = sorted(window.buffer.values_list())
+        assert window.window_min == current[0]
+        assert window.window_max == current[-1]
+        middle = len(current) // 2
+        expected = (
+            current[middle]
+            if len(current) % 2
+            else (current[middle - 1] + current[middle]) / 2
+        )
+        assert window.window_median == expected
+
+
+def test_only_used_statistics_are_maintained():
+    window = SampleWindow(FakeClock(), samples=3, names={"window_max"})
+    assert window.min_queue is None and window.sorted_values is None
+    for value in ["1", "5", "2", "3"]:
+        window.update(Payload(value))
+    assert window.window_max == 5
+    # still available, computed from the buffer
+    assert window.window_min == 2
+    assert window.window_median == 3